@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Serveur local qui remplace l'API CoinGecko pour les tests de charge et les benchmarks hors ligne.
+Les réponses sont lues dans les fichiers enregistrés du dossier fixtures (voir --record), le
+serveur peut ajouter de la latence, des réponses 429 et des timeouts de manière déterministe.
+
+    python benchmarks/standin.py --port 8000 --latency 50 --every-429 10
+    pycoin --api-url http://127.0.0.1:8000/api/v3/ -p 4
+"""
+
+import argparse
+import collections
+import functools
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+# Préfixe de l'API, les URL sans préfixe sont aussi acceptées
+API_PREFIX = "/api/v3/"
+API_URL = "https://api.coingecko.com/api/v3/"
+
+# Requêtes enregistrées par --record, le nom du fichier est celui de la route (voir fixture_name)
+RECORDED = {
+    "ping": "ping",
+    "coins_list": "coins/list?include_platform=false",
+    "coins_markets": "coins/markets?vs_currency=usd&order=market_cap_desc&per_page=250&page=1&sparkline=true",
+    "exchanges": "exchanges?per_page=250&page=1",
+    "global": "global",
+    "global_decentralized_finance_defi": "global/decentralized_finance_defi",
+    "search_trending": "search/trending",
+    "exchange_rates": "exchange_rates",
+    "companies_public_treasury_bitcoin": "companies/public_treasury/bitcoin",
+    "companies_public_treasury_ethereum": "companies/public_treasury/ethereum",
+}
+
+# Nombre de cryptos servies par /coins/markets, les pages suivantes sont vides comme sur l'API
+MARKETS_TOTAL = 15000
+
+# Valeurs par défaut de /coins/markets et /exchanges, per_page est plafonné comme sur l'API
+DEFAULT_PER_PAGE = 100
+MAX_PER_PAGE = 250
+
+
+def fixture_name(path: str) -> str:
+    """
+    :param path: Chemin de la requête, avec ou sans le préfixe /api/v3/
+    :return: Nom du fichier de la route sans extension, ex: companies/public_treasury/bitcoin -> companies_public_treasury_bitcoin
+    """
+    if path.startswith(API_PREFIX):
+        path = path[len(API_PREFIX):]
+    return path.strip("/").replace("/", "_")
+
+
+class Faults:
+    """
+    Pannes injectées par le serveur. Les pannes sont décidées par un compteur de requêtes
+    et non au hasard : le nombre de 429 et de timeouts ne dépend pas de l'ordre des threads.
+    Seule la variation de la latence (jitter) est aléatoire, avec une graine fixe.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            every_429: int = 0,
+            retry_after: int = 1,
+            every_timeout: int = 0,
+            hang: float = 30.0,
+            rate_limit: int = 0,
+            seed: int = 0
+    ):
+        """
+        :param latency: Latence ajoutée à chaque réponse, en seconde
+        :param jitter: Variation aléatoire ajoutée à la latence, entre 0 et jitter seconde
+        :param every_429: Une requête sur N reçoit une réponse 429, 0 pour désactiver
+        :param retry_after: Valeur de l'en-tête Retry-After des réponses 429, en seconde
+        :param every_timeout: Une requête sur N ne reçoit sa réponse qu'après hang seconde, 0 pour désactiver
+        :param hang: Durée en seconde des requêtes bloquées, à régler au-dessus du timeout du client
+        :param rate_limit: Nombre de requêtes par minute au-delà duquel le serveur répond 429, 0 pour désactiver
+        :param seed: Graine de la variation de la latence
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.every_429 = every_429
+        self.retry_after = retry_after
+        self.every_timeout = every_timeout
+        self.hang = hang
+        self.rate_limit = rate_limit
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Remet à zéro les compteurs, la fenêtre du rate limit et la graine"""
+        with self.lock:
+            self.random = random.Random(self.seed)
+            self.window = collections.deque()
+            self.requests = 0
+            self.endpoints = collections.Counter()
+            self.injected = collections.Counter()
+
+    def plan(self, endpoint: str) -> tuple:
+        """
+        Décide de la réponse à une requête
+        :param endpoint: Route de la requête, pour les compteurs
+        :return: Le tuple (panne, délai) : panne vaut None, 429 ou "timeout", délai en seconde
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            self.endpoints[endpoint] += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+            fault = None
+            if self.every_timeout and self.requests % self.every_timeout == 0:
+                fault = "timeout"
+            elif self.every_429 and self.requests % self.every_429 == 0:
+                fault = 429
+            elif self.rate_limit:
+                while self.window and now - self.window[0] >= 60:
+                    self.window.popleft()
+                if len(self.window) >= self.rate_limit:
+                    fault = 429
+                else:
+                    self.window.append(now)
+
+            if fault is not None:
+                self.injected[str(fault)] += 1
+            return fault, delay
+
+    def stats(self) -> dict:
+        """
+        :return: Nombre de requêtes, par route, et nombre de pannes injectées par type
+        """
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "endpoints": dict(self.endpoints),
+                "injected": dict(self.injected),
+            }
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Serveur HTTP/1.1 (keep-alive) des réponses enregistrées, un thread par connexion.
+    Les routes /__stats et /__reset donnent et remettent à zéro les compteurs, sans panne injectée.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, fixtures: str = FIXTURES_DIR, faults: Faults = None,
+                 markets_total: int = MARKETS_TOTAL, verbose: bool = False):
+        """
+        :param address: Tuple (hôte, port), port 0 pour un port libre
+        :param fixtures: Dossier des réponses enregistrées
+        :param faults: Pannes injectées, None pour aucune panne
+        :param markets_total: Nombre de cryptos servies par /coins/markets
+        :param verbose: Affiche chaque requête
+        """
+        super().__init__(address, StandInHandler)
+        self.fixtures = fixtures
+        self.faults = faults or Faults()
+        self.markets_total = markets_total
+        self.verbose = verbose
+        self.fixture = functools.lru_cache(maxsize=None)(self._load_fixture)
+        self.markets_page = functools.lru_cache(maxsize=64)(self._markets_page)
+
+    @property
+    def url(self) -> str:
+        """URL de base à passer à pycoin --api-url"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def _load_fixture(self, name: str):
+        """
+        :param name: Nom de la route (voir fixture_name)
+        :return: Le JSON enregistré, None si la route n'a pas de fichier
+        """
+        path = os.path.join(self.fixtures, f"{name}.json")
+        if not os.path.exists(path):
+            return None
+        with open(file=path, mode="r", encoding="utf-8") as json_file:
+            return json.load(json_file)
+
+    def _markets_page(self, page: int, per_page: int, sparkline: bool) -> list:
+        """
+        Page de /coins/markets. Une page enregistrée (coins_markets.N.json) est servie telle quelle,
+        sinon la page est construite en répétant les cryptos enregistrées : les id et les noms sont
+        suffixés à chaque répétition et les rangs se suivent d'une page à l'autre.
+        Les prix sont ceux de l'enregistrement, quelle que soit la devise demandée.
+        :param page: Numéro de la page, à partir de 1
+        :param per_page: Nombre de cryptos par page
+        :param sparkline: Garde les prix des 7 derniers jours (sparkline_in_7d)
+        :return: Les cryptos de la page
+        """
+        recorded = self.fixture(f"coins_markets.{page}")
+        if recorded is None:
+            base = self.fixture("coins_markets") or []
+            recorded = []
+            for position in range((page - 1) * per_page, min(page * per_page, self.markets_total)):
+                if not base:
+                    break
+                coin = dict(base[position % len(base)])
+                cycle = position // len(base)
+                if cycle:
+                    coin["id"] = f"{coin['id']}-{cycle}"
+                    coin["name"] = f"{coin['name']} {cycle}"
+                coin["market_cap_rank"] = position + 1
+                recorded.append(coin)
+
+        if sparkline:
+            return recorded
+        return [{key: value for key, value in coin.items() if key != "sparkline_in_7d"} for coin in recorded]
+
+    def response(self, path: str, query: dict):
+        """
+        :param path: Chemin de la requête
+        :param query: Paramètres de la requête (parse_qs)
+        :return: Le JSON de la route, None si la route n'est pas enregistrée
+        """
+        name = fixture_name(path)
+        per_page = min(int(query.get("per_page", [DEFAULT_PER_PAGE])[0]), MAX_PER_PAGE)
+        page = max(int(query.get("page", ["1"])[0]), 1)
+
+        if name == "coins_markets":
+            sparkline = query.get("sparkline", ["false"])[0].lower() == "true"
+            return self.markets_page(page, per_page, sparkline)
+
+        data = self.fixture(name)
+        if name == "exchanges" and data is not None:
+            return data[(page - 1) * per_page:page * per_page]
+        return data
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Réponses du serveur StandInServer, avec ETag (304) et compression gzip comme l'API"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "pycoin-standin"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/__stats":
+            return self.send_json(200, self.server.faults.stats())
+        if url.path == "/__reset":
+            self.server.faults.reset()
+            return self.send_json(200, self.server.faults.stats())
+
+        fault, delay = self.server.faults.plan(fixture_name(url.path))
+        if fault == "timeout":
+            delay = self.server.faults.hang
+        if delay:
+            time.sleep(delay)
+
+        if fault == 429:
+            return self.send_json(429, {"status": {"error_code": 429, "error_message": "You've exceeded the Rate Limit."}},
+                                  headers={"Retry-After": str(self.server.faults.retry_after)})
+
+        try:
+            data = self.server.response(url.path, query)
+        except ValueError:
+            return self.send_json(400, {"error": "invalid parameter"})
+        if data is None:
+            return self.send_json(404, {"error": "Not found"})
+        return self.send_json(200, data)
+
+    def send_json(self, status: int, data, headers: dict = None):
+        """
+        :param status: Code HTTP de la réponse
+        :param data: JSON de la réponse
+        :param headers: En-têtes ajoutés à la réponse
+        """
+        body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+
+        try:
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, compresslevel=5)
+                headers = {**(headers or {}), "Content-Encoding": "gzip"}
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 200:
+                self.send_header("ETag", etag)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Le client a abandonné la requête (timeout), la connexion est fermée
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, fixtures: str = FIXTURES_DIR,
+          markets_total: int = MARKETS_TOTAL, verbose: bool = False, **faults) -> StandInServer:
+    """
+    Démarre le serveur dans un thread, pour les benchmarks qui le lancent eux-mêmes
+    :param host: Adresse d'écoute
+    :param port: Port d'écoute, 0 pour un port libre
+    :param fixtures: Dossier des réponses enregistrées
+    :param markets_total: Nombre de cryptos servies par /coins/markets
+    :param verbose: Affiche chaque requête
+    :param faults: Paramètres des pannes injectées (voir Faults)
+    :return: Le serveur démarré, son URL est server.url, à arrêter avec server.shutdown()
+    """
+    server = StandInServer((host, port), fixtures=fixtures, faults=Faults(**faults),
+                           markets_total=markets_total, verbose=verbose)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def record(fixtures: str = FIXTURES_DIR, api_url: str = API_URL, wait: float = 2.5):
+    """
+    Enregistre les réponses de la vraie API dans le dossier fixtures
+    :param fixtures: Dossier des réponses enregistrées
+    :param api_url: URL de base de l'API
+    :param wait: Attente en seconde entre deux requêtes, sous la limite du plan gratuit
+    """
+    os.makedirs(fixtures, exist_ok=True)
+    for name, route in RECORDED.items():
+        request = urllib.request.Request(f"{api_url}{route}",
+                                         headers={"Accept": "application/json", "User-Agent": "pycoin-standin"})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            data = json.load(response)
+        with open(file=os.path.join(fixtures, f"{name}.json"), mode="w", encoding="utf-8") as json_file:
+            json.dump(data, json_file, separators=(",", ":"))
+            json_file.write("\n")
+        print(f"Recorded {route} -> {name}.json")
+        time.sleep(wait)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in for the CoinGecko API, serving recorded responses")
+    parser.add_argument("--host", default="127.0.0.1", metavar="str", help="Listen address (default is 127.0.0.1)")
+    parser.add_argument("--port", default=8000, type=int, metavar="int", help="Listen port (default is 8000)")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, metavar="str", help="Directory of the recorded responses")
+    parser.add_argument("--record", action="store_true", help="Record the responses of the real API into --fixtures and exit")
+    parser.add_argument("--latency", default=0, type=float, metavar="ms", help="Latency added to every response (default is 0)")
+    parser.add_argument("--jitter", default=0, type=float, metavar="ms", help="Random latency added on top of --latency (default is 0)")
+    parser.add_argument("--every-429", default=0, type=int, metavar="int", help="Answer 429 to one request out of N")
+    parser.add_argument("--retry-after", default=1, type=int, metavar="secs", help="Retry-After header of the 429 responses (default is 1)")
+    parser.add_argument("--every-timeout", default=0, type=int, metavar="int",
+                        help="Hold one request out of N for --hang seconds, use pycoin --timeout under this value")
+    parser.add_argument("--hang", default=30, type=float, metavar="secs", help="Duration of the held requests (default is 30)")
+    parser.add_argument("--rate-limit", default=0, type=int, metavar="int",
+                        help="Answer 429 above this number of requests per minute, like the API plans")
+    parser.add_argument("--markets-total", default=MARKETS_TOTAL, type=int, metavar="int",
+                        help=f"Number of coins served by /coins/markets (default is {MARKETS_TOTAL})")
+    parser.add_argument("--seed", default=0, type=int, metavar="int", help="Seed of the latency jitter (default is 0)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    if args.record:
+        record(fixtures=args.fixtures)
+        sys.exit(0)
+
+    standin = StandInServer(
+        (args.host, args.port),
+        fixtures=args.fixtures,
+        faults=Faults(latency=args.latency / 1000, jitter=args.jitter / 1000, every_429=args.every_429,
+                      retry_after=args.retry_after, every_timeout=args.every_timeout, hang=args.hang,
+                      rate_limit=args.rate_limit, seed=args.seed),
+        markets_total=args.markets_total,
+        verbose=args.verbose
+    )
+    print(f"Serving {args.fixtures} on {standin.url}, use: pycoin --api-url {standin.url}")
+    try:
+        standin.serve_forever()
+    except KeyboardInterrupt:
+        standin.server_close()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark du temps de démarrage à froid de la ligne de commande pycoin (-P et -V).
+Chaque commande est lancée dans un nouveau processus python, le résultat est ajouté
+au fichier JSON de suivi pour comparer les versions entre elles.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PYCOIN_SCRIPT = os.path.join(BENCH_DIR, os.pardir, "pycoin", "pycoin.py")
+
+# Commandes mesurées, le --ping n'utilise pas le cache pour ne mesurer que le démarrage
+COMMANDS = {
+    "version": ["-V"],
+    "ping": ["-P", "--no-cache"],
+}
+
+# Les dépendances lourdes ne doivent pas être importées par l'import du module
+HEAVY_MODULES = ["pandas", "numpy", "requests", "rich", "urllib3"]
+
+
+def cold_start(arguments: list, runs: int, api_url: str = None) -> list:
+    """
+    :param arguments: Arguments de la ligne de commande pycoin
+    :param runs: Nombre de lancements
+    :param api_url: URL de base de l'API (PYCOIN_API_URL), par exemple celle du serveur local standin.py
+    :return: Les durées en seconde de chaque lancement
+    """
+    env = {**os.environ, "PYCOIN_API_URL": api_url} if api_url else None
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, PYCOIN_SCRIPT, *arguments], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       env=env)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def imported_heavy_modules() -> list:
+    """
+    :return: Les dépendances lourdes importées par un simple import du module pycoin
+    """
+    code = (
+        "import sys, runpy; "
+        f"runpy.run_path({PYCOIN_SCRIPT!r}, run_name='pycoin'); "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip()
+    return [module for module in output.split(",") if module]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the pycoin command line (-P and -V)")
+    parser.add_argument("-r", "--runs", default=10, type=int, metavar="int", help="Number of runs per command (default is 10)")
+    parser.add_argument("--api-url", metavar="url",
+                        help="Base URL of the API pinged by -P, e.g. the local stand-in server (default is PYCOIN_API_URL or CoinGecko)")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=os.path.join(BENCH_DIR, "results", "startup.json"),
+        metavar="str",
+        help="JSON file where the results are appended"
+    )
+    args = parser.parse_args()
+
+    result = {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "imported_on_load": imported_heavy_modules(),
+        "commands": {},
+    }
+
+    for command, arguments in COMMANDS.items():
+        durations = cold_start(arguments, args.runs, api_url=args.api_url)
+        result["commands"][command] = {
+            "min": min(durations),
+            "median": statistics.median(durations),
+        }
+        print(f"pycoin {' '.join(arguments):<16} min {min(durations) * 1000:7.1f}ms "
+              f"median {statistics.median(durations) * 1000:7.1f}ms")
+
+    if result["imported_on_load"]:
+        print(f"Warning: heavy modules imported on load: {', '.join(result['imported_on_load'])}")
+
+    history = []
+    if os.path.exists(args.output):
+        with open(file=args.output, mode="r", encoding="utf-8") as json_file:
+            history = json.load(json_file)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(file=args.output, mode="w", encoding="utf-8") as json_file:
+        json.dump(history + [result], json_file, indent=2)
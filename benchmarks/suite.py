@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Suite de benchmarks de pycoin, hors ligne contre le serveur local standin.py et ses fixtures :
+- pages par seconde de /coins/markets, récupération seule et de bout en bout (generate)
+- décodage JSON et construction du DataFrame de chaque endpoint
+- temps d'écriture et pic mémoire de chaque format d'export
+- démarrage à froid de la ligne de commande (voir startup.py)
+
+Chaque exécution est ajoutée au fichier JSON de suivi, les métriques plus lentes que
+l'exécution précédente (ou --baseline) au-delà de --threshold sont signalées.
+"""
+
+import argparse
+import contextlib
+import datetime
+import functools
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import parse_qs
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+sys.path.insert(0, BENCH_DIR)
+
+import standin  # noqa: E402
+import startup  # noqa: E402
+from pycoin import pycoin  # noqa: E402
+
+# Routes dont le décodage et la construction du tableau sont mesurés, avec la fonction pycoin utilisée
+# (/coins/markets avec son tri, les autres endpoints par le normaliseur du registre pycoin.ENDPOINTS)
+PARSE_ENDPOINTS = {
+    "markets": ("/coins/markets?per_page=250&page=1", pycoin.markets_frame),
+    "exchanges": ("/exchanges?per_page=250&page=1", functools.partial(pycoin.normalize, "exchanges")),
+    "global": ("/global", functools.partial(pycoin.normalize, "global")),
+    "global_defi": ("/global/decentralized_finance_defi", functools.partial(pycoin.normalize, "global_defi")),
+    "trending": ("/search/trending", functools.partial(pycoin.normalize, "trending")),
+    "companies": ("/companies/public_treasury/bitcoin", functools.partial(pycoin.normalize, "companies")),
+}
+
+# Formats d'export mesurés, les formats colonnes seulement si pyarrow est installé
+EXPORT_EXTENSIONS = ["csv", "html", "json", "ndjson", "xlsx"]
+if importlib.util.find_spec("pyarrow"):
+    EXPORT_EXTENSIONS += pycoin.ARROW_EXTENSIONS
+
+# Métriques où une valeur plus grande est meilleure, les autres sont des durées et des octets
+HIGHER_IS_BETTER = ("pages_per_second",)
+
+
+def timings(function, repeat: int) -> list:
+    """
+    :param function: Fonction mesurée, sans argument
+    :param repeat: Nombre de mesures
+    :return: Les durées en seconde de chaque appel
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def peak_memory(function) -> int:
+    """
+    :param function: Fonction mesurée, sans argument
+    :return: Le pic d'allocation en octets pendant l'appel (tracemalloc, numpy et pandas compris)
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def fetch_benchmark(pages: int, workers: int, runs: int) -> dict:
+    """
+    Pages par seconde de /coins/markets, le serveur local doit être déjà configuré (set_api_url)
+    :param pages: Nombre de pages par exécution
+    :param workers: Nombre de pages demandées en parallèle
+    :param runs: Nombre d'exécutions, la meilleure est gardée
+    :return: Les métriques fetch (fetch_pages) et end_to_end (generate vers CSV)
+    """
+    def fetch():
+        for _ in pycoin.fetch_pages(pages, workers=workers):
+            pass
+
+    def end_to_end():
+        with tempfile.TemporaryDirectory() as directory:
+            pycoin.generate(extension=["csv"], name=os.path.join(directory, "markets"),
+                            pages=pages, workers=workers)
+
+    with open(os.devnull, mode="w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        return {
+            "fetch.pages_per_second": pages / min(timings(fetch, runs)),
+            "end_to_end.pages_per_second": pages / min(timings(end_to_end, runs)),
+        }
+
+
+def parse_benchmark(server: standin.StandInServer, repeat: int) -> dict:
+    """
+    Décodage JSON et construction du tableau de chaque endpoint, depuis les octets de la réponse
+    :param server: Serveur local, pour les réponses des fixtures
+    :param repeat: Nombre de mesures, la meilleure est gardée
+    :return: Les métriques parse.<endpoint>.seconds
+    """
+    metrics = {}
+    for endpoint, (route, frame) in PARSE_ENDPOINTS.items():
+        path, _, query = route.partition("?")
+        body = json.dumps(server.response(path, parse_qs(query))).encode("utf-8")
+        metrics[f"parse.{endpoint}.seconds"] = min(timings(lambda: frame(json.loads(body)), repeat))
+    return metrics
+
+
+def export_benchmark(server: standin.StandInServer, pages: int, repeat: int) -> dict:
+    """
+    Écriture du tableau de /coins/markets dans chaque format, un format à la fois
+    :param server: Serveur local, pour les pages des fixtures
+    :param pages: Nombre de pages concaténées dans le tableau écrit
+    :param repeat: Nombre de mesures, la meilleure est gardée
+    :return: Les métriques export.<ext>.seconds et export.<ext>.peak_bytes
+    """
+    df_markets = pycoin.pd.concat(
+        [pycoin.markets_frame(server.markets_page(page, 250, False)) for page in range(1, pages + 1)],
+        ignore_index=True
+    )
+    pycoin.apply_dtypes(df_markets, pycoin.MARKETS_DTYPES)
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as directory:
+        name = os.path.join(directory, "markets")
+        for ext in EXPORT_EXTENSIONS:
+            def write():
+                pycoin.write_markets(ext, df_markets, name)
+
+            metrics[f"export.{ext}.seconds"] = min(timings(write, repeat))
+            metrics[f"export.{ext}.peak_bytes"] = peak_memory(write)
+    return metrics
+
+
+def cold_start_benchmark(server: standin.StandInServer, runs: int) -> dict:
+    """
+    :param server: Serveur local, le -P le contacte plutôt que l'API réelle
+    :param runs: Nombre de lancements par commande, le médian est gardé
+    :return: Les métriques cold_start.<commande>.seconds (voir startup.py)
+    """
+    return {
+        f"cold_start.{command}.seconds": statistics.median(startup.cold_start(arguments, runs, api_url=server.url))
+        for command, arguments in startup.COMMANDS.items()
+    }
+
+
+def git_commit() -> str:
+    """
+    :return: Le commit court de l'arbre mesuré, None hors d'un dépôt git
+    """
+    output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True)
+    return output.stdout.strip() or None
+
+
+def regressions(baseline: dict, result: dict, threshold: float) -> list:
+    """
+    Compare les métriques de deux exécutions et affiche le tableau des écarts
+    :param baseline: Exécution de référence
+    :param result: Exécution courante
+    :param threshold: Écart relatif au-delà duquel une métrique moins bonne est une régression
+    :return: Les métriques en régression
+    """
+    regressed = []
+    print(f"\n{'metric':<36} {'baseline':>14} {'current':>14} {'change':>9}")
+    for metric, value in result["metrics"].items():
+        previous = baseline["metrics"].get(metric)
+        if not previous:
+            print(f"{metric:<36} {'-':>14} {value:>14.6g} {'new':>9}")
+            continue
+
+        change = (value - previous) / previous
+        worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > threshold:
+            regressed.append(metric)
+            flag = "  REGRESSION"
+        print(f"{metric:<36} {previous:>14.6g} {value:>14.6g} {change:>+9.1%}{flag}")
+    return regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmark suite of pycoin against the local stand-in server")
+    parser.add_argument("-p", "--pages", default=20, type=int, metavar="int",
+                        help="Number of /coins/markets pages per end-to-end run (default is 20)")
+    parser.add_argument("--export-pages", default=10, type=int, metavar="int",
+                        help="Number of pages in the exported table (default is 10)")
+    parser.add_argument("-w", "--workers", default=pycoin.REQ_WORKERS, type=int, metavar="int",
+                        help=f"Number of pages requested in parallel (default is {pycoin.REQ_WORKERS})")
+    parser.add_argument("--latency", default=0, type=float, metavar="ms",
+                        help="Latency added by the stand-in server to every response (default is 0)")
+    parser.add_argument("-r", "--runs", default=5, type=int, metavar="int",
+                        help="Number of runs of each measure, the best one is kept (default is 5)")
+    parser.add_argument("--skip", nargs="+", default=[], choices=["fetch", "parse", "export", "cold_start"],
+                        help="Groups of benchmarks not to run")
+    parser.add_argument("--threshold", default=0.2, type=float, metavar="float",
+                        help="Relative slowdown flagged as a regression (default is 0.2)")
+    parser.add_argument("--baseline", metavar="str",
+                        help="Version or commit of the stored run to compare with (default is the previous run)")
+    parser.add_argument("--no-save", action="store_true", help="Do not append the results to --output")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=os.path.join(BENCH_DIR, "results", "suite.json"),
+        metavar="str",
+        help="JSON file where the results are appended"
+    )
+    args = parser.parse_args()
+
+    # Client sans cache ni limite de débit : seul le serveur local impose son rythme
+    server = standin.serve(latency=args.latency / 1000)
+    pycoin.set_api_url(server.url)
+    pycoin.http_client(rate_limit=1_000_000, cache=None)
+
+    result = {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "version": pycoin.PYCOIN_VERSION,
+        "commit": git_commit(),
+        "parameters": {"pages": args.pages, "export_pages": args.export_pages, "workers": args.workers,
+                       "latency": args.latency, "runs": args.runs},
+        "metrics": {},
+    }
+
+    try:
+        if "fetch" not in args.skip:
+            result["metrics"].update(fetch_benchmark(args.pages, args.workers, args.runs))
+        if "parse" not in args.skip:
+            result["metrics"].update(parse_benchmark(server, args.runs * 10))
+        if "export" not in args.skip:
+            result["metrics"].update(export_benchmark(server, args.export_pages, args.runs))
+        if "cold_start" not in args.skip:
+            result["metrics"].update(cold_start_benchmark(server, args.runs * 3))
+    finally:
+        server.shutdown()
+
+    history = []
+    if os.path.exists(args.output):
+        with open(file=args.output, mode="r", encoding="utf-8") as json_file:
+            history = json.load(json_file)
+
+    # Référence : la dernière exécution de la version ou du commit demandé, sinon la précédente
+    baseline = None
+    for previous in reversed(history):
+        if args.baseline is None or args.baseline in (previous.get("version"), previous.get("commit")):
+            baseline = previous
+            break
+
+    regressed = []
+    if baseline is None:
+        for metric, value in result["metrics"].items():
+            print(f"{metric:<36} {value:>14.6g}")
+    else:
+        print(f"Compared with {baseline.get('version')} ({baseline.get('commit')}) of {baseline['date']}")
+        regressed = regressions(baseline, result, args.threshold)
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(file=args.output, mode="w", encoding="utf-8") as json_file:
+            json.dump(history + [result], json_file, indent=2)
+
+    if regressed:
+        print(f"\n{len(regressed)} regression(s) above {args.threshold:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
@@ -9,7 +9,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['pandas', 'requests', 'rich.progress', 'openpyxl'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
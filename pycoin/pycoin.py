@@ -2,14 +2,64 @@
 # -*- coding: utf-8 -*-
 # PIP3 install : pandas, rich, requests, openpyxl
 
+from __future__ import annotations
 
 import argparse
+import array
+import bisect
+import contextlib
+import csv
+import functools
+import hashlib
+import heapq
+import importlib
+import importlib.util
+import io
+import itertools
+import json
+import operator
+import os
+import random
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
 import time
-import pandas as pd
-import requests
-from timeit import timeit
-import urllib.error
-from rich.progress import Progress, BarColumn, TextColumn, DownloadColumn
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+class LazyModule:
+    """
+    Import différé d'un module : il n'est réellement importé qu'au premier accès à l'un de ses attributs.
+    Les commandes rapides (--ping, --version) ne paient ainsi pas le coût de l'import de pandas.
+    Contrairement à importlib.util.LazyLoader, le premier accès est protégé par un verrou,
+    les threads de generate() ne voient donc jamais un module à moitié initialisé.
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: Nom du module
+        """
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute: str):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    with PROFILER.span("import", self._name):
+                        self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+
+# Les dépendances lourdes sont chargées seulement par les commandes qui les utilisent
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
+np = LazyModule("numpy")
 
 
 # With this is that all errors will be ignored, therefore it is not ideal.
@@ -17,6 +67,8 @@ from rich.progress import Progress, BarColumn, TextColumn, DownloadColumn
 
 # RuntimeWarning: invalid value encountered in cast values = values.astype(str)
 # warnings.filterwarnings("ignore")
+# Ce warning venait de l'inférence des types de pandas, les DataFrame de /coins/markets
+# et /exchanges sont maintenant typés par MARKETS_DTYPES et EXCHANGES_DTYPES.
 
 # *** OPTION PANDAS ***
 # Affiche le DataFrame pandas dans le terminal avec les options ci-dessous:
@@ -28,12 +80,14 @@ from rich.progress import Progress, BarColumn, TextColumn, DownloadColumn
 # pd.options.display.precision = 2
 
 # Liste des Requêtes URL avec aucune modification (Statique)
-API_URL_BASE = "https://api.coingecko.com/api/v3/"
+# L'URL de base peut être remplacée par $PYCOIN_API_URL ou --api-url (voir set_api_url),
+# par exemple par le serveur local benchmarks/standin.py pour les tests de charge.
+API_URL_DEFAULT = "https://api.coingecko.com/api/v3/"
+API_URL_BASE = os.environ.get("PYCOIN_API_URL") or API_URL_DEFAULT
 
+# Les endpoints exportés en tableau sont construits par endpoint_url(), voir ENDPOINTS
 API_PING = f"{API_URL_BASE}ping"
-GLOBAL_DATA = f"{API_URL_BASE}global"
-GLOBAL_DATA_DEFI = f"{API_URL_BASE}global/decentralized_finance_defi"
-TRENDING_TOP7 = f"{API_URL_BASE}search/trending"
+EXCHANGE_RATES = f"{API_URL_BASE}exchange_rates"
 
 # Variables pour les erreurs de "timeout" pour les requêtes
 # INFO:
@@ -42,17 +96,1891 @@ TRENDING_TOP7 = f"{API_URL_BASE}search/trending"
 REQ_CONNECT_TIMEOUT = 25
 REQ_READ_TIMEOUT = 100
 
+# Nombre de connexions "keep-alive" gardées ouvertes par hôte dans le pool
+# du client HTTP partagé (voir HttpClient).
+REQ_POOL_SIZE = 10
+
+# Limite de requêtes par minute autorisée par le plan de l'API CoinGecko,
+# le limiteur (RateLimiter) autorise des rafales jusqu'à cette limite.
+REQ_RATE_LIMIT = 30
+# Nombre de réponses réussies consécutives avant de ré-accélérer après un 429
+REQ_RATE_RECOVERY = 10
+
+# Nouvelles tentatives des requêtes en erreur (429, 5xx, timeout)
+# - REQ_RETRY_BUDGET: nombre total de nouvelles tentatives autorisées pour toute l'exécution
+# - REQ_RETRY_MAX: nombre maximum de nouvelles tentatives pour une même requête
+# - REQ_RETRY_BACKOFF/REQ_RETRY_MAX_DELAY: délai de base et délai maximum en seconde, doublé à chaque tentative
+REQ_RETRY_BUDGET = 20
+REQ_RETRY_MAX = 5
+REQ_RETRY_BACKOFF = 2
+REQ_RETRY_MAX_DELAY = 120
+REQ_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Nombre de pages de /coins/markets demandées en parallèle par generate(),
+# toujours sous la limite du limiteur de débit partagé.
+REQ_WORKERS = 4
+
+# Extensions écrites page par page par generate_stream(), sans garder toutes les pages en mémoire
+STREAM_EXTENSIONS = ["csv", "ndjson"]
+
+# Extensions écrites directement depuis la réponse JSON, sans construire de DataFrame
+JSON_EXTENSIONS = ["json", "ndjson"]
+
+# Formats colonnes (pyarrow), rechargés en quelques millisecondes avec pd.read_parquet / pd.read_feather.
+# Compression par défaut de chaque format, "none" pour ne pas compresser.
+ARROW_EXTENSIONS = ["parquet", "feather", "arrow"]
+ARROW_COMPRESSION = {"parquet": "snappy", "feather": "lz4", "arrow": "lz4"}
+
+# Schéma des colonnes de /coins/markets et /exchanges, appliqué dès la construction des DataFrame
+# par apply_dtypes() plutôt que l'inférence de pandas (object pour les textes, float64 partout,
+# dates en texte) : catégories pour les textes répétés, rangs entiers nullables, float32 pour les
+# pourcentages et dates UTC. Les prix, capitalisations, volumes et offres restent en float64,
+# float32 ne garde que 7 chiffres significatifs. Les types restent aussi les mêmes d'un fichier
+# à l'autre pour les formats colonnes, même si une colonne est vide (voir --memory-report).
+# Les formats texte écrivent les valeurs comme l'API les envoie, sans les chiffres ajoutés par
+# float32 ni le ".0" des entiers stockés en float64 (voir text_frame()).
+MARKETS_DTYPES = {
+    "id": "string",
+    "symbol": "category",
+    "name": "string",
+    "current_price": "float64",
+    "market_cap": "float64",
+    "market_cap_rank": "Int32",
+    "fully_diluted_valuation": "float64",
+    "total_volume": "float64",
+    "high_24h": "float64",
+    "low_24h": "float64",
+    "price_change_24h": "float64",
+    "price_change_percentage_24h": "float32",
+    "market_cap_change_24h": "float64",
+    "market_cap_change_percentage_24h": "float32",
+    "circulating_supply": "float64",
+    "total_supply": "float64",
+    "max_supply": "float64",
+    "last_updated": "datetime64[ns, UTC]",
+}
+EXCHANGES_DTYPES = {
+    "id": "string",
+    "name": "string",
+    "year_established": "Int16",
+    "country": "category",
+    "has_trading_incentive": "boolean",
+    "trust_score": "Int8",
+    "trust_score_rank": "Int32",
+    "trade_volume_24h_btc": "float64",
+    "trade_volume_24h_btc_normalized": "float64",
+}
+
+# Registre des endpoints exportés en tableau : chaque endpoint est décrit par des données plutôt
+# que par sa propre fonction de construction, normalize() aplatit toutes les réponses en une seule
+# passe et un seul DataFrame. Ajouter un endpoint revient à ajouter une entrée.
+# - path: chemin relatif à API_URL_BASE, les {champs} sont remplis par endpoint_url()
+# - params: paramètres de la requête par défaut
+# - per_page: taille de page maximum des endpoints paginés (paramètres page et per_page)
+# - records: chemin (a.b) des lignes dans la réponse, une liste ou un seul objet, la réponse entière par défaut
+# - item: chemin de la ligne dans chaque élément de records
+# - meta: colonnes recopiées sur chaque ligne, {colonne: chemin depuis la racine de la réponse}
+# - flatten: dictionnaires imbriqués éclatés en colonnes <champ>_<clé>
+# - pivot: (colonne, [champs]) les dictionnaires imbriqués qui partagent les mêmes clés deviennent
+#   une ligne par clé, la clé dans la colonne et chaque champ dans sa colonne
+# - dtypes: schéma des colonnes (voir apply_dtypes), select limite le tableau à ces colonnes
+# - sheet: nom de la feuille XLSX
+ENDPOINTS = {
+    "coins_list": {
+        "path": "coins/list",
+        "params": {"include_platform": False},
+        "dtypes": {"id": "string", "symbol": "string", "name": "string"},
+        "sheet": "COINS_LIST",
+    },
+    "markets": {
+        "path": "coins/markets",
+        "params": {"vs_currency": "usd", "order": "market_cap_desc", "sparkline": False},
+        "per_page": 250,
+        "dtypes": MARKETS_DTYPES,
+        "select": True,
+        "sheet": "MARKETS",
+    },
+    "exchanges": {
+        "path": "exchanges",
+        "per_page": 250,
+        "dtypes": EXCHANGES_DTYPES,
+        "select": True,
+        "sheet": "EXCHANGES",
+    },
+    "global": {
+        "path": "global",
+        "records": "data",
+        "pivot": ("vs_currency", ["total_market_cap", "total_volume", "market_cap_percentage"]),
+        "dtypes": {
+            "vs_currency": "string",
+            "total_market_cap": "float64",
+            "total_volume": "float64",
+            "market_cap_percentage": "float32",
+            "active_cryptocurrencies": "Int32",
+            "upcoming_icos": "Int32",
+            "ongoing_icos": "Int32",
+            "ended_icos": "Int32",
+            "markets": "Int32",
+            "market_cap_change_percentage_24h_usd": "float32",
+            "updated_at": "Int64",
+        },
+        "select": True,
+        "sheet": "GLOBAL",
+    },
+    "global_defi": {
+        "path": "global/decentralized_finance_defi",
+        "records": "data",
+        "dtypes": {
+            "defi_market_cap": "float64",
+            "eth_market_cap": "float64",
+            "defi_to_eth_ratio": "float64",
+            "trading_volume_24h": "float64",
+            "defi_dominance": "float32",
+            "top_coin_name": "string",
+            "top_coin_defi_dominance": "float32",
+        },
+        "sheet": "GLOBAL_DEFI",
+    },
+    "trending": {
+        "path": "search/trending",
+        "records": "coins",
+        "item": "item",
+        "flatten": ["data"],
+        "dtypes": {
+            "id": "string",
+            "coin_id": "Int32",
+            "name": "string",
+            "symbol": "string",
+            "market_cap_rank": "Int32",
+            "slug": "string",
+            "price_btc": "float64",
+            "score": "Int8",
+            "thumb": "string",
+            "small": "string",
+            "large": "string",
+            "data_price": "float64",
+            "data_market_cap": "string",
+            "data_total_volume": "string",
+        },
+        "select": True,
+        "sheet": "TRENDING_TOP7",
+    },
+    "companies": {
+        "path": "companies/public_treasury/{coin_id}",
+        "records": "companies",
+        "meta": {
+            "treasury_total_holdings": "total_holdings",
+            "treasury_total_value_usd": "total_value_usd",
+            "treasury_market_cap_dominance": "market_cap_dominance",
+        },
+        "dtypes": {
+            "name": "string",
+            "symbol": "string",
+            "country": "category",
+            "total_holdings": "float64",
+            "total_entry_value_usd": "float64",
+            "total_current_value_usd": "float64",
+            "percentage_of_total_supply": "float32",
+            "treasury_total_holdings": "float64",
+            "treasury_total_value_usd": "float64",
+            "treasury_market_cap_dominance": "float32",
+        },
+        "select": True,
+        "sheet": "COMPANIES",
+    },
+}
+
+# Cache local des réponses de l'API (voir ResponseCache)
+# - CACHE_DIR: dossier du cache, $XDG_CACHE_HOME/pycoin ou ~/.cache/pycoin
+# - CACHE_MAX_SIZE: taille maximum en octets, les entrées les moins récemment utilisées sont supprimées
+# - CACHE_TTL: durée de validité en seconde par endpoint, un endpoint absent n'est pas mis en cache
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "pycoin")
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+CACHE_TTL = {
+    "coins/list": 24 * 3600,
+    "exchanges": 3600,
+    "companies/public_treasury": 6 * 3600,
+    "exchange_rates": 5 * 60,
+}
+
+# Dossier des points de reprise des pages de /coins/markets (voir Checkpoint)
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, "checkpoints")
+# Durée de conservation en seconde des points de reprise des exécutions interrompues ou en échec
+CHECKPOINT_MAX_AGE = 7 * 24 * 3600
+# Index des cryptos (voir CoinIndex), reconstruit depuis /coins/list après CACHE_TTL["coins/list"]
+COINS_INDEX = os.path.join(CACHE_DIR, "coins_index.bin")
+
+# Colonnes de /coins/markets exprimées dans la devise, converties par convert_markets()
+# (les pourcentages, rangs et offres ne dépendent pas de la devise)
+MARKETS_CURRENCY_COLUMNS = [
+    "current_price",
+    "market_cap",
+    "fully_diluted_valuation",
+    "total_volume",
+    "high_24h",
+    "low_24h",
+    "price_change_24h",
+    "market_cap_change_24h",
+    "sparkline_min_7d",
+    "sparkline_max_7d",
+]
+
+# Export différentiel de /coins/markets (voir market_delta et --delta)
+# - DELTA_DIR: dernier instantané de chaque devise, base de la comparaison suivante
+# - DELTA_TOLERANCE: variation relative sous laquelle une valeur décimale est considérée inchangée
+# - DELTA_IGNORE: colonnes non comparées, last_updated change à chaque relevé
+# - DELTA_VERSION: version du format JSON des instantanés, un instantané d'une autre version est ignoré
+DELTA_DIR = os.path.join(CACHE_DIR, "snapshots")
+DELTA_TOLERANCE = 0.001
+DELTA_IGNORE = ["last_updated"]
+DELTA_VERSION = 1
+
+# Mode --watch (voir WatchScheduler)
+# - WATCH_INTERVALS: intervalle en seconde entre deux mises à jour de chaque endpoint
+# - WATCH_PRIORITY: priorité de chaque endpoint, 0 la plus haute, une tâche due plus prioritaire passe toujours avant
+WATCH_INTERVALS = {"markets": 60, "global": 300, "global_defi": 300, "trending": 600}
+WATCH_PRIORITY = {"markets": 0, "global": 1, "global_defi": 2, "trending": 3}
+
+# Historique local des exécutions (voir SnapshotStore et --store)
+# - STORE_DIR: dossier de la base, $XDG_DATA_HOME/pycoin ou ~/.local/share/pycoin
+# - STORE_COMPACT_AFTER: au-delà (en seconde), seul le dernier relevé de chaque jour est gardé
+# - STORE_RETENTION: durée de conservation en jour des relevés, 0 pour tout garder
+STORE_DIR = os.path.join(os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share")), "pycoin")
+STORE_COMPACT_AFTER = 7 * 24 * 3600
+STORE_RETENTION = 365
+
 # Variable static pour la version de Pycoin
 PYCOIN_VERSION = "1.8.6"
 
+# Étapes mesurées par le Profiler, dans l'ordre du tableau de --profile :
+# - import: import différé d'une dépendance lourde (LazyModule), les threads qui l'attendent
+#   comptent aussi cette attente dans leur étape
+# - rate_limit_wait: attente imposée par le limiteur de débit avant la requête
+# - connect: résolution DNS, connexion TCP et TLS d'une nouvelle connexion du pool
+# - ttfb: envoi de la requête jusqu'aux en-têtes de la réponse (time to first byte)
+# - download: lecture du corps de la réponse
+# - retry_backoff: attente avant une nouvelle tentative (429, 5xx, timeout)
+# - json_decode, frame, sort, concat, write, merge: décodage, construction et écriture des tableaux
+PROFILE_STAGES = ["import", "rate_limit_wait", "connect", "ttfb", "download", "retry_backoff",
+                  "json_decode", "frame", "sort", "concat", "write", "merge"]
+
+
+class Profiler:
+    """
+    Durées des étapes d'une exécution, cumulées par étape et par libellé (endpoint, hôte ou fichier).
+    Les étapes sont toujours mesurées, leur coût est négligeable, --profile affiche le tableau.
+    Les étapes exécutées en parallèle (pages, formats) peuvent dépasser ensemble la durée totale.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.perf_counter()
+        self.spans = {}
+
+    def add(self, stage: str, label: str, seconds: float):
+        """
+        :param stage: Nom de l'étape (voir PROFILE_STAGES)
+        :param label: Libellé de la mesure, endpoint, hôte ou fichier
+        :param seconds: Durée mesurée
+        """
+        with self.lock:
+            span = self.spans.setdefault((stage, label), [0, 0.0, 0.0])
+            span[0] += 1
+            span[1] += seconds
+            span[2] = max(span[2], seconds)
+
+    @contextlib.contextmanager
+    def span(self, stage: str, label: str = ""):
+        """Mesure la durée du bloc with"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, label, time.perf_counter() - start)
+
+    def report(self) -> dict:
+        """
+        :return: La durée totale et la liste des étapes (count, total, max), dans l'ordre de PROFILE_STAGES
+        """
+        with self.lock:
+            spans = sorted(self.spans.items(), key=lambda span: (
+                PROFILE_STAGES.index(span[0][0]) if span[0][0] in PROFILE_STAGES else len(PROFILE_STAGES),
+                -span[1][1]
+            ))
+        return {
+            "wall": time.perf_counter() - self.started,
+            "stages": [{"stage": stage, "label": label, "count": count, "total": total, "max": maximum}
+                       for (stage, label), (count, total, maximum) in spans],
+        }
+
+    def table(self) -> str:
+        """
+        :return: Le tableau des étapes, avec la part de chaque étape dans la durée totale
+        """
+        report = self.report()
+        lines = [f"{'stage':<16} {'label':<36} {'count':>6} {'total':>10} {'mean':>10} {'max':>10} {'wall':>7}"]
+        for span in report["stages"]:
+            lines.append(
+                f"{span['stage']:<16} {span['label'][:36]:<36} {span['count']:>6} "
+                f"{span['total']:>9.3f}s {span['total'] / span['count'] * 1000:>8.1f}ms "
+                f"{span['max'] * 1000:>8.1f}ms {span['total'] / report['wall']:>7.1%}"
+            )
+        lines.append(f"Wall time {report['wall']:.3f}s, stages run in parallel threads can add up to more")
+        return "\n".join(lines)
+
+
+# Profiler unique de l'exécution
+PROFILER = Profiler()
+
+# Métriques Prometheus (voir Metrics)
+# - METRICS_BUCKETS: bornes en seconde des histogrammes de latence
+# - METRICS_HOST: adresse d'écoute de --metrics-port, locale par défaut
+# - METRICS_HELP: type et description de chaque métrique, dans l'ordre du fichier
+METRICS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_HOST = "127.0.0.1"
+METRICS_HELP = {
+    "pycoin_requests_total": ("counter", "HTTP requests sent to the API by endpoint, status code and currency"),
+    "pycoin_request_duration_seconds": ("histogram", "Duration of the HTTP requests, headers and body"),
+    "pycoin_response_bytes_total": ("counter", "Bytes downloaded from the API, as received on the wire"),
+    "pycoin_retries_total": ("counter", "Retries on 429, 5xx, timeout and connection errors"),
+    "pycoin_cache_hits_total": ("counter", "Responses served by the local cache without a request"),
+    "pycoin_export_duration_seconds": ("histogram", "Duration of each file write by export and format"),
+    "pycoin_export_bytes_total": ("counter", "Bytes written by export and format"),
+    "pycoin_watch_updates_total": ("counter", "Updates of the --watch mode by job and result"),
+    "pycoin_watch_last_update_timestamp_seconds": ("gauge", "Unix time of the last successful update by job"),
+    "pycoin_stage_seconds_total": ("counter", "Time spent per stage and label (see --profile)"),
+    "pycoin_stage_calls_total": ("counter", "Number of measures per stage and label (see --profile)"),
+    "pycoin_run_duration_seconds": ("gauge", "Duration of the run so far"),
+    "pycoin_last_run_timestamp_seconds": ("gauge", "Unix time at which the metrics were written"),
+}
+
+
+class Metrics:
+    """
+    Compteurs, jauges et histogrammes au format texte de Prometheus, sans dépendance.
+    Les valeurs sont cumulées pour toute l'exécution, les étapes du Profiler sont ajoutées au rendu.
+    """
+
+    def __init__(self, buckets: tuple = METRICS_BUCKETS):
+        """
+        :param buckets: Bornes supérieures des histogrammes, en seconde
+        """
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.values = {}
+        self.histograms = {}
+        # Dernières valeurs du Profiler reportées dans les compteurs des étapes (voir _advance)
+        self.profiled = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, labels: dict, value: float = 1.0):
+        """Ajoute value au compteur name"""
+        key = self._key(name, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def set(self, name: str, labels: dict, value: float):
+        """Remplace la valeur de la jauge name"""
+        with self.lock:
+            self.values[self._key(name, labels)] = value
+
+    def _advance(self, name: str, labels: dict, total: float):
+        """
+        Reporte dans le compteur name l'augmentation de la valeur cumulée total depuis le rendu précédent :
+        le compteur ne diminue jamais, même si la source repart de zéro
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            previous = self.profiled.get(key, 0.0)
+            self.values[key] = self.values.get(key, 0.0) + (total - previous if total >= previous else total)
+            self.profiled[key] = total
+
+    def observe(self, name: str, labels: dict, value: float):
+        """Ajoute une mesure à l'histogramme name"""
+        key = self._key(name, labels)
+        with self.lock:
+            # Compte par borne (non cumulé), puis somme et nombre de mesures
+            histogram = self.histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @staticmethod
+    def _labels(labels, **extra) -> str:
+        labels = [*labels, *extra.items()]
+        if not labels:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                   for _, value in labels)
+        return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + "}"
+
+    def render(self) -> str:
+        """
+        :return: Les métriques au format texte de Prometheus (version 0.0.4)
+        """
+        report = PROFILER.report()
+        for span in report["stages"]:
+            labels = {"stage": span["stage"], "label": span["label"]}
+            self._advance("pycoin_stage_seconds_total", labels, span["total"])
+            self._advance("pycoin_stage_calls_total", labels, span["count"])
+        self.set("pycoin_run_duration_seconds", {}, report["wall"])
+        self.set("pycoin_last_run_timestamp_seconds", {}, time.time())
+
+        lines = []
+        with self.lock:
+            for name, (kind, description) in METRICS_HELP.items():
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+                if kind == "histogram":
+                    for (key_name, labels), histogram in sorted(self.histograms.items()):
+                        if key_name != name:
+                            continue
+                        cumulative = 0
+                        for bound, count in zip(self.buckets, histogram):
+                            cumulative += count
+                            lines.append(f"{name}_bucket{self._labels(labels, le=f'{bound:g}')} {cumulative}")
+                        lines.append(f"{name}_bucket{self._labels(labels, le='+Inf')} {histogram[-1]}")
+                        lines.append(f"{name}_sum{self._labels(labels)} {histogram[-2]}")
+                        lines.append(f"{name}_count{self._labels(labels)} {histogram[-1]}")
+                else:
+                    for (key_name, labels), value in sorted(self.values.items()):
+                        if key_name == name:
+                            lines.append(f"{name}{self._labels(labels)} {value:.15g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """
+        Écriture atomique du fichier texte, pour le "textfile collector" de node_exporter
+        :param path: Chemin du fichier, par exemple /var/lib/node_exporter/pycoin.prom
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", dir=directory, suffix=".tmp",
+                                         delete=False) as metrics_file:
+            metrics_file.write(self.render())
+        # NamedTemporaryFile crée le fichier en 0600, illisible par un node_exporter lancé sous un autre utilisateur
+        os.chmod(metrics_file.name, 0o644)
+        os.replace(metrics_file.name, path)
+
+    def serve(self, port: int, host: str = METRICS_HOST):
+        """
+        Expose /metrics en HTTP dans un thread, pour le mode --watch
+        :param port: Port d'écoute
+        :param host: Adresse d'écoute
+        :return: Le serveur HTTP démarré
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if urlsplit(self.path).path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Métriques uniques de l'exécution
+METRICS = Metrics()
+
+
+def elapsed(started: float) -> str:
+    """
+    :param started: Début de la commande, time.perf_counter()
+    :return: Le temps écoulé depuis started, formaté en seconde
+    """
+    return "{:,.2f}secs".format(time.perf_counter() - started)
+
+
+def profile_report(path: str = "-"):
+    """
+    Affiche le tableau du Profiler ou l'enregistre en JSON
+    :param path: Fichier JSON du rapport, "-" pour afficher le tableau
+    """
+    if path == "-":
+        return print(PROFILER.table())
+    write_json(path, PROFILER.report())
+    return print(f"Profile written to {path}")
+
+
+def endpoint_name(url: str) -> str:
+    """
+    :param url: URL complète de la requête
+    :return: Le chemin de l'endpoint sans l'URL de base ni la query string, ex: coins/markets
+    """
+    path = urlsplit(url).path
+    base = urlsplit(API_URL_BASE).path
+    return path[len(base):] if path.startswith(base) else path.lstrip("/")
+
+
+class _CountingPoolMixin:
+    """
+    Compte le nombre d'utilisations de chaque connexion d'un pool urllib3.
+    Une connexion utilisée plus d'une fois a été réutilisée (keep-alive).
+    """
+
+    _conn_ids = itertools.count(1)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pycoin_lock = threading.Lock()
+        self.pycoin_uses = {}
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.pycoin_label = f"{self.host}#{next(self._conn_ids)}"
+
+        # DNS, TCP et TLS sont mesurés ensemble, la durée est aussi retirée du TTFB de la requête
+        connect = conn.connect
+        host = self.host
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                connect()
+            finally:
+                seconds = time.perf_counter() - start
+                PROFILER.local.connect = getattr(PROFILER.local, "connect", 0.0) + seconds
+                PROFILER.add("connect", host, seconds)
+
+        conn.connect = timed_connect
+        return conn
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        with self.pycoin_lock:
+            label = conn.pycoin_label
+            self.pycoin_uses[label] = self.pycoin_uses.get(label, 0) + 1
+        return conn
+
+
+# Classe de l'adaptateur requests, créée au premier appel de counting_adapter()
+_COUNTING_ADAPTER = None
+
+
+def counting_adapter(pool_size: int = REQ_POOL_SIZE):
+    """
+    Adaptateur requests dont les pools comptent la réutilisation des connexions.
+    Les classes héritent de requests/urllib3, elles sont donc définies au premier appel.
+    :param pool_size: Nombre maximum de connexions gardées ouvertes par hôte
+    :return: Une instance de l'adaptateur
+    """
+    global _COUNTING_ADAPTER
+    if _COUNTING_ADAPTER is None:
+        from requests.adapters import HTTPAdapter
+        from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+        class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+            pass
+
+        class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+            pass
+
+        class _CountingAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {
+                    "http": _CountingHTTPConnectionPool,
+                    "https": _CountingHTTPSConnectionPool,
+                }
+
+        _COUNTING_ADAPTER = _CountingAdapter
+
+    return _COUNTING_ADAPTER(pool_connections=pool_size, pool_maxsize=pool_size)
+
+
+class RateLimiter:
+    """
+    Limiteur de débit "token bucket" partagé par toutes les requêtes.
+    Le seau est plein au démarrage, la première requête ne dort donc jamais.
+    Le débit est divisé par deux à chaque réponse 429 et remonte progressivement
+    après REQ_RATE_RECOVERY réponses réussies consécutives.
+    """
+
+    def __init__(self, rate_limit: int = REQ_RATE_LIMIT, burst: int = None):
+        """
+        :param rate_limit: Nombre de requêtes par minute autorisées
+        :param burst: Taille maximum d'une rafale, par défaut égale à rate_limit
+        """
+        self.max_rate = rate_limit / 60
+        self.min_rate = 1 / 60
+        self.rate = self.max_rate
+        self.capacity = float(burst or rate_limit)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.success_streak = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait: float = None) -> float:
+        """
+        Réserve un jeton et attend si le seau est vide
+        :param max_wait: Plafond en seconde du temps d'attente (option --time)
+        :return: Le temps d'attente en seconde
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = max(self.tokens - 1, -self.capacity)
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            if max_wait is not None:
+                wait = min(wait, max_wait)
+            self.waited += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def available(self) -> float:
+        """
+        :return: Le nombre de jetons disponibles sans attendre
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+    def penalize(self):
+        """Réponse 429 (TooManyRequests) : ralentit le débit et vide le seau"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            self.success_streak = 0
+            self.throttled += 1
+
+    def reward(self):
+        """Réponse réussie : ré-accélère après une série de succès"""
+        with self.lock:
+            self.success_streak += 1
+            if self.success_streak >= REQ_RATE_RECOVERY and self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+                self.success_streak = 0
+
+    def stats(self) -> dict:
+        """
+        :return: Le débit actuel en requêtes par minute, le nombre de 429 et le temps total d'attente
+        """
+        with self.lock:
+            return {
+                "rate_per_minute": self.rate * 60,
+                "throttled": self.throttled,
+                "waited": self.waited,
+            }
+
+
+def retry_after(response: requests.Response) -> float:
+    """
+    Lecture de l'en-tête Retry-After, en secondes ou au format date HTTP
+    :param response: La réponse requests
+    :return: Le délai en seconde demandé par le server, ou None
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    import email.utils
+
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_date.timestamp() - time.time())
+
+
+class ResponseCache:
+    """
+    Cache local (SQLite) des réponses de l'API, indexé par l'URL et ses paramètres.
+    Chaque endpoint a sa propre durée de validité (CACHE_TTL), la taille totale est
+    bornée et les entrées les moins récemment utilisées sont supprimées en premier (LRU).
+    Une entrée expirée est revalidée avec son ETag / Last-Modified plutôt que re-téléchargée.
+    """
+
+    def __init__(
+            self,
+            path: str = CACHE_DIR,
+            max_size: int = CACHE_MAX_SIZE,
+            ttl: dict = None,
+            refresh: bool = False
+    ):
+        """
+        :param path: Dossier du cache
+        :param max_size: Taille maximum du cache en octets
+        :param ttl: Durée de validité en seconde par endpoint, par défaut CACHE_TTL
+        :param refresh: Ignore les entrées du cache mais enregistre les nouvelles réponses
+        """
+        self.max_size = max_size
+        self.ttl = dict(CACHE_TTL if ttl is None else ttl)
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.revalidations = 0
+        self.fetches = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(path, "cache.sqlite"), check_same_thread=False, timeout=30)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+
+    def endpoint_ttl(self, url: str) -> int:
+        """
+        :param url: URL complète de la requête
+        :return: La durée de validité en seconde de l'endpoint, 0 si l'endpoint n'est pas mis en cache
+        """
+        path = urlsplit(url).path.rstrip("/") + "/"
+        for endpoint, ttl in self.ttl.items():
+            if f"/{endpoint}/" in path:
+                return ttl
+        return 0
+
+    @staticmethod
+    def key(url: str, params: dict = None) -> str:
+        """
+        Clé du cache : l'URL sans sa "query string" et tous les paramètres triés
+        :param url: URL complète de la requête
+        :param params: Paramètres supplémentaires de la requête
+        :return: L'empreinte sha256 de l'URL normalisée
+        """
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        query += [(str(name), str(value)) for name, value in (params or {}).items()]
+        normalized = f"{parts.scheme}://{parts.netloc}{parts.path}?{urlencode(sorted(query))}"
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _count(self, **counters):
+        self.db.executemany(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            counters.items()
+        )
+
+    @staticmethod
+    def _response(url: str, headers: str, body: bytes, stored_at: float) -> requests.Response:
+        """Reconstruit une réponse requests à partir d'une entrée du cache"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = requests.structures.CaseInsensitiveDict(json.loads(headers))
+        response._content = body
+        response.encoding = "utf-8"
+        response.from_cache = True
+        # Date du téléchargement du contenu, inchangé depuis (voir outputs_up_to_date)
+        response.cached_at = stored_at
+        return response
+
+    def lookup(self, url: str, params: dict = None) -> requests.Response:
+        """
+        :param url: URL complète de la requête
+        :param params: Paramètres supplémentaires de la requête
+        :return: La réponse du cache encore valide, ou None
+        """
+        if self.refresh or not self.endpoint_ttl(url):
+            return None
+
+        now = time.time()
+        key = self.key(url, params)
+        with self.lock, self.db:
+            row = self.db.execute(
+                "SELECT headers, body, stored_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                self._count(misses=1)
+                return None
+
+            self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self.bytes_saved += len(row[1])
+            self._count(hits=1, bytes_saved=len(row[1]))
+
+        return self._response(url, *row)
+
+    def validators(self, url: str, params: dict = None) -> dict:
+        """
+        En-têtes de revalidation conditionnelle d'une entrée expirée
+        :param url: URL complète de la requête
+        :param params: Paramètres supplémentaires de la requête
+        :return: Les en-têtes If-None-Match / If-Modified-Since, vide si aucune entrée ne peut être revalidée
+        """
+        if self.refresh or not self.endpoint_ttl(url):
+            return {}
+
+        with self.lock:
+            row = self.db.execute("SELECT headers FROM responses WHERE key = ?", (self.key(url, params),)).fetchone()
+        if row is None:
+            return {}
+
+        headers = requests.structures.CaseInsensitiveDict(json.loads(row[0]))
+        conditional = {}
+        if "ETag" in headers:
+            conditional["If-None-Match"] = headers["ETag"]
+        if "Last-Modified" in headers:
+            conditional["If-Modified-Since"] = headers["Last-Modified"]
+        return conditional
+
+    def revalidated(self, url: str, params: dict = None) -> requests.Response:
+        """
+        Réponse 304 (Not Modified) : prolonge la validité de l'entrée sans télécharger le contenu
+        :param url: URL complète de la requête
+        :param params: Paramètres supplémentaires de la requête
+        :return: La réponse du cache, ou None si l'entrée a été supprimée entre-temps
+        """
+        now = time.time()
+        key = self.key(url, params)
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (now + self.endpoint_ttl(url), now, key)
+            )
+            row = self.db.execute("SELECT headers, body, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            self.revalidations += 1
+            self.bytes_saved += len(row[1])
+            self._count(revalidations=1, bytes_saved=len(row[1]))
+
+        return self._response(url, *row)
+
+    def store(self, url: str, response: requests.Response, params: dict = None):
+        """
+        Enregistre une réponse 200 si l'endpoint est mis en cache, puis applique la limite de taille
+        :param url: URL complète de la requête
+        :param response: La réponse requests
+        :param params: Paramètres supplémentaires de la requête
+        """
+        ttl = self.endpoint_ttl(url)
+        if not ttl or response.status_code != 200:
+            return
+
+        now = time.time()
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() in ("content-type", "date", "etag", "last-modified")}
+        with self.lock, self.db:
+            self.fetches += 1
+            self._count(fetches=1)
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(url, params), url, json.dumps(headers), response.content,
+                 len(response.content), now, now + ttl, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_size"""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_size:
+                break
+
+    def stats(self) -> dict:
+        """
+        :return: Les compteurs cumulés du cache (toutes exécutions confondues) et de l'exécution en cours
+        """
+        with self.lock:
+            totals = dict(self.db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+        hits, misses = totals.get("hits", 0), totals.get("misses", 0)
+        return {
+            "entries": entries,
+            "size": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "bytes_saved": totals.get("bytes_saved", 0),
+            "revalidations": totals.get("revalidations", 0),
+            "fetches": totals.get("fetches", 0),
+            "run_hits": self.hits,
+            "run_misses": self.misses,
+            "run_bytes_saved": self.bytes_saved,
+            "run_revalidations": self.revalidations,
+            "run_fetches": self.fetches,
+        }
+
+
+class SingleFlight:
+    """
+    Regroupement des requêtes identiques ("single-flight") : les appels simultanés
+    ou répétés pour une même clé partagent une seule exécution et son résultat.
+    Le résultat partagé ne doit pas être modifié par les appelants.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+    def do(self, key: str, function, memo: bool = True):
+        """
+        :param key: Clé de la requête
+        :param function: Fonction sans argument exécutée une seule fois par clé
+        :param memo: Garde le résultat pour les appels suivants de l'exécution, sinon seuls les appels simultanés le partagent
+        :return: Le résultat de la fonction
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            owner = future is None
+            if owner:
+                future = self.calls[key] = Future()
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = function()
+        except BaseException as error:
+            with self.lock:
+                self.calls.pop(key, None)
+            future.set_exception(error)
+            raise
+
+        future.set_result(result)
+        if not memo:
+            with self.lock:
+                self.calls.pop(key, None)
+        return result
+
+    def forget(self):
+        """Oublie les résultats gardés, les prochains appels refont la requête"""
+        with self.lock:
+            self.calls = {key: future for key, future in self.calls.items() if not future.done()}
+
+
+class HttpClient:
+    """
+    Client HTTP partagé par toutes les fonctions de l'API CoinGecko.
+    Une seule session requests garde les connexions TCP+TLS ouvertes (keep-alive)
+    entre les requêtes au lieu d'ouvrir une nouvelle connexion à chaque appel.
+    """
+
+    def __init__(
+            self,
+            pool_size: int = REQ_POOL_SIZE,
+            rate_limit: int = REQ_RATE_LIMIT,
+            retry_budget: int = REQ_RETRY_BUDGET,
+            cache: ResponseCache = None,
+            connect_timeout: float = REQ_CONNECT_TIMEOUT,
+            read_timeout: float = REQ_READ_TIMEOUT
+    ):
+        """
+        :param pool_size: Nombre maximum de connexions gardées ouvertes par hôte
+        :param rate_limit: Nombre de requêtes par minute autorisées (RateLimiter)
+        :param retry_budget: Nombre total de nouvelles tentatives pour toute l'exécution
+        :param cache: Cache local des réponses, None pour désactiver le cache
+        :param connect_timeout: Temps d'attente en seconde pour établir la connexion
+        :param read_timeout: Temps d'attente en seconde pour la réponse du server
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.limiter = RateLimiter(rate_limit=rate_limit)
+        self.retry_budget = retry_budget
+        self.retries = 0
+        self.retry_lock = threading.Lock()
+        self.cache = cache
+        self.flight = SingleFlight()
+        self.adapter = counting_adapter(pool_size=pool_size)
+
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        # Le décodage "br" par urllib3 n'est possible que si brotli est installé
+        accept_encoding = "gzip, deflate"
+        if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+            accept_encoding += ", br"
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": accept_encoding,
+            "User-Agent": f"pycoin/{PYCOIN_VERSION}",
+        })
+
+    def new_cycle(self):
+        """
+        Nouveau cycle du mode --watch : les réponses gardées par le single-flight sont oubliées
+        et le budget de nouvelles tentatives est rendu, le pool, le limiteur et le cache sont conservés.
+        """
+        self.flight.forget()
+        with self.retry_lock:
+            self.retries = 0
+
+    def _take_retry(self) -> bool:
+        """Consomme une nouvelle tentative du budget de l'exécution, False si épuisé"""
+        with self.retry_lock:
+            if self.retries >= self.retry_budget:
+                return False
+            self.retries += 1
+            return True
+
+    def get(self, url: str, max_wait: float = None, retry: bool = True, **kwargs) -> requests.Response:
+        """
+        Requête GET au travers du cache local, du limiteur de débit et du pool de connexions.
+        :param url: URL complète de la requête
+        :param max_wait: Plafond en seconde de l'attente imposée par le limiteur
+        :param retry: Retente les erreurs 429/5xx et les timeouts, False pour échouer immédiatement (/ping)
+        :param kwargs: Arguments transmis à requests.Session.get (params, headers, etc)
+        :return: La réponse requests, celle du cache si elle est encore valide
+        """
+        if self.cache is None:
+            return self._send(url, max_wait=max_wait, retry=retry, **kwargs)
+
+        params = kwargs.get("params")
+        response = self.cache.lookup(url, params)
+        if response is not None:
+            METRICS.inc("pycoin_cache_hits_total", {"endpoint": endpoint_name(url)})
+            return response
+
+        # Entrée expirée : requête conditionnelle, le server répond 304 si rien n'a changé
+        conditional = self.cache.validators(url, params)
+        if conditional:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **conditional}
+
+        response = self._send(url, max_wait=max_wait, retry=retry, **kwargs)
+        if response.status_code == 304:
+            cached = self.cache.revalidated(url, params)
+            if cached is not None:
+                return cached
+
+            # Entrée supprimée entre-temps : téléchargement complet
+            kwargs["headers"] = {name: value for name, value in kwargs["headers"].items()
+                                 if name not in conditional}
+            response = self._send(url, max_wait=max_wait, retry=retry, **kwargs)
+
+        self.cache.store(url, response, params)
+        return response
+
+    def fetch(self, url: str, max_wait: float = None, memo: bool = True, **kwargs) -> tuple:
+        """
+        Requête GET partagée : une seule requête et un seul décodage JSON par URL,
+        même pour des appels simultanés (threads) ou répétés pendant l'exécution.
+        :param url: URL complète de la requête
+        :param max_wait: Plafond en seconde de l'attente imposée par le limiteur
+        :param memo: Garde le résultat pour les appels suivants, False pour les réponses volumineuses lues une seule fois
+        :param kwargs: Arguments transmis à requests.Session.get (params, headers, etc)
+        :return: Le tuple (réponse requests, JSON décodé)
+        """
+        def request():
+            response = self.get(url, max_wait=max_wait, **kwargs)
+            with PROFILER.span("json_decode", endpoint_name(url)):
+                return response, response.json()
+
+        return self.flight.do(ResponseCache.key(url, kwargs.get("params")), request, memo=memo)
+
+    def get_json(self, url: str, max_wait: float = None, memo: bool = True, **kwargs):
+        """
+        :param url: URL complète de la requête
+        :param max_wait: Plafond en seconde de l'attente imposée par le limiteur
+        :param memo: Garde le résultat pour les appels suivants de l'exécution
+        :param kwargs: Arguments transmis à requests.Session.get (params, headers, etc)
+        :return: Le JSON décodé de la réponse, partagé (voir fetch)
+        """
+        return self.fetch(url, max_wait=max_wait, memo=memo, **kwargs)[1]
+
+    def _send(self, url: str, max_wait: float = None, retry: bool = True, **kwargs) -> requests.Response:
+        """
+        Requête GET au travers du limiteur de débit et du pool de connexions.
+        Les réponses 429/5xx et les timeouts sont retentés avec un délai exponentiel
+        aléatoire (jitter), en respectant l'en-tête Retry-After et le budget de l'exécution.
+        :param url: URL complète de la requête
+        :param max_wait: Plafond en seconde de l'attente imposée par le limiteur
+        :param retry: Retente les erreurs 429/5xx et les timeouts
+        :param kwargs: Arguments transmis à requests.Session.get (params, headers, etc)
+        :return: La réponse requests
+        :raise requests.HTTPError: Réponse 429/5xx toujours en erreur après les nouvelles tentatives
+        :raise requests.RequestException: Timeout ou erreur de connexion après les nouvelles tentatives
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        endpoint = endpoint_name(url)
+        labels = {"endpoint": endpoint, "currency": dict(parse_qsl(urlsplit(url).query)).get("vs_currency", "")}
+        max_retries = REQ_RETRY_MAX if retry else 0
+        for attempt in range(max_retries + 1):
+            PROFILER.add("rate_limit_wait", endpoint, self.limiter.acquire(max_wait=max_wait))
+            try:
+                PROFILER.local.connect = 0.0
+                start = time.perf_counter()
+                response = self.session.get(url, **kwargs)
+
+                # response.elapsed : de l'envoi de la requête aux en-têtes, connexion comprise
+                headers_at = response.elapsed.total_seconds()
+                PROFILER.add("ttfb", endpoint, max(headers_at - PROFILER.local.connect, 0.0))
+                PROFILER.add("download", endpoint, max(time.perf_counter() - start - headers_at, 0.0))
+
+            except (requests.ConnectionError, requests.Timeout) as error_request:
+                status = "timeout" if isinstance(error_request, requests.Timeout) else "error"
+                METRICS.inc("pycoin_requests_total", {**labels, "status": status})
+                METRICS.observe("pycoin_request_duration_seconds", labels, time.perf_counter() - start)
+                if attempt == max_retries or not self._take_retry():
+                    raise
+                METRICS.inc("pycoin_retries_total", {"endpoint": endpoint, "reason": status})
+                delay = None
+
+            else:
+                # Octets reçus sur le réseau (compressés), sinon la taille du corps décodé
+                received = response.raw.tell() if hasattr(response.raw, "tell") else 0
+                METRICS.inc("pycoin_requests_total", {**labels, "status": str(response.status_code)})
+                METRICS.observe("pycoin_request_duration_seconds", labels, time.perf_counter() - start)
+                METRICS.inc("pycoin_response_bytes_total", labels, received or len(response.content))
+
+                if response.status_code == 429:
+                    self.limiter.penalize()
+                elif response.ok:
+                    self.limiter.reward()
+
+                if response.status_code not in REQ_RETRY_STATUS:
+                    return response
+                if attempt == max_retries or not self._take_retry():
+                    response.raise_for_status()
+                METRICS.inc("pycoin_retries_total", {"endpoint": endpoint, "reason": str(response.status_code)})
+                delay = retry_after(response)
+
+            # Délai exponentiel avec "full jitter", au moins égal au Retry-After
+            backoff = random.uniform(0, min(REQ_RETRY_MAX_DELAY, REQ_RETRY_BACKOFF * 2 ** attempt))
+            PROFILER.add("retry_backoff", endpoint, max(backoff, delay or 0.0))
+            time.sleep(max(backoff, delay or 0.0))
+
+    def stats(self) -> dict:
+        """
+        Compteurs de réutilisation des connexions du pool
+        :return: Le nombre de connexions ouvertes, de requêtes, de réutilisations et le détail par connexion
+        """
+        per_connection = {}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            with pool.pycoin_lock:
+                per_connection.update(pool.pycoin_uses)
+
+        nb_requests = sum(per_connection.values())
+        return {
+            "connections": len(per_connection),
+            "requests": nb_requests,
+            "reused": nb_requests - len(per_connection),
+            "per_connection": per_connection,
+            "retries": self.retries,
+            "retry_budget": self.retry_budget,
+            "shared": self.flight.shared,
+            **self.limiter.stats(),
+        }
+
+    def close(self):
+        """Ferme toutes les connexions du pool"""
+        self.session.close()
+
+
+# Client HTTP unique, créé au premier appel de http_client()
+_HTTP_CLIENT = None
+_HTTP_CLIENT_LOCK = threading.Lock()
+
+
+def set_api_url(url: str):
+    """
+    Remplace l'URL de base de l'API et les URL statiques qui en dépendent
+    :param url: URL de base, ex: http://127.0.0.1:8000/api/v3/
+    """
+    global API_URL_BASE, API_PING, EXCHANGE_RATES
+    API_URL_BASE = url.rstrip("/") + "/"
+    API_PING = f"{API_URL_BASE}ping"
+    EXCHANGE_RATES = f"{API_URL_BASE}exchange_rates"
+
+
+def endpoint_url(endpoint: str, **params) -> str:
+    """
+    URL d'un endpoint du registre ENDPOINTS, depuis l'URL de base courante (voir set_api_url)
+    :param endpoint: Nom de l'endpoint, ex: "markets"
+    :param params: Champs du chemin ({coin_id}) et paramètres de la requête, qui remplacent ceux par défaut
+    :return: L'URL complète, les booléens en minuscules et la première page des endpoints paginés
+    """
+    spec = ENDPOINTS[endpoint]
+    path = spec["path"].format(**params)
+    query = {**spec.get("params", {}), **{key: value for key, value in params.items() if f"{{{key}}}" not in spec["path"]}}
+    if spec.get("per_page"):
+        query = {"per_page": spec["per_page"], "page": 1, **query}
+
+    query = {key: str(value).lower() if isinstance(value, bool) else value for key, value in query.items()}
+    return f"{API_URL_BASE}{path}?{urlencode(query)}" if query else f"{API_URL_BASE}{path}"
+
+
+def http_client(
+        pool_size: int = REQ_POOL_SIZE,
+        rate_limit: int = REQ_RATE_LIMIT,
+        retry_budget: int = REQ_RETRY_BUDGET,
+        cache: ResponseCache = None,
+        read_timeout: float = REQ_READ_TIMEOUT
+) -> HttpClient:
+    """
+    Retourne le client HTTP partagé par toutes les fonctions, il est créé une seule fois.
+    Les paramètres ne sont utilisés qu'à la création du client.
+    :param pool_size: Taille du pool de connexions
+    :param rate_limit: Nombre de requêtes par minute
+    :param retry_budget: Nombre total de nouvelles tentatives pour toute l'exécution
+    :param cache: Cache local des réponses, None pour désactiver le cache
+    :param read_timeout: Temps d'attente en seconde pour la réponse du server
+    :return: Le client HttpClient
+    """
+    global _HTTP_CLIENT
+    with _HTTP_CLIENT_LOCK:
+        if _HTTP_CLIENT is None:
+            _HTTP_CLIENT = HttpClient(
+                pool_size=pool_size,
+                rate_limit=rate_limit,
+                retry_budget=retry_budget,
+                cache=cache,
+                read_timeout=read_timeout
+            )
+        return _HTTP_CLIENT
+
+
+def cache_report(cache: ResponseCache):
+    """
+    Affiche le rapport du cache local : taux de réussite et octets économisés
+    :param cache: Le cache local des réponses
+    :return: Affiche les compteurs cumulés du cache
+    """
+    cache_stats = cache.stats()
+    return print(
+        f"Cache entries : {cache_stats['entries']} ({cache_stats['size'] / 1024 / 1024:,.2f} MB)\n"
+        f"Hit ratio : {cache_stats['hit_ratio']:.1%} "
+        f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)\n"
+        f"Bytes saved : {cache_stats['bytes_saved'] / 1024 / 1024:,.2f} MB\n"
+        f"Revalidations : {cache_stats['revalidations']} (304), full fetches : {cache_stats['fetches']}\n"
+        f"This run : {cache_stats['run_hits']} hits, {cache_stats['run_revalidations']} revalidations, "
+        f"{cache_stats['run_fetches']} full fetches"
+    )
+
+
+def outputs_up_to_date(name: str, extension: list, response: requests.Response) -> bool:
+    """
+    Vérifie si les fichiers de sortie ont été créés après le téléchargement du contenu de la réponse,
+    une réponse du cache ou revalidée (304) inchangée ne nécessite alors pas de reconstruire le DataFrame.
+    :param name: Nom des fichiers de sortie
+    :param extension: Extensions des fichiers de sortie
+    :param response: La réponse requests
+    :return: True si tous les fichiers existent et sont plus récents que le contenu de la réponse
+    """
+    cached_at = getattr(response, "cached_at", None)
+    if cached_at is None:
+        return False
+
+    for ext in extension:
+        file_name = f"{name}.{ext}"
+        if not os.path.exists(file_name) or os.path.getmtime(file_name) < cached_at:
+            return False
+    return True
+
+
+def parse_cache_ttl(value: str) -> tuple:
+    """
+    Lecture d'une option --cache-ttl au format endpoint=secondes
+    :param value: Valeur de l'option, par exemple "coins/list=86400"
+    :return: Le tuple (endpoint, secondes)
+    """
+    endpoint, _, seconds = value.partition("=")
+    try:
+        return endpoint.strip("/"), int(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid endpoint=seconds value: '{value}'")
+
+
+def parse_tolerance(value: str) -> tuple:
+    """
+    Lecture d'une option --tolerance au format colonne=variation ou variation pour toutes les colonnes
+    :param value: Valeur de l'option, par exemple "current_price=0.0001" ou "0.005"
+    :return: Le tuple (colonne, variation relative), la colonne "*" désigne toutes les colonnes
+    """
+    column, _, tolerance = value.rpartition("=")
+    try:
+        return column or "*", float(tolerance)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid column=tolerance value: '{value}'")
+
+
+class Checkpoint:
+    """
+    Point de reprise d'une récupération des pages de /coins/markets.
+    Chaque page est enregistrée dès son arrivée dans un dossier propre à la devise,
+    à l'ordre de tri, au sparkline et à l'identifiant de l'exécution, une exécution interrompue
+    peut ainsi être reprise (--resume) sans redemander les pages déjà récupérées.
+    Les pages sans sparkline ne sont jamais reprises par une exécution avec --sparkline, et inversement.
+    """
+
+    def __init__(
+            self,
+            vs_currencies: str = "usd",
+            order: str = "market_cap_desc",
+            run_id: str = None,
+            path: str = CHECKPOINT_DIR,
+            sparkline: bool = False
+    ):
+        """
+        :param vs_currencies: Devise des données de marché
+        :param order: Ordre de tri des pages
+        :param run_id: Identifiant de l'exécution, par défaut la date et l'heure actuelle suivies du pid
+        et d'un suffixe aléatoire : deux exécutions lancées dans la même seconde ont chacune leur dossier
+        :param path: Dossier des points de reprise
+        :param sparkline: Les pages contiennent le sparkline des 7 derniers jours
+        """
+        self.run_id = run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{os.urandom(2).hex()}"
+        self.directory = os.path.join(path, self.prefix(vs_currencies, order, sparkline) + self.run_id)
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def prefix(vs_currencies: str, order: str, sparkline: bool) -> str:
+        """
+        :return: Le début du nom des dossiers des exécutions de mêmes paramètres
+        """
+        return f"{vs_currencies}-{order}-{'sparkline' if sparkline else 'nosparkline'}-"
+
+    @classmethod
+    def resume(
+            cls,
+            vs_currencies: str = "usd",
+            order: str = "market_cap_desc",
+            run_id: str = "latest",
+            path: str = CHECKPOINT_DIR,
+            sparkline: bool = False
+    ):
+        """
+        :param vs_currencies: Devise des données de marché
+        :param order: Ordre de tri des pages
+        :param run_id: Identifiant de l'exécution à reprendre, "latest" pour la plus récente
+        :param path: Dossier des points de reprise
+        :param sparkline: Reprend seulement une exécution de même sparkline
+        :return: Le point de reprise, ou None si aucune exécution ne peut être reprise
+        """
+        prefix = cls.prefix(vs_currencies, order, sparkline)
+        if run_id == "latest":
+            runs = sorted(entry for entry in os.listdir(path) if entry.startswith(prefix)) \
+                if os.path.isdir(path) else []
+            if not runs:
+                return None
+            run_id = runs[-1][len(prefix):]
+
+        elif not os.path.isdir(os.path.join(path, prefix + run_id)):
+            return None
+
+        return cls(vs_currencies=vs_currencies, order=order, run_id=run_id, path=path, sparkline=sparkline)
+
+    @staticmethod
+    def prune(max_age: float = CHECKPOINT_MAX_AGE, path: str = CHECKPOINT_DIR, now: float = None) -> int:
+        """
+        Supprime les points de reprise des exécutions interrompues ou en échec jamais reprises
+        :param max_age: Âge en seconde depuis la dernière page enregistrée au-delà duquel un point de reprise est supprimé
+        :param path: Dossier des points de reprise
+        :param now: Date de référence (timestamp UNIX), par défaut maintenant
+        :return: Le nombre de points de reprise supprimés
+        """
+        if not os.path.isdir(path):
+            return 0
+
+        now = time.time() if now is None else now
+        removed = 0
+        for entry in os.listdir(path):
+            directory = os.path.join(path, entry)
+            if os.path.isdir(directory) and now - os.path.getmtime(directory) > max_age:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _page_path(self, page: int) -> str:
+        return os.path.join(self.directory, f"page-{page}.json")
+
+    def pages(self) -> list:
+        """
+        :return: Les numéros des pages déjà enregistrées
+        """
+        return sorted(int(entry[len("page-"):-len(".json")]) for entry in os.listdir(self.directory)
+                      if entry.startswith("page-") and entry.endswith(".json"))
+
+    def has(self, page: int) -> bool:
+        return os.path.exists(self._page_path(page))
+
+    def load(self, page: int):
+        """
+        :param page: Numéro de la page
+        :return: Le JSON de la page enregistrée
+        """
+        with open(file=self._page_path(page), mode="r", encoding="utf-8") as page_file:
+            return json.load(page_file)
+
+    def save(self, page: int, market_json):
+        """
+        Enregistre une page, l'écriture passe par un fichier temporaire pour ne jamais laisser de page à moitié écrite
+        :param page: Numéro de la page
+        :param market_json: Le JSON de la page
+        """
+        tmp_path = f"{self._page_path(page)}.tmp"
+        with open(file=tmp_path, mode="w", encoding="utf-8") as page_file:
+            json.dump(market_json, page_file)
+        os.replace(tmp_path, self._page_path(page))
+
+    def remove(self):
+        """Supprime le point de reprise, une fois toutes les pages exportées"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SnapshotStore:
+    """
+    Historique local (SQLite) des exécutions : chaque exécution avec --store ajoute ses lignes
+    de /coins/markets, /exchanges et /global à la base au lieu de seulement écraser les fichiers.
+    Les lignes sont indexées par (id, devise, date) pour lire l'historique d'une crypto sans recharger de fichier.
+    Les relevés de plus de STORE_COMPACT_AFTER sont réduits au dernier de chaque jour et ceux
+    de plus de STORE_RETENTION jours sont supprimés (compact()).
+    """
+
+    def __init__(
+            self,
+            path: str = STORE_DIR,
+            retention: int = STORE_RETENTION,
+            compact_after: int = STORE_COMPACT_AFTER
+    ):
+        """
+        :param path: Dossier de la base
+        :param retention: Durée de conservation en jour, 0 pour tout garder
+        :param compact_after: Âge en seconde à partir duquel les relevés sont réduits à un par jour
+        """
+        self.retention = retention
+        self.compact_after = compact_after
+
+        os.makedirs(path, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(path, "history.sqlite"), check_same_thread=False, timeout=30)
+        # auto_vacuum doit précéder la création des tables, il est sans effet sur une base existante
+        self.db.executescript("""
+            PRAGMA auto_vacuum = INCREMENTAL;
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS markets (
+                coin_id TEXT NOT NULL,
+                vs_currency TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                symbol TEXT,
+                current_price REAL,
+                market_cap REAL,
+                market_cap_rank INTEGER,
+                total_volume REAL,
+                high_24h REAL,
+                low_24h REAL,
+                price_change_percentage_24h REAL,
+                circulating_supply REAL,
+                last_updated INTEGER,
+                PRIMARY KEY (coin_id, vs_currency, ts)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS exchanges (
+                exchange_id TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                trust_score INTEGER,
+                trust_score_rank INTEGER,
+                trade_volume_24h_btc REAL,
+                trade_volume_24h_btc_normalized REAL,
+                PRIMARY KEY (exchange_id, ts)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS global (
+                vs_currency TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                total_market_cap REAL,
+                total_volume REAL,
+                market_cap_percentage REAL,
+                active_cryptocurrencies INTEGER,
+                markets INTEGER,
+                market_cap_change_percentage_24h_usd REAL,
+                PRIMARY KEY (vs_currency, ts)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS markets_ts ON markets (ts);
+            CREATE INDEX IF NOT EXISTS exchanges_ts ON exchanges (ts);
+        """)
+
+    @staticmethod
+    def _value(value):
+        """Convertit une valeur du DataFrame en valeur SQLite, None pour les valeurs manquantes"""
+        if value is None or pd.isna(value):
+            return None
+        if isinstance(value, pd.Timestamp):
+            return int(value.timestamp())
+        if hasattr(value, "item"):
+            return value.item()
+        return value
+
+    def _insert(self, table: str, columns: list, rows):
+        """Insère les lignes en un seul executemany et une seule transaction"""
+        query = (
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        with self.db:
+            self.db.executemany(query, rows)
+
+    def store_markets(self, df_markets, vs_currency: str, ts: int):
+        """
+        :param df_markets: DataFrame de /coins/markets (une page ou toutes les pages)
+        :param vs_currency: Monnaie cible des données de marché
+        :param ts: Date de l'exécution (timestamp UNIX), commune à toutes les pages
+        """
+        columns = ["id", "symbol", "current_price", "market_cap", "market_cap_rank", "total_volume",
+                   "high_24h", "low_24h", "price_change_percentage_24h", "circulating_supply", "last_updated"]
+        rows = (
+            (row[0], vs_currency, ts, *(self._value(value) for value in row[1:]))
+            for row in df_markets[columns].itertuples(index=False, name=None)
+        )
+        self._insert("markets", ["coin_id", "vs_currency", "ts", *columns[1:]], rows)
+
+    def store_exchanges(self, df_exchanges, ts: int):
+        """
+        :param df_exchanges: DataFrame de /exchanges
+        :param ts: Date de l'exécution (timestamp UNIX)
+        """
+        columns = ["id", "trust_score", "trust_score_rank", "trade_volume_24h_btc", "trade_volume_24h_btc_normalized"]
+        rows = (
+            (row[0], ts, *(self._value(value) for value in row[1:]))
+            for row in df_exchanges[columns].itertuples(index=False, name=None)
+        )
+        self._insert("exchanges", ["exchange_id", "ts", *columns[1:]], rows)
+
+    def store_global(self, global_data: dict, ts: int):
+        """
+        :param global_data: Objet "data" de la réponse /global, une ligne par devise
+        :param ts: Date de l'exécution (timestamp UNIX)
+        """
+        total_market_cap = global_data.get("total_market_cap", {})
+        total_volume = global_data.get("total_volume", {})
+        market_cap_percentage = global_data.get("market_cap_percentage", {})
+        rows = (
+            (currency, ts, total_market_cap.get(currency), total_volume.get(currency),
+             market_cap_percentage.get(currency), global_data.get("active_cryptocurrencies"),
+             global_data.get("markets"), global_data.get("market_cap_change_percentage_24h_usd"))
+            for currency in {**total_market_cap, **total_volume, **market_cap_percentage}
+        )
+        self._insert("global", ["vs_currency", "ts", "total_market_cap", "total_volume", "market_cap_percentage",
+                                "active_cryptocurrencies", "markets", "market_cap_change_percentage_24h_usd"], rows)
+
+    def compact(self, now: float = None) -> int:
+        """
+        Politique de conservation : les relevés plus anciens que compact_after sont réduits
+        au dernier relevé de chaque jour, ceux plus anciens que retention sont supprimés.
+        :param now: Date de référence (timestamp UNIX), par défaut maintenant
+        :return: Le nombre de lignes supprimées
+        """
+        now = time.time() if now is None else now
+        cutoff = int(now - self.compact_after)
+        keys = {"markets": ("coin_id", "vs_currency"), "exchanges": ("exchange_id",), "global": ("vs_currency",)}
+
+        deleted = 0
+        with self.db:
+            for table, key in keys.items():
+                same_key = " AND ".join(f"newer.{column} = {table}.{column}" for column in key)
+                deleted += self.db.execute(
+                    f"DELETE FROM {table} WHERE ts < :cutoff AND EXISTS ("
+                    f"SELECT 1 FROM {table} AS newer WHERE {same_key} "
+                    f"AND newer.ts > {table}.ts AND newer.ts < :cutoff "
+                    f"AND newer.ts / 86400 = {table}.ts / 86400)",
+                    {"cutoff": cutoff}
+                ).rowcount
+                if self.retention:
+                    deleted += self.db.execute(
+                        f"DELETE FROM {table} WHERE ts < ?", (int(now - self.retention * 86400),)
+                    ).rowcount
+
+        if deleted:
+            self.db.execute("PRAGMA incremental_vacuum")
+        return deleted
+
+    def history(self, coin_id: str, vs_currency: str = "usd", since: float = None) -> list:
+        """
+        Historique d'une crypto, lu par l'index (coin_id, vs_currency, ts)
+        :param coin_id: Identifiant CoinGecko de la crypto, par exemple "bitcoin"
+        :param vs_currency: Monnaie cible des données de marché
+        :param since: Date de début (timestamp UNIX), par défaut tout l'historique
+        :return: Liste de (ts, current_price, market_cap, market_cap_rank, total_volume) par date croissante
+        """
+        return self.db.execute(
+            "SELECT ts, current_price, market_cap, market_cap_rank, total_volume FROM markets "
+            "WHERE coin_id = ? AND vs_currency = ? AND ts >= ? ORDER BY ts",
+            (coin_id, vs_currency, int(since or 0))
+        ).fetchall()
+
+    def has_coin(self, coin_id: str) -> bool:
+        """
+        :param coin_id: Identifiant CoinGecko exact, par exemple "bitcoin"
+        :return: La crypto a au moins un relevé dans l'historique, lu par l'index (coin_id, vs_currency, ts)
+        """
+        return self.db.execute("SELECT 1 FROM markets WHERE coin_id = ? LIMIT 1", (coin_id,)).fetchone() is not None
+
+    def close(self):
+        self.db.close()
+
+
+def price_history(coin_ids: list, vs_currencies: str = "usd", days: int = None, store: SnapshotStore = None):
+    """
+    Affiche l'historique des prix enregistré par --store, sans requête vers l'API
+    :param coin_ids: Identifiants CoinGecko des cryptos
+    :param vs_currencies: Monnaie cible des données de marché
+    :param days: Nombre de jours d'historique, par défaut tout l'historique
+    :param store: L'historique local
+    :return: Affiche une ligne par relevé
+    """
+    since = time.time() - days * 86400 if days else None
+    for coin_id in coin_ids:
+        rows = store.history(coin_id, vs_currency=vs_currencies, since=since)
+        if not rows:
+            print(f"No history for '{coin_id}' in {vs_currencies}")
+            continue
+
+        print(f"{coin_id} ({vs_currencies}) : {len(rows)} snapshots")
+        for ts, price, market_cap, rank, volume in rows:
+            print(
+                f"  {time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts))}  "
+                f"price {price if price is not None else '-':>16}  "
+                f"market cap {market_cap if market_cap is not None else '-':>20}  "
+                f"rank {rank if rank is not None else '-':>5}  "
+                f"volume {volume if volume is not None else '-':>20}"
+            )
+
+
+class CoinIndex:
+    """
+    Index local des cryptos construit depuis /coins/list, pour passer d'un symbole ou d'un nom à l'identifiant CoinGecko.
+    - Tables de hachage pour l'identifiant exact, le symbole et le nom (sans tenir compte de la casse)
+    - Index des préfixes : l'ordre trié des identifiants, symboles et noms, parcouru par bisect (autocomplétion)
+    Le fichier binaire contient les trois colonnes de textes séparés par NUL et les trois ordres triés
+    en entiers de 32 bits, il se recharge en quelques millisecondes sans pandas ni requête.
+    """
+
+    MAGIC = b"PYCOIDX1"
+
+    def __init__(self, ids: list, symbols: list, names: list, orders: list = None):
+        """
+        :param ids: Identifiants CoinGecko
+        :param symbols: Symboles, dans le même ordre que les identifiants
+        :param names: Noms, dans le même ordre que les identifiants
+        :param orders: Ordre trié des trois colonnes en minuscules, calculé s'il est absent
+        """
+        self.ids = ids
+        self.columns = [ids, symbols, names]
+        # Construction par des appels en C (join, lower, zip, dict) : pas de boucle Python par crypto
+        lowered = ["\0".join(column).lower().split("\0") if ids else [] for column in self.columns]
+        if orders is None:
+            orders = [array.array("I", sorted(range(len(ids)), key=column.__getitem__)) for column in lowered]
+        self.orders = orders
+        self.prefix_keys = [
+            list(operator.itemgetter(*order)(column)) if len(order) > 1 else [column[row] for row in order]
+            for column, order in zip(lowered, orders)
+        ]
+
+        # Tables de hachage : identifiant -> ligne, symbole et nom -> première position dans l'ordre trié,
+        # les cryptos qui partagent un symbole ou un nom se suivent dans cet ordre.
+        self.by_id = dict(zip(ids, range(len(ids))))
+        self.by_symbol, self.by_name = (
+            dict(zip(reversed(keys), range(len(keys) - 1, -1, -1))) for keys in self.prefix_keys[1:]
+        )
+
+    @classmethod
+    def from_coins_list(cls, coins_list_json: list) -> CoinIndex:
+        """
+        :param coins_list_json: La réponse JSON de /coins/list
+        :return: L'index des cryptos
+        """
+        return cls(
+            [coin["id"] for coin in coins_list_json],
+            [coin.get("symbol") or "" for coin in coins_list_json],
+            [coin.get("name") or "" for coin in coins_list_json],
+        )
+
+    def save(self, path: str = COINS_INDEX):
+        """
+        Enregistre l'index au format binaire, par un fichier temporaire renommé
+        :param path: Chemin du fichier
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(file=f"{path}.tmp", mode="wb") as index_file:
+            index_file.write(self.MAGIC + struct.pack("<I", len(self.ids)))
+            for column in self.columns:
+                blob = "\0".join(column).encode("utf-8")
+                index_file.write(struct.pack("<I", len(blob)) + blob)
+            for order in self.orders:
+                index_file.write(order.tobytes())
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path: str = COINS_INDEX) -> CoinIndex:
+        """
+        :param path: Chemin du fichier
+        :return: L'index enregistré, None si le fichier est absent ou invalide
+        """
+        try:
+            with open(file=path, mode="rb") as index_file:
+                data = index_file.read()
+        except OSError:
+            return None
+        if not data.startswith(cls.MAGIC):
+            return None
+
+        offset = len(cls.MAGIC)
+        (count,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        columns = []
+        for _ in range(3):
+            (size,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            column = data[offset:offset + size].decode("utf-8").split("\0") if count else []
+            columns.append(column)
+            offset += size
+
+        orders = []
+        for _ in range(3):
+            order = array.array("I")
+            order.frombytes(data[offset:offset + count * order.itemsize])
+            orders.append(order)
+            offset += count * order.itemsize
+        return cls(*columns, orders=orders)
+
+    def complete(self, prefix: str, limit: int = 10) -> list:
+        """
+        Autocomplétion : les cryptos dont l'identifiant, le symbole ou le nom commence par prefix
+        :param prefix: Début de l'identifiant, du symbole ou du nom, sans tenir compte de la casse
+        :param limit: Nombre maximum de résultats
+        :return: Liste de (id, symbol, name)
+        """
+        prefix = prefix.lower()
+        rows = {}
+        for keys, order in zip(self.prefix_keys, self.orders):
+            position = bisect.bisect_left(keys, prefix)
+            while position < len(keys) and keys[position].startswith(prefix) and len(rows) < limit:
+                rows.setdefault(order[position], None)
+                position += 1
+        return [self.coin(row) for row in rows]
+
+    def coin(self, row: int) -> tuple:
+        """
+        :param row: Ligne de l'index
+        :return: Le tuple (id, symbol, name)
+        """
+        return tuple(column[row] for column in self.columns)
+
+    def resolve(self, query: str) -> list:
+        """
+        Recherche d'une crypto : identifiant exact, puis symbole exact, puis nom exact, puis préfixe.
+        Un symbole partagé par plusieurs cryptos (par exemple les versions "bridged") donne plusieurs résultats,
+        l'identifiant CoinGecko reste alors le seul moyen de choisir sans ambiguïté.
+        :param query: Identifiant, symbole, nom ou début de nom
+        :return: Liste de (id, symbol, name), vide si rien ne correspond
+        """
+        query = query.strip()
+        for coin_id in (query, query.lower()):
+            if coin_id in self.by_id:
+                return [self.coin(self.by_id[coin_id])]
+        for column, table in ((1, self.by_symbol), (2, self.by_name)):
+            position = table.get(query.lower())
+            if position is not None:
+                keys, order = self.prefix_keys[column], self.orders[column]
+                end = position
+                while end < len(keys) and keys[end] == keys[position]:
+                    end += 1
+                return [self.coin(row) for row in order[position:end]]
+        return self.complete(query)
+
+
+def coin_index(path: str = COINS_INDEX) -> CoinIndex:
+    """
+    Index des cryptos : le fichier local, reconstruit depuis /coins/list (réponse en cache) s'il est absent
+    ou plus ancien que CACHE_TTL["coins/list"]. Sans réseau, un index ancien est toujours utilisé.
+    :param path: Chemin du fichier de l'index
+    :return: L'index des cryptos, None s'il n'existe pas et ne peut être construit
+    """
+    index = CoinIndex.load(path)
+    if index is not None and time.time() - os.path.getmtime(path) < CACHE_TTL["coins/list"]:
+        return index
+
+    try:
+        index = CoinIndex.from_coins_list(http_client().get_json(endpoint_url("coins_list")))
+    except requests.RequestException as error_request:
+        print(f"Cannot update the coins index: {error_request}")
+        return index
+
+    index.save(path)
+    return index
 
-def tmp_action():
-    """Compteur pour le temps d'exécution d'une commande"""
-    tmp_execution = timeit() * 60
-    tmp_second = "{:,.2f}secs".format(tmp_execution)
-    reponse = {"tmp_second": tmp_second, "tmp_execution": tmp_execution}
 
-    return reponse
+def resolve_coins(queries: list, index: CoinIndex = None, keep_unknown: bool = False, among: set = None) -> list:
+    """
+    Résout les symboles et noms saisis en identifiants CoinGecko, sans requête si l'index local est à jour.
+    Les saisies ambiguës sont signalées avec les identifiants possibles, puis ignorées.
+    :param queries: Identifiants, symboles ou noms saisis
+    :param index: Index des cryptos, par défaut coin_index()
+    :param keep_unknown: Garde telles quelles les saisies absentes de l'index au lieu de les ignorer
+    :param among: Seuls identifiants acceptés, les autres résultats sont écartés avant de juger l'ambiguïté
+    (eth désigne ethereum parmi bitcoin et ethereum, même si bridged-ether a le même symbole)
+    :return: Les identifiants résolus
+    """
+    if index is None:
+        index = coin_index()
+    if index is None:
+        return list(queries)
+
+    coin_ids = []
+    for query in queries:
+        matches = index.resolve(query)
+        if among is not None:
+            matches = [match for match in matches if match[0] in among]
+        if len(matches) == 1:
+            coin_ids.append(matches[0][0])
+        elif not matches and keep_unknown:
+            coin_ids.append(query)
+        elif not matches:
+            print(f"Unknown coin '{query}'")
+        else:
+            candidates = ", ".join(f"{coin_id} ({symbol}, {name})" for coin_id, symbol, name in matches)
+            print(f"'{query}' is ambiguous, use one of these ids: {candidates}")
+    return coin_ids
 
 
 def check_api(visibility: str = "standard"):
@@ -62,64 +1990,87 @@ def check_api(visibility: str = "standard"):
     :return: Affiche le résultat de la réponse du server plus le temps en seconde
     """
 
+    started = time.perf_counter()
     try:
-        requests_ping = requests.get(API_PING)
+        # Pas de nouvelle tentative : un contrôle de santé doit échouer rapidement
+        requests_ping = http_client().get(API_PING, retry=False)
         answer_ping_json = requests_ping.json()
         answer_ping_headers = requests_ping.headers
         answer_ping_status = requests_ping.status_code
 
         if visibility == "standard":
             return print(f"Status Server : {answer_ping_status} "
-                         f"in {tmp_action()['tmp_second']}")
+                         f"in {elapsed(started)}")
         elif visibility == "verbose":
+            client_stats = http_client().stats()
             return print(
                 f"{answer_ping_headers['Date']}\n"
                 f"Reply Gecko : {answer_ping_json['gecko_says']} "
                 f"Status Server : {answer_ping_status} "
-                f"in {tmp_action()['tmp_execution']}"
+                f"in {elapsed(started)}\n"
+                f"Connections : {client_stats['connections']} opened, "
+                f"{client_stats['reused']} reused for {client_stats['requests']} requests\n"
+                f"Rate limit : {client_stats['rate_per_minute']:,.1f} requests/min, "
+                f"{client_stats['throttled']} throttled (429)"
             )
 
-    except requests.exceptions.ConnectionError as req_error:
-        return f"Failed to establish a connection\n\n" f"{req_error.args}"
+    # Réponse qui n'est pas du JSON, par exemple une page HTML 404 d'une mauvaise --api-url.
+    # requests.JSONDecodeError hérite aussi de RequestException, elle doit être traitée avant.
+    except ValueError:
+        return print(f"Invalid response from {requests_ping.url} : "
+                     f"{requests_ping.status_code} {requests_ping.reason}, the body is not JSON")
+
+    except requests.exceptions.RequestException as req_error:
+        return print(f"Failed to establish a connection\n\n" f"{req_error.args}")
 
 
 def coins_list(
         extension: list,
         name: str = "coins_list",
-        include_platform: bool = False
+        include_platform: bool = False,
+        compression: str = None,
+        verbose: bool = False
 ):
     """
     Liste de toutes les cryptos prises en charge (id, name et symbol)
     :param extension: Gestion des extensions du fichier de donner, les possibilités sont sont CSV, HTML, JSON et XLSX.
     :param name: Nom du fichier de donner, par défaut "coins_list"
     :param: include_platform: pour inclure les adresses des contrats de plateforme (par exemple, 0x.... pour les jetons basés sur Ethereum).
+    :param compression: Compression des fichiers Parquet, Feather et Arrow (zstd, lz4, none), par défaut celle du format
+    :param verbose: Affiche le temps d'écriture de chaque format
     :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
     """
 
-    cg_coins_list = (
-        f"{API_URL_BASE}coins/"
-        f"list?include_platform={include_platform}"
-    )
+    started = time.perf_counter()
+    cg_coins_list = endpoint_url("coins_list", include_platform=include_platform)
 
-    requests_coins_list = requests.get(cg_coins_list, timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT))
-    coins_list_json = requests_coins_list.json()
-    pd_coins_list_df = pd.DataFrame(data=coins_list_json)
+    try:
+        requests_coins_list, coins_list_json = http_client().fetch(cg_coins_list)
 
-    for ext in extension:
-        if ext == "csv":
-            pd_coins_list_df.to_csv(f"{name}.{ext}", index=False)
+    except requests.HTTPError as error_http:
+        return print("Code: ", error_http.response.status_code, error_http.response.reason)
 
-        elif ext == "html":
-            pd_coins_list_df.to_html(f"{name}.{ext}", index=False)
+    except requests.RequestException as error_request:
+        return print(error_request)
 
-        elif ext == "json":
-            with open(file=f"{name}.{ext}", mode="w", encoding="utf-8") as json_file:
-                json_file.write(str(coins_list_json))
+    # La liste complète met aussi à jour l'index local des cryptos (voir CoinIndex)
+    CoinIndex.from_coins_list(coins_list_json).save()
 
-        elif ext == "xlsx":
-            pd_coins_list_df.to_excel(f"{name}.{ext}", sheet_name="COINS_LIST", index=False)
+    # Contenu inchangé (cache ou 304) depuis la création des fichiers : rien à reconstruire
+    if outputs_up_to_date(name, extension, requests_coins_list):
+        return print(f"{name}.{extension} already up to date in {elapsed(started)}")
 
-    return print(f"Create {name}.{extension} in {tmp_action()['tmp_second']}")
+    # Le DataFrame n'est construit que si un format en a besoin, JSON et NDJSON sont écrits depuis la réponse
+    pd_coins_list_df = None
+    if any(ext not in JSON_EXTENSIONS for ext in extension):
+        pd_coins_list_df = normalize("coins_list", coins_list_json)
+
+    write_format = functools.partial(
+        write_table, endpoint="coins_list", df=pd_coins_list_df, name=name, data=coins_list_json, compression=compression,
+        df_text=shared_text_frame(pd_coins_list_df, extension)
+    )
+    export_formats(name, extension, write_format, verbose=verbose)
+    return print(f"Create {name}.{extension} in {elapsed(started)}")
 
 
 def markets(
@@ -127,7 +2078,9 @@ def markets(
         order: str = "market_cap_desc",
         per_page: int = 250,
         page: int = 1,
-        sparkline: bool = False
+        sparkline: bool = False,
+        max_wait: float = None,
+        checkpoint: Checkpoint = None
 ):
     """
     Liste de tous les Tokens pris en charge : prix, capitalisation boursière, volume et les données relatives au marché.
@@ -138,16 +2091,13 @@ def markets(
     :param per_page: Valeurs valables : 1[...]250 Total des résultats par page
     :param page: Parcourir les nombres de page demandé
     :param sparkline: Inclure les données du sparkline des 7 derniers jours
+    :param max_wait: Plafond en seconde de l'attente imposée par le limiteur de débit
+    :param checkpoint: Point de reprise, la page y est lue si elle est déjà enregistrée, sinon elle y est enregistrée
     :return: Retourne un tableau (DataFrame)
     """
 
-    cg_market = (
-        f"{API_URL_BASE}coins/"
-        f"markets?vs_currency={vs_currencies}&"
-        f"order={order}&"
-        f"per_page={per_page}&"
-        f"page={page}&"
-        f"sparkline={sparkline}"
+    cg_market = endpoint_url(
+        "markets", vs_currency=vs_currencies, order=order, per_page=per_page, page=page, sparkline=sparkline
     )
 
     # La conversion du format brute JSON en DataFrame avec pandas
@@ -163,56 +2113,49 @@ def markets(
     # https://reqbin.com/code/python/3zdpeao1/python-requests-timeout-example
     # Read docs :
     # https://requests.readthedocs.io/en/stable/user/advanced/#timeouts
-    try:
-        request_market = requests.get(cg_market, timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT))
-        market_json = request_market.json()
-
-        # Capture du status code 429 (TooManyRequests)
-        # Trop d'erreurs 429, cela rend le programme inutilisable, à voir sur le long terme si des problèmes de manque de donner.
-        # status_code = request_market.status_code
-        # if status_code == 429:
-        #     print("HTTPS Error 429: Too Many Requests")
-        #     exit(1)
-
-    except requests.ConnectTimeout as error_connect_timeout:
-        print("Connect Time Error {0}", error_connect_timeout)
-
-    except requests.ReadTimeout as error_read_timeout:
-        print("Read Time Error {0}", error_read_timeout)
+    # Les erreurs 429 (TooManyRequests), 5xx et les timeouts sont retentés par
+    # le client HTTP partagé, seule cette page est redemandée. Si les nouvelles
+    # tentatives échouent, l'exception requests est levée vers l'appelant.
+    # La page est enregistrée dans le point de reprise dès son arrivée, même si
+    # l'exécution est interrompue pendant que les autres pages sont récupérées.
+    if checkpoint is not None and checkpoint.has(page):
+        market_json = checkpoint.load(page)
+    else:
+        market_json = http_client().get_json(cg_market, max_wait=max_wait, memo=False)
+        if checkpoint is not None:
+            checkpoint.save(page, market_json)
+
+    return markets_frame(market_json, sparkline=sparkline)
+
+
+def markets_frame(market_json: list, sparkline: bool = False):
+    """
+    Construction du tableau d'une page de /coins/markets
+    :param market_json: Page de /coins/markets décodée
+    :param sparkline: Ajoute les prix des 7 derniers jours dans DataFrame.attrs["sparkline"]
+    :return: Retourne un tableau (DataFrame) trié par rang
+    """
 
     # Sélection de chaque colonne avec pandas, si la colonne n'est pas citée
     # ci-dessous alors, elle ne sera pas présente dans le DataFrame
     # https://www.delftstack.com/howto/python-pandas/
     # https://stackoverflow.com/questions/13411544/delete-a-column-from-a-pandas-dataframe
-    dt_markets = pd.DataFrame(
-        data=market_json,
-        columns=[
-            "id",
-            "symbol",
-            "name",
-            "current_price",
-            "market_cap",
-            "market_cap_rank",
-            "fully_diluted_valuation",
-            "total_volume",
-            "high_24h",
-            "low_24h",
-            "price_change_24h",
-            "price_change_percentage_24h",
-            "market_cap_change_24h",
-            "market_cap_change_percentage_24h",
-            "circulating_supply",
-            "total_supply",
-            "max_supply",
-            "last_updated"
-        ]
-    )
+    # Schéma déclaré plutôt que l'inférence de pandas, voir MARKETS_DTYPES et ENDPOINTS
+    dt_markets = normalize("markets", market_json)
 
     # Définit la colonne 'market_cap_rank' comme index du DataFrame
     # pd_markets_df_rank = market_json.set_index("market_cap_rank")
 
     # Trie la colonne "market_cap_rank dans l'ordre croissant
-    pd_markets_df_sort_rank = dt_markets.sort_values("market_cap_rank")
+    with PROFILER.span("sort", "markets"):
+        pd_markets_df_sort_rank = dt_markets.sort_values("market_cap_rank")
+
+    # Le sparkline n'est pas une colonne du DataFrame (une liste Python par ligne), mais un
+    # tableau float32 aligné sur les lignes triées, retiré par generate() avant la concaténation
+    if sparkline:
+        pd_markets_df_sort_rank.attrs["sparkline"] = sparkline_array(market_json)[
+            pd_markets_df_sort_rank.index.to_numpy()
+        ]
 
     # Supprimer la colonne "image" dans le DataFrame.
     # Si besoin de supprimer une colonne...
@@ -221,594 +2164,2087 @@ def markets(
     return pd_markets_df_sort_rank
 
 
+def fetch_pages(
+        pages: int,
+        vs_currencies: str = "usd",
+        time_wait: int = None,
+        workers: int = REQ_WORKERS,
+        checkpoint: Checkpoint = None,
+        sparkline: bool = False
+):
+    """
+    Récupération des pages de /coins/markets en parallèle, sous la limite du limiteur de débit partagé
+    :param pages: Nombre de pages de /coins/markets à récupérer
+    :param vs_currencies: Définir la monnaie cible des données de marché
+    :param time_wait: Plafond optionnel du temps d'attente en seconde entre chaque requête
+    :param workers: Nombre de pages demandées en parallèle, 1 pour une récupération séquentielle
+    :param checkpoint: Point de reprise des pages, seules les pages absentes sont demandées à l'API
+    :param sparkline: Inclure les prix horaires des 7 derniers jours (DataFrame.attrs["sparkline"])
+    :return: Générateur des tuples (numéro de page, DataFrame) dans l'ordre d'arrivée des pages
+    """
+
+    # Le limiteur de débit partagé (RateLimiter) décide de l'attente
+    # entre chaque page, sans attente avant la première requête.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(
+                markets,
+                vs_currencies=vs_currencies,
+                page=num_pages,
+                max_wait=time_wait,
+                checkpoint=checkpoint,
+                sparkline=sparkline
+            ): num_pages
+            for num_pages in range(1, pages + 1)
+        }
+
+        try:
+            for future in as_completed(futures):
+                # La page est retirée du dictionnaire pour libérer sa mémoire une fois traitée
+                yield futures.pop(future), future.result()
+
+        except BaseException:
+            # Inutile d'attendre les pages restantes si une page a échoué, les pages pas encore
+            # commencées sont annulées (shutdown(cancel_futures=True) n'existe qu'à partir de Python 3.9)
+            for future in futures:
+                future.cancel()
+            raise
+
+
 def generate(
         extension: list,
         name: str = "markets",
         pd_index: bool = False,
-        time_wait: int = 25
+        time_wait: int = None,
+        workers: int = REQ_WORKERS,
+        pages: int = 1,
+        vs_currencies: str = "usd",
+        checkpoint: Checkpoint = None,
+        compression: str = None,
+        verbose: bool = False,
+        store: SnapshotStore = None,
+        delta: bool = False,
+        tolerance: dict = None,
+        convert_currencies: list = None,
+        sparkline: bool = False,
+        raise_errors: bool = False
 ):
     """
     Création de la fonction pour la génération des fichiers...
-    :param extension: Gestion des extensions du fichier de donner, les possibilités sont sont CSV, HTML, JSON et XLSX.
+    :param extension: Gestion des extensions du fichier de donner, les possibilités sont sont CSV, HTML, JSON, NDJSON et XLSX.
     :param name: Nom du fichier de donner, par défaut "markets"
     :param pd_index: Détermine si l'index du tableau doit être présent ou pas
-    :param time_wait: Définition du temps d'attente en seconde entre chaque requête
+    :param time_wait: Plafond optionnel du temps d'attente en seconde entre chaque requête, le limiteur de débit décide du délai réel
+    :param workers: Nombre de pages demandées en parallèle, 1 pour une récupération séquentielle
+    :param pages: Nombre de pages de /coins/markets à récupérer
+    :param vs_currencies: Définir la monnaie cible des données de marché
+    :param checkpoint: Point de reprise des pages, supprimé une fois les fichiers créés
+    :param compression: Compression des fichiers Parquet, Feather et Arrow (zstd, lz4, none), par défaut celle du format
+    :param verbose: Affiche le temps d'écriture de chaque format
+    :param store: Historique local, les lignes de l'exécution y sont ajoutées
+    :param delta: Écrit seulement les lignes ajoutées, supprimées et modifiées depuis l'exécution précédente
+    (name.delta.ext) et le patch name.patch.json
+    :param tolerance: Variation relative sous laquelle une valeur est inchangée, par colonne (voir market_delta)
+    :param convert_currencies: Autres devises, converties depuis vs_currencies sans nouveau parcours des pages
+    (name.devise.ext)
+    :param sparkline: Ajoute le minimum, le maximum et la volatilité sur 7 jours, les prix horaires sont
+    enregistrés dans name.sparkline.npy (une ligne par crypto, dans l'ordre du tableau)
+    :param raise_errors: Lève les erreurs requests au lieu de les afficher (mode --watch, voir WatchScheduler)
     :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
     """
 
-    dfs = []
+    # Les pages sont rangées par numéro de page au fur et à mesure de leur
+    # arrivée, l'ordre d'arrivée n'a donc pas d'importance.
+    dfs = {}
+    sparklines = {}
+    progress = progress_bar()
     with progress:
+        task_pages = progress.add_task("markets", total=pages)
         try:
-            for num_pages in progress.track(range(1, args.page + 1)):
-                if args.currency:
-                    # Juste un message entre chaque génération des pages
-                    # print(f"Generate pages {num_pages}/{args.page},"
-                    #       f"wait 25 Secs for the next one.")
-                    time.sleep(time_wait)
-                    df_market = markets(vs_currencies=args.currency,
-                                        page=num_pages)
-
-                else:
-                    time.sleep(time_wait)
-                    df_market = markets(page=num_pages)
-                dfs.append(df_market)
+            for num_pages, df_market in fetch_pages(pages, vs_currencies, time_wait, workers, checkpoint,
+                                                    sparkline=sparkline):
+                sparklines[num_pages] = df_market.attrs.pop("sparkline", None)
+                dfs[num_pages] = df_market
+                progress.advance(task_pages)
 
             # Concaténer plusieurs tableaux pandas ensemble
             # https://www.geeksforgeeks.org/convert-multiple-json-files-to-csv-python/
             # https://towardsdatascience.com/concatenate-multiple-and-messy-dataframes-efficiently-80847b4da12b
-            df_concat = pd.concat(dfs)
-
-            for ext in extension:
-                if ext == "csv":
-                    df_concat.to_csv(f"{name}.{ext}", index=pd_index)
+            # ignore_index : chaque page a son propre index 0..per_page, l'index final doit être unique
+            with PROFILER.span("concat", "markets"):
+                df_concat = pd.concat([dfs[num_pages] for num_pages in sorted(dfs)], ignore_index=True)
+
+                # Les catégories diffèrent d'une page à l'autre, pd.concat revient alors au type "object"
+                apply_dtypes(df_concat, MARKETS_DTYPES)
+
+            # Les autres devises sont dérivées du parcours dans la devise de base,
+            # une seule requête /exchange_rates au lieu d'un parcours complet par devise.
+            factors = currency_factors(vs_currencies, convert_currencies) if convert_currencies else {}
+
+            # Un seul tableau contigu pour toutes les pages, les statistiques sont calculées
+            # en une passe sur toutes les cryptos (voir sparkline_stats).
+            if sparkline:
+                prices = stack_sparklines([sparklines[num_pages] for num_pages in sorted(sparklines)])
+                for column, values in sparkline_stats(prices).items():
+                    df_concat[column] = values
+
+            if store is not None:
+                snapshot_ts = int(time.time())
+                store.store_markets(df_concat, vs_currencies, snapshot_ts)
+                for currency, factor in factors.items():
+                    store.store_markets(convert_markets(df_concat, factor), currency, snapshot_ts)
+
+            # Export différentiel : les fichiers ne contiennent que les lignes ajoutées, supprimées
+            # ou modifiées depuis l'instantané précédent de la devise, l'instantané est remplacé à la fin.
+            if delta:
+                df_snapshot = df_concat
+                snapshot_at = pd.Timestamp.now(tz="UTC").isoformat()
+                previous = load_snapshot(vs_currencies)
+                previous_at, df_previous = previous if previous is not None else (None, df_concat.iloc[0:0])
+
+                patch, df_concat = market_delta(df_previous, df_snapshot, tolerance=tolerance)
+                write_json(f"{name}.patch.json", {"vs_currency": vs_currencies, "base": previous_at,
+                                                  "snapshot": snapshot_at, **patch})
+                print(f"Delta since {previous_at or 'nothing'} : {len(patch['added'])} added, "
+                      f"{len(patch['removed'])} removed, {len(patch['changed'])} changed")
+                name = f"{name}.delta"
+                if sparkline:
+                    prices = delta_sparklines(prices, df_snapshot, df_concat)
+
+            # Enregistrées après l'export différentiel, la ligne i du tableau est la ligne i du fichier écrit
+            if sparkline:
+                np.save(f"{name}.sparkline.npy", prices)
+                for currency, factor in factors.items():
+                    np.save(f"{name}.{currency}.sparkline.npy", prices * np.float32(factor))
+
+            names = [name]
+            export_formats(name, extension, functools.partial(
+                write_markets, df_markets=df_concat, name=name, pd_index=pd_index, compression=compression,
+                df_text=shared_text_frame(df_concat, extension)
+            ), verbose=verbose)
+            for currency, factor in factors.items():
+                names.append(f"{name}.{currency}")
+                df_converted = convert_markets(df_concat, factor)
+                export_formats(names[-1], extension, functools.partial(
+                    write_markets, df_markets=df_converted, name=names[-1], pd_index=pd_index,
+                    compression=compression, df_text=shared_text_frame(df_converted, extension)
+                ), verbose=verbose)
+
+            if delta:
+                save_snapshot(df_snapshot, vs_currencies, snapshot_at)
+
+            if checkpoint is not None:
+                checkpoint.remove()
+            return print(f"Successful creation of {', '.join(names)}.{extension} files")
+
+        except requests.HTTPError as error_http:
+            if raise_errors:
+                raise
+            print("Code: ", error_http.response.status_code, error_http.response.reason)
+            return checkpoint_hint(checkpoint, pages)
+
+        except requests.RequestException as error_request:
+            if raise_errors:
+                raise
+            print(error_request)
+            return checkpoint_hint(checkpoint, pages)
+
+        except KeyboardInterrupt:
+            checkpoint_hint(checkpoint, pages)
+            raise
+
+
+def write_markets(ext: str, df_markets, name: str, pd_index: bool = False, compression: str = None, df_text=None):
+    """
+    Écriture du tableau de /coins/markets dans un format
+    :param ext: Extension du fichier (csv, html, json, ndjson, xlsx, parquet, feather, arrow)
+    :param df_markets: Tableau des pages concaténées
+    :param name: Nom du fichier sans extension
+    :param pd_index: Détermine si l'index du tableau doit être présent ou pas
+    :param compression: Compression des fichiers Parquet, Feather et Arrow, par défaut celle du format
+    :param df_text: Tableau des formats texte partagé par les threads de export_formats(), voir shared_text_frame()
+    """
+    if ext not in ARROW_EXTENSIONS:
+        df_markets = df_text if df_text is not None else text_frame(df_markets)
 
-                elif ext == "html":
-                    df_concat.to_html(f"{name}.{ext}", index=pd_index)
+    if ext == "csv":
+        df_markets.to_csv(f"{name}.{ext}", index=pd_index)
 
-                elif ext == "json":
-                    df_concat.to_json(f"{name}.{ext}", orient="columns")
+    elif ext == "html":
+        df_markets.to_html(f"{name}.{ext}", index=pd_index)
 
-                elif ext == "xlsx":
-                    df_concat.to_excel(f"{name}.{ext}", sheet_name="MARKETS", index=pd_index)
+    elif ext == "json":
+        df_markets.to_json(f"{name}.{ext}", orient="columns", date_format="iso")
 
-            return print(f"Successful creation of {name}.{extension} files")
+    elif ext == "ndjson":
+        write_page(f"{name}.{ext}", ext, df_markets, header=True)
 
-        except urllib.error.HTTPError as HTTPError:
-            return print("Code: ", HTTPError.code, HTTPError.reason)
+    elif ext == "xlsx":
+        write_xlsx(df_markets, f"{name}.{ext}", sheet_name=ENDPOINTS["markets"]["sheet"], index=pd_index)
 
-        except urllib.error.URLError as URLError:
-            return print(URLError.reason)
+    elif ext in ARROW_EXTENSIONS:
+        write_columnar(df_markets, f"{name}.{ext}", ext, index=pd_index,
+                       compression=compression, dtypes=MARKETS_DTYPES)
 
 
-def exchanges(
-        extension: str,
-        name: str = "exchanges",
-        per_page: int = 250,
-        page: int = 1
-):
+def currency_factors(vs_currencies: str, currencies: list) -> dict:
     """
-    :param extension: Gestion des extensions du fichier de donner, les possibilités sont sont CSV, HTML, JSON et XLSX.
-    :param name: Nom du fichier de donner, par défaut "exchanges"
-    :param per_page: Valeurs valables : 1[...]250 Total des résultats par page
-    :param page: Parcourir les nombres de page demandé, ici seulement une
-    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    Taux de conversion de la devise de base vers les autres devises, avec une seule requête /exchange_rates.
+    Les taux de CoinGecko sont exprimés en valeur d'un bitcoin dans chaque devise.
+    :param vs_currencies: Devise de base, celle du parcours des pages de /coins/markets
+    :param currencies: Autres devises
+    :return: Le facteur de conversion de chaque devise connue de /exchange_rates
     """
-    cg_exchanges = (
-        f"{API_URL_BASE}exchanges"
-        f"?per_page={per_page}&"
-        f"page={page}"
-    )
+    rates = http_client().get_json(EXCHANGE_RATES)["rates"]
+    factors = {}
+    for currency in currencies:
+        if currency == vs_currencies:
+            continue
+        if currency not in rates or vs_currencies not in rates:
+            print(f"No exchange rate between '{vs_currencies}' and '{currency}', crawl it with -c {currency}")
+            continue
+        factors[currency] = rates[currency]["value"] / rates[vs_currencies]["value"]
+    return factors
+
+
+def convert_markets(df_markets, factor: float):
+    """
+    Conversion vectorisée des colonnes exprimées dans la devise (MARKETS_CURRENCY_COLUMNS)
+    :param df_markets: DataFrame de /coins/markets dans la devise de base
+    :param factor: Facteur de conversion (voir currency_factors)
+    :return: Une copie du DataFrame dans l'autre devise
+    """
+    columns = [column for column in MARKETS_CURRENCY_COLUMNS if column in df_markets.columns]
+    df_converted = df_markets.copy()
+    df_converted[columns] = df_markets[columns].astype("float64") * factor
+    return df_converted
 
-    try:
-        requests_exchanges = requests.get(cg_exchanges, timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT))
-        exchanges_json = requests_exchanges.json()
-
-    except requests.ConnectTimeout as error_connect_timeout:
-        print("Connect Time Error {0}", error_connect_timeout)
-
-    except requests.ReadTimeout as error_read_timeout:
-        print("Read Time Error {0}", error_read_timeout)
-
-    dt_exchanges = pd.DataFrame(
-        data=exchanges_json,
-        columns=[
-            "id",
-            "name",
-            "year_established",
-            "country",
-            "has_trading_incentive",
-            "trust_score",
-            "trust_score_rank",
-            "trade_volume_24h_btc",
-            "trade_volume_24h_btc_normalized"
-        ]
-    )
 
-    for ext in extension:
-        if ext == "csv":
-            dt_exchanges.to_csv(f"{name}.{ext}", index=False)
+def sparkline_array(market_json: list):
+    """
+    Prix horaires des 7 derniers jours (sparkline_in_7d) de chaque crypto dans un tableau float32 2-D
+    :param market_json: Page de /coins/markets demandée avec sparkline=true
+    :return: Tableau (cryptos, points), les séries plus courtes sont complétées par NaN au début
+    afin que la dernière colonne soit toujours le prix le plus récent
+    """
 
-        elif ext == "html":
-            dt_exchanges.to_html(f"{name}.{ext}", index=False)
+    series = [(coin.get("sparkline_in_7d") or {}).get("price") or [] for coin in market_json]
+    prices = np.full((len(series), max(map(len, series), default=0)), np.nan, dtype=np.float32)
+    for row, values in enumerate(series):
+        if values:
+            prices[row, -len(values):] = [np.nan if value is None else value for value in values]
+    return prices
 
-        elif ext == "json":
-            dt_exchanges.to_json(f"{name}.{ext}", orient="columns")
 
-        elif ext == "xlsx":
-            dt_exchanges.to_excel(f"{name}.{ext}", sheet_name="EXCHANGES", index=False)
+def stack_sparklines(arrays: list):
+    """
+    Concaténation des sparklines de chaque page, dans l'ordre des pages
+    :param arrays: Tableaux de sparkline_array(), la longueur des séries peut varier d'une page à l'autre
+    :return: Tableau float32 contigu (cryptos, points)
+    """
 
-    return print(f"Create {name}.{extension} in {tmp_action()['tmp_second']}")
+    width = max((prices.shape[1] for prices in arrays), default=0)
+    stacked = np.full((sum(len(prices) for prices in arrays), width), np.nan, dtype=np.float32)
+    row = 0
+    for prices in arrays:
+        if prices.shape[1]:
+            stacked[row:row + len(prices), width - prices.shape[1]:] = prices
+        row += len(prices)
+    return stacked
 
 
-def global_data_market(
-        extension: list,
-        name: str = "global"
-):
+def sparkline_stats(prices) -> dict:
     """
-    Création de la fonction pour la génération du fichier "global"
-    :param extension: Gestion des extensions du fichier de donner, les deux principales sont CSV, HTML, JSON et XLSX.
-    :param name: Nom du fichier de donner, par défaut "global"
-    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    Statistiques vectorisées sur 7 jours pour toutes les cryptos en une fois, les NaN sont ignorés
+    :param prices: Tableau (cryptos, points) de stack_sparklines()
+    :return: Dictionnaire colonne -> valeurs float32 : minimum, maximum et volatilité
+    (écart-type des rendements logarithmiques horaires, en pourcentage)
     """
 
-    df_stack = []
-    # Raw date for JSON file
-    raw_global_data_json_data = requests.get(
-        GLOBAL_DATA,
-        timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT)).json()
-
-    # Raw data for DataFrame
-    global_data_json = requests.get(
-        GLOBAL_DATA,
-        timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT)).json()
-    pd_global_data_df_data = pd.DataFrame(
-        data=global_data_json,
-        index=[
-        "active_cryptocurrencies",
-        "upcoming_icos",
-        "ongoing_icos",
-        "ended_icos",
-        "markets",
-        "market_cap_change_percentage_24h_usd",
-        "updated_at"
-    ])
-    # pd_global_data_df_data.to_csv("raw_data.csv")
-    df_stack.append(pd_global_data_df_data)
-
-
-    # total_market_cap
-    global_data_json_total_market_cap = requests.get(
-        GLOBAL_DATA,
-        timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT)).json() \
-        ["data"]["total_market_cap"]
-    pd_global_data_df_total_market_cap = pd.DataFrame(
-        data=global_data_json_total_market_cap,
-        index=["total_market_cap"])
-    # pd_global_data_df_total_market_cap.to_csv("total_market_cap.csv")
-    df_stack.append(pd_global_data_df_total_market_cap)
-
-
-    # total_volume
-    global_data_json_total_volume = requests.get(
-        GLOBAL_DATA,
-        timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT)).json() \
-        ["data"]["total_volume"]
-    pd_global_data_df_total_volume = pd.DataFrame(
-        data=global_data_json_total_volume,
-        index=["total_volume"])
-    # pd_global_data_df_total_volume.to_csv("total_volume.csv")
-    df_stack.append(pd_global_data_df_total_volume)
-
-
-    # market_cap_percentage
-    global_data_json_market_cap_percentage = requests.get(
-        GLOBAL_DATA,
-        timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT)).json() \
-        ["data"]["market_cap_percentage"]
-    pd_global_data_df_market_cap_percentage = pd.DataFrame(
-        data=global_data_json_market_cap_percentage,
-        index=["market_cap_percentage"])
-    # pd_global_data_df_market_cap_percentage.to_csv("market_cap_percentage.csv")
-    df_stack.append(pd_global_data_df_market_cap_percentage)
-
-    # Concaténer les différents DataFrame en un seul au format CSV.
-    df_concat = pd.concat(df_stack)
-
-    for ext in extension:
-        if ext == "csv":
-            df_concat.to_csv(f"{name}.{ext}")
+    if not prices.shape[1]:
+        empty = np.full(len(prices), np.nan, dtype=np.float32)
+        return {"sparkline_min_7d": empty, "sparkline_max_7d": empty.copy(), "volatility_7d": empty.copy()}
 
-        elif ext == "html":
-            df_concat.to_html(f"{name}.{ext}")
+    # Les lignes entièrement NaN (crypto sans sparkline) et les prix nuls déclenchent des
+    # avertissements de numpy, le résultat NaN de ces lignes est celui attendu.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        returns = np.diff(np.log(prices, dtype=np.float64), axis=1)
+        returns[~np.isfinite(returns)] = np.nan
+        return {
+            "sparkline_min_7d": np.nanmin(prices, axis=1),
+            "sparkline_max_7d": np.nanmax(prices, axis=1),
+            "volatility_7d": (np.nanstd(returns, axis=1) * 100).astype(np.float32),
+        }
 
-        elif ext == "json":
-            with open(file=f"{name}.{ext}", mode="w", encoding="utf-8") as json_file:
-                json_file.write(str(raw_global_data_json_data))
 
-        elif ext == "xlsx":
-            df_concat.to_excel(f"{name}.{ext}", sheet_name="GLOBAL")
+def delta_sparklines(prices, df_snapshot, df_delta, key: str = "id"):
+    """
+    Lignes des sparklines dans l'ordre du tableau différentiel de market_delta()
+    :param prices: Tableau (cryptos, points) de stack_sparklines(), dans l'ordre de df_snapshot
+    :param df_snapshot: Instantané complet de /coins/markets
+    :param df_delta: Lignes ajoutées, supprimées et modifiées
+    :param key: Colonne d'identifiant des lignes
+    :return: Tableau float32 (lignes de df_delta, points), les lignes supprimées sont NaN
+    """
 
-    return print(f"Create {name}.{extension} in {tmp_action()['tmp_second']}")
+    # market_delta garde la première ligne d'un identifiant en double
+    first = df_snapshot[key].drop_duplicates()
+    positions = pd.Index(first).get_indexer(df_delta[key])
+    rows = prices[first.index.to_numpy()[positions]] if len(first) else np.empty((len(df_delta), prices.shape[1]),
+                                                                                 dtype=np.float32)
+    rows[positions < 0] = np.nan
+    return rows
 
 
-def global_defi_market(
-        extension: list,
-        name: str = "global_defi"
-):
+def load_sparkline(path: str, mmap: bool = True):
     """
-    Création de la fonction pour la génération du fichier "global_defi"
-    :param extension: Gestion des extensions du fichier de donner, les deux principales sont CSV, HTML, JSON et XLSX.
-    :param name: Nom du fichier de donner, par défaut "global_defi"
-    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    Lecture d'un fichier name.sparkline.npy
+    :param path: Chemin du fichier .npy
+    :param mmap: Projection en mémoire (lecture seule), seules les lignes lues sont chargées depuis le disque
+    :return: Tableau (cryptos, points), la ligne i correspond à la ligne i du tableau exporté
     """
 
-    requests_global_defi = requests.get(GLOBAL_DATA_DEFI, timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT))
-    global_defi_json = requests_global_defi.json()
-    pd_global_data_df = pd.DataFrame(data=global_defi_json, columns=["data"])
+    return np.load(path, mmap_mode="r" if mmap else None)
 
-    for ext in extension:
-        if ext == "csv":
-            pd_global_data_df.to_csv(f"{name}.{ext}", header=False)
 
-        elif ext == "html":
-            pd_global_data_df.to_html(f"{name}.{ext}", header=False)
+def checkpoint_hint(checkpoint: Checkpoint, pages: int):
+    """
+    Affiche le nombre de pages enregistrées et la commande de reprise d'une exécution interrompue
+    :param checkpoint: Point de reprise de l'exécution
+    :param pages: Nombre de pages demandées
+    """
+    if checkpoint is None:
+        return None
+    return print(f"{len(checkpoint.pages())}/{pages} pages saved, "
+                 f"resume with --resume {checkpoint.run_id}")
 
-        elif ext == "json":
-            with open(file=f"{name}.{ext}", mode="w", encoding="utf-8") as json_file:
-                json_file.write(str(global_defi_json))
 
-        elif ext == "xlsx":
-            pd_global_data_df.to_excel(f"{name}.{ext}", sheet_name="GLOBAL_DEFI", header=False)
+def json_value(value):
+    """
+    Convertit une valeur du DataFrame en valeur JSON
+    :param value: Valeur d'une cellule du DataFrame
+    :return: None pour les valeurs manquantes, une date ISO 8601 ou un type Python natif
+    """
+    if isinstance(value, (dict, list)):
+        return value
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        # Format ISO 8601 de l'API (2024-05-01T12:00:00.000Z), comme les formats texte (voir text_frame)
+        if value.tzinfo is not None:
+            value = value.tz_convert("UTC").tz_localize(None)
+        return f"{value.strftime('%Y-%m-%dT%H:%M:%S')}.{value.microsecond // 1000:03d}Z"
+    # float32 écrit par sa forme la plus courte, sans les chiffres ajoutés par la conversion en float64
+    if getattr(value, "dtype", None) == "float32":
+        return float(str(value))
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def load_snapshot(vs_currencies: str):
+    """
+    :param vs_currencies: Monnaie cible des données de marché
+    :return: Le tuple (date ISO 8601, DataFrame) du dernier instantané de la devise,
+    None s'il n'y en a pas ou s'il est illisible ou d'une autre version (l'export repart de zéro)
+    """
+    path = os.path.join(DELTA_DIR, f"markets-{vs_currencies}.json")
+    try:
+        with open(path, encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != DELTA_VERSION:
+        return None
 
-    return print(f"Create {name}.{extension} in {tmp_action()['tmp_second']}")
+    df_snapshot = pd.DataFrame(snapshot["columns"], columns=list(snapshot["dtypes"]))
+    return snapshot["snapshot_at"], apply_dtypes(df_snapshot, snapshot["dtypes"])
 
 
-def trending_top7(
-        extension: list,
-        name: str = "trending_top7"
-):
+def save_snapshot(df_markets, vs_currencies: str, snapshot_at: str):
     """
-    Création de la fonction pour la génération du fichier "trending_top7"
-    :param extension: Gestion des extensions du fichier de donner, les deux principales sont CSV, HTML, JSON et XLSX.
-    :param name: Nom du fichier de donner, par défaut "trending_top7"
-    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    Enregistre l'instantané de la devise en JSON (colonnes et schéma), base du prochain export différentiel.
+    L'écriture passe par un fichier temporaire pour ne jamais laisser d'instantané à moitié écrit.
+    :param df_markets: DataFrame de toutes les pages de /coins/markets
+    :param vs_currencies: Monnaie cible des données de marché
+    :param snapshot_at: Date de l'instantané (ISO 8601)
+    """
+    os.makedirs(DELTA_DIR, exist_ok=True)
+    path = os.path.join(DELTA_DIR, f"markets-{vs_currencies}.json")
+    write_json(f"{path}.tmp", {
+        "version": DELTA_VERSION,
+        "snapshot_at": snapshot_at,
+        "dtypes": {str(column): str(dtype) for column, dtype in df_markets.dtypes.items()},
+        "columns": {str(column): [json_value(value) for value in df_markets[column]] for column in df_markets.columns},
+    })
+    os.replace(f"{path}.tmp", path)
+
+
+def market_delta(previous, current, tolerance: dict = None, key: str = "id") -> tuple:
+    """
+    Compare deux instantanés de /coins/markets indexés par l'identifiant de la crypto.
+    Les colonnes décimales sont comparées avec une variation relative (tolerance),
+    les autres colonnes doivent être identiques, les colonnes de DELTA_IGNORE ne sont pas comparées.
+    :param previous: DataFrame de l'instantané précédent
+    :param current: DataFrame de l'instantané actuel
+    :param tolerance: Variation relative par colonne, "*" pour toutes les colonnes (DELTA_TOLERANCE par défaut)
+    :param key: Colonne d'identifiant des lignes
+    :return: Le tuple (patch, DataFrame des lignes ajoutées, supprimées et modifiées avec la colonne "change").
+    Le patch contient les lignes ajoutées, les identifiants supprimés et seulement les valeurs modifiées.
     """
+    tolerance = {"*": DELTA_TOLERANCE, **(tolerance or {})}
+    df_before = previous.drop_duplicates(key).set_index(key)
+    df_after = current.drop_duplicates(key).set_index(key)
+
+    added = df_after.index.difference(df_before.index, sort=False)
+    removed = df_before.index.difference(df_after.index, sort=False)
+    common = df_after.index.intersection(df_before.index, sort=False)
+    columns = [column for column in df_after.columns if column in df_before.columns and column not in DELTA_IGNORE]
+
+    changed = pd.DataFrame(False, index=common, columns=columns)
+    for column in columns:
+        before, after = df_before.loc[common, column], df_after.loc[common, column]
+        missing = before.isna() != after.isna()
+        if pd.api.types.is_float_dtype(after.dtype):
+            before, after = before.astype("float64"), after.astype("float64")
+            rel = tolerance.get(column, tolerance["*"])
+            changed[column] = ((after - before).abs() > rel * before.abs()).fillna(False) | missing
+        else:
+            changed[column] = (before.astype("string").fillna("") != after.astype("string").fillna("")) | missing
+
+    changed_rows = changed[changed.any(axis=1)]
+    changed_cells = changed_rows.stack()
+    patch_changed = {}
+    for coin_id, column in changed_cells[changed_cells].index:
+        patch_changed.setdefault(coin_id, {})[column] = json_value(df_after.at[coin_id, column])
+    for coin_id in changed_rows.index:
+        for column in DELTA_IGNORE:
+            if column in df_after.columns:
+                patch_changed[coin_id][column] = json_value(df_after.at[coin_id, column])
+
+    patch = {
+        "key": key,
+        "added": [
+            {key: coin_id, **{column: json_value(value) for column, value in row.items()}}
+            for coin_id, row in df_after.loc[added].iterrows()
+        ],
+        "removed": [json_value(coin_id) for coin_id in removed],
+        "changed": patch_changed,
+    }
+
+    df_delta = pd.concat([
+        df_after.loc[added].assign(change="added"),
+        df_after.loc[changed_rows.index].assign(change="changed"),
+        pd.DataFrame(index=removed).assign(change="removed"),
+    ])
+    df_delta.index.name = key
+    df_delta = df_delta.reset_index()
+    return patch, df_delta[["change", *current.columns]]
 
-    dfs = []
-    request_trending = requests.get(TRENDING_TOP7, timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT))
-    trending_data_json = request_trending.json()
 
-    for top_trending in range(0, len(trending_data_json["coins"])):
-        trending_data = trending_data_json["coins"][top_trending]
-        pd_trending_data = pd.DataFrame(data=trending_data)
-        dfs.append(pd_trending_data)
+def apply_patch(df, patch: dict, dtypes: dict = MARKETS_DTYPES):
+    """
+    Applique un patch de market_delta() à l'instantané précédent, pour les consommateurs de l'export différentiel
+    :param df: DataFrame de l'instantané précédent
+    :param patch: Le patch (fichier name.patch.json)
+    :param dtypes: Schéma des colonnes, appliqué au résultat
+    :return: Le DataFrame de l'instantané actuel
+    """
+    key = patch["key"]
+    df_patched = df.astype(object).set_index(key)
+    df_patched = df_patched.drop(index=[coin_id for coin_id in patch["removed"] if coin_id in df_patched.index])
 
-    df_concat = pd.concat(dfs)
+    for coin_id, values in patch["changed"].items():
+        for column, value in values.items():
+            df_patched.at[coin_id, column] = value
 
-    for ext in extension:
-        if ext == "csv":
-            df_concat.to_csv(f"{name}.{ext}", header=False)
+    df_added = pd.DataFrame(data=patch["added"], columns=[key, *df_patched.columns]).set_index(key)
+    df_patched = pd.concat([df_patched, df_added.astype(object)]).reset_index()
+    return apply_dtypes(df_patched, dtypes)
 
-        elif ext == "html":
-            df_concat.to_html(f"{name}.{ext}", header=False)
 
-        elif ext == "json":
-            with open(file=f"{name}.{ext}", mode="w", encoding="utf-8") as json_file:
-                json_file.write(str(trending_data_json))
+def apply_dtypes(df, dtypes: dict):
+    """
+    Applique un schéma de types aux colonnes connues du DataFrame, sans passer par l'inférence de pandas.
+    Les valeurs invalides deviennent des valeurs manquantes (NaN, <NA> ou NaT).
+    :param df: DataFrame construit depuis la réponse JSON
+    :param dtypes: Schéma des colonnes, par exemple MARKETS_DTYPES
+    :return: Le DataFrame typé
+    """
+    for column, dtype in dtypes.items():
+        if column not in df.columns or str(df[column].dtype) == dtype:
+            continue
+
+        if dtype.startswith("datetime64"):
+            df[column] = pd.to_datetime(df[column], utc=True, errors="coerce", format="ISO8601")
+        elif dtype.startswith(("float", "Int")):
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+
+    return df
+
+
+def text_frame(df):
+    """
+    Prépare un DataFrame pour les formats texte (CSV, HTML, JSON, NDJSON, XLSX) : les valeurs sont
+    écrites comme l'API les envoie. Les colonnes float32 repassent en float64 par leur écriture la plus
+    courte (-2.11401 et non -2.1140100956), les colonnes float64 aux valeurs entières deviennent des
+    entiers nullables (1183821870000 et non 1183821870000.0) et les dates UTC reprennent le format ISO 8601
+    de l'API (2024-05-01T12:00:00.000Z et non 2024-05-01 12:00:00+00:00). Le schéma reste celui des formats colonnes.
+    :param df: DataFrame typé par apply_dtypes()
+    :return: Le DataFrame lui-même si aucune colonne ne change, sinon une copie
+    """
+    df_text = df
+    for column in df.columns:
+        series = df[column]
+        if series.dtype == "float32":
+            values = series.to_numpy().astype(str).astype("float64")
+        elif str(series.dtype).startswith("datetime64") and getattr(series.dt, "tz", None) is not None:
+            iso = np.datetime_as_string(series.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(), unit="ms")
+            values = pd.Series(np.char.add(iso, "Z"), index=series.index, dtype=object).where(series.notna(), None)
+        elif (series.dtype == "float64" and series.notna().any()
+              and ((series.dropna() % 1 == 0) & (series.dropna().abs() < 2 ** 53)).all()):
+            values = series.astype("Int64")
+        else:
+            continue
+
+        if df_text is df:
+            df_text = df.copy()
+        df_text[column] = values
+
+    return df_text
+
+
+def shared_text_frame(df, extension: list):
+    """
+    Tableau des formats texte construit une seule fois avant export_formats() : les threads des formats
+    le lisent sans le modifier, la mémoire ne grandit pas avec le nombre de formats demandés
+    :param df: DataFrame typé par apply_dtypes(), None si aucun format n'a besoin du tableau
+    :param extension: Extensions demandées
+    :return: Le tableau de text_frame(), None si seuls des formats colonnes sont demandés
+    """
+    if df is None or all(ext in ARROW_EXTENSIONS for ext in extension):
+        return None
+    return text_frame(df)
+
+
+def json_path(data, path: str = None):
+    """
+    :param data: Réponse JSON décodée
+    :param path: Chemin des clés séparées par des points (a.b), None pour data
+    :return: La valeur au bout du chemin, None si une clé manque
+    """
+    if path:
+        for key in path.split("."):
+            data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+
+def endpoint_rows(endpoint: str, data) -> list:
+    """
+    Lignes plates d'une réponse selon les règles de son entrée dans ENDPOINTS (item, meta, flatten, pivot),
+    les valeurs restent celles de la réponse
+    :param endpoint: Nom de l'endpoint, ex: "trending"
+    :param data: Réponse JSON décodée
+    :return: Liste des lignes (dict), une par ligne du tableau
+    """
+    spec = ENDPOINTS[endpoint]
+    records = json_path(data, spec.get("records"))
+    if records is None:
+        return []
+    if isinstance(records, dict):
+        records = [records]
+
+    # Lignes déjà plates (markets, exchanges) : la liste de la réponse est passée telle quelle
+    if not any(spec.get(rule) for rule in ("item", "meta", "flatten", "pivot")):
+        return records
+
+    meta = {column: json_path(data, path) for column, path in spec.get("meta", {}).items()}
+    flatten = spec.get("flatten", [])
+    key_column, pivot = spec.get("pivot", (None, []))
+    rows = []
+    for record in records:
+        record = json_path(record, spec.get("item")) or {}
+        row = dict(meta)
+        for field, value in record.items():
+            if field in pivot:
+                continue
+            if field in flatten and isinstance(value, dict):
+                for key, nested in value.items():
+                    row[f"{field}_{key}"] = nested
+            else:
+                row[field] = value
+
+        if not pivot:
+            rows.append(row)
+            continue
+
+        nested = [record.get(field) or {} for field in pivot]
+        for key in dict.fromkeys(key for values in nested for key in values):
+            rows.append({key_column: key, **{field: values.get(key) for field, values in zip(pivot, nested)}, **row})
+    return rows
+
+
+def normalize(endpoint: str, data):
+    """
+    Aplatit une réponse en tableau selon les règles de son entrée dans ENDPOINTS, en une seule
+    passe sur les lignes et un seul DataFrame (pas de DataFrame intermédiaire ni de concaténation)
+    :param endpoint: Nom de l'endpoint, ex: "trending"
+    :param data: Réponse JSON décodée
+    :return: Le tableau typé par le schéma de l'endpoint
+    """
+    spec = ENDPOINTS[endpoint]
+    dtypes = spec.get("dtypes", {})
+
+    with PROFILER.span("frame", endpoint):
+        df = pd.DataFrame(data=endpoint_rows(endpoint, data), columns=list(dtypes) if spec.get("select") else None)
+        return apply_dtypes(df, dtypes)
+
+
+def memory_report(vs_currencies: str = "usd"):
+    """
+    Compare la mémoire des DataFrame de /coins/markets (première page) et /exchanges
+    construits avec l'inférence de pandas et avec les schémas MARKETS_DTYPES et EXCHANGES_DTYPES
+    :param vs_currencies: Monnaie cible des données de marché
+    :return: Affiche la mémoire par colonne et le gain total
+    """
+    sources = [
+        ("markets", endpoint_url("markets", vs_currency=vs_currencies), MARKETS_DTYPES),
+        ("exchanges", endpoint_url("exchanges"), EXCHANGES_DTYPES),
+    ]
+
+    for endpoint, url, dtypes in sources:
+        try:
+            records = http_client().get_json(url)
+
+        except requests.HTTPError as error_http:
+            return print("Code: ", error_http.response.status_code, error_http.response.reason)
+
+        except requests.RequestException as error_request:
+            return print(error_request)
+
+        df_inferred = pd.DataFrame(data=records, columns=list(dtypes))
+        df_schema = apply_dtypes(df_inferred.copy(), dtypes)
+        inferred_usage = df_inferred.memory_usage(index=False, deep=True)
+        schema_usage = df_schema.memory_usage(index=False, deep=True)
+
+        print(f"{endpoint} : {len(df_schema)} rows")
+        print(f"  {'column':<34}{'inferred':>22}{'schema':>30}")
+        for column in dtypes:
+            print(
+                f"  {column:<34}{str(df_inferred[column].dtype):>10}{inferred_usage[column]:>12,}"
+                f"{str(df_schema[column].dtype):>20}{schema_usage[column]:>10,}"
+            )
+        print(
+            f"  {'total':<34}{inferred_usage.sum():>22,}{schema_usage.sum():>30,}"
+            f"  (x{inferred_usage.sum() / max(schema_usage.sum(), 1):.1f} smaller)"
+        )
+
+
+def arrow_frame(df, dtypes: dict = None):
+    """
+    Prépare un DataFrame pour les formats colonnes avec un schéma typé stable :
+    les colonnes connues prennent le type du schéma, les autres colonnes "object"
+    deviennent des chaînes (les dict et list sont écrits en JSON).
+    :param df: DataFrame à écrire
+    :param dtypes: Schéma des colonnes connues, par exemple MARKETS_DTYPES
+    :return: Une copie du DataFrame typée
+    """
+    df_arrow = df.copy()
+    df_arrow.columns = [str(column) for column in df_arrow.columns]
+    apply_dtypes(df_arrow, dtypes or {})
+
+    for column in df_arrow.columns:
+        if column not in (dtypes or {}) and df_arrow[column].dtype == object:
+            df_arrow[column] = df_arrow[column].map(
+                lambda value: json.dumps(value) if isinstance(value, (dict, list)) else value,
+                na_action="ignore"
+            ).astype("string")
+
+    return df_arrow
+
+
+def excel_frame(df):
+    """
+    Excel ne gère pas les dates avec un fuseau horaire : les colonnes UTC y sont écrites sans fuseau
+    :param df: DataFrame à écrire
+    :return: Le DataFrame, ou une copie sans fuseau horaire
+    """
+    columns_tz = [column for column in df.columns if getattr(df[column].dtype, "tz", None) is not None]
+    if not columns_tz:
+        return df
+
+    df_excel = df.copy()
+    for column in columns_tz:
+        df_excel[column] = df_excel[column].dt.tz_localize(None)
+    return df_excel
+
+
+def write_xlsx(df, path: str, sheet_name: str, index: bool = True, header: bool = True):
+    """
+    Écriture XLSX en mémoire constante : le classeur openpyxl en mode write_only écrit les lignes
+    une à une dans le fichier au lieu de garder toutes les cellules en mémoire comme to_excel.
+    :param df: DataFrame à écrire
+    :param path: Chemin du fichier
+    :param sheet_name: Nom de la feuille
+    :param index: Écrit l'index du DataFrame en première colonne
+    :param header: Écrit le nom des colonnes en première ligne
+    """
+    from openpyxl import Workbook
+
+    df_excel = excel_frame(df)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_name)
+
+    if header:
+        index_header = [df_excel.index.name or ""] if index else []
+        sheet.append(index_header + [str(column) for column in df_excel.columns])
+
+    for row in df_excel.itertuples(index=index, name=None):
+        sheet.append([excel_value(value) for value in row])
+
+    workbook.save(path)
+
+
+def excel_value(value):
+    """
+    Convertit une valeur du DataFrame en valeur de cellule openpyxl
+    :param value: Valeur d'une cellule du DataFrame
+    :return: None pour les valeurs manquantes, un type Python natif sinon
+    """
+    if isinstance(value, (dict, list, tuple)):
+        return str(value)
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def export_formats(name: str, extension: list, write_format, verbose: bool = False) -> dict:
+    """
+    Écrit les différents formats en parallèle, un thread par format : l'écriture des fichiers,
+    la compression pyarrow et openpyxl se chevauchent au lieu de s'enchaîner.
+    :param name: Nom des fichiers de donner
+    :param extension: Extensions des fichiers, une extension en double n'est écrite qu'une fois
+    :param write_format: Fonction qui écrit le fichier d'une extension
+    :param verbose: Affiche le temps d'écriture de chaque format, du plus lent au plus rapide
+    :return: Le temps d'écriture en seconde de chaque format
+    """
+    def timed_format(ext):
+        start = time.perf_counter()
+        write_format(ext)
+        seconds = time.perf_counter() - start
+
+        # Nom sans dossier : les exports du mode --watch sont écrits dans un dossier temporaire
+        labels = {"export": os.path.basename(name), "format": ext}
+        PROFILER.add("write", f"{labels['export']}.{ext}", seconds)
+        METRICS.observe("pycoin_export_duration_seconds", labels, seconds)
+        if os.path.exists(f"{name}.{ext}"):
+            METRICS.inc("pycoin_export_bytes_total", labels, os.path.getsize(f"{name}.{ext}"))
+        return seconds
+
+    extension = list(dict.fromkeys(extension))
+    with ThreadPoolExecutor(max_workers=max(len(extension), 1)) as executor:
+        futures = {ext: executor.submit(timed_format, ext) for ext in extension}
+
+    # Une erreur d'écriture est levée ici, après que les autres formats soient terminés
+    timings = {ext: future.result() for ext, future in futures.items()}
+
+    if verbose:
+        for ext, seconds in sorted(timings.items(), key=lambda timing: timing[1], reverse=True):
+            print(f"{name}.{ext} written in {seconds:.3f}s")
+    return timings
+
+
+def write_columnar(
+        df,
+        path: str,
+        ext: str,
+        index: bool = False,
+        compression: str = None,
+        dtypes: dict = None
+):
+    """
+    Écriture d'un DataFrame au format Parquet, Feather ou Arrow (IPC)
+    :param df: DataFrame à écrire
+    :param path: Chemin du fichier
+    :param ext: Extension du fichier, parquet, feather ou arrow
+    :param index: Écrit l'index du DataFrame comme une colonne
+    :param compression: Compression du fichier (zstd, lz4, none), par défaut celle du format (ARROW_COMPRESSION)
+    :param dtypes: Schéma des colonnes connues, voir arrow_frame()
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        return print(f"{path} skipped, the {ext} format requires pyarrow (pip install pyarrow)")
+
+    compression = compression or ARROW_COMPRESSION[ext]
+    df_arrow = arrow_frame(df, dtypes=dtypes)
+    if ext == "parquet":
+        df_arrow.to_parquet(path, engine="pyarrow", index=index,
+                            compression=None if compression == "none" else compression)
+
+    else:
+        # Feather/Arrow n'enregistre pas l'index, il devient une colonne
+        df_arrow = df_arrow.reset_index(drop=not index)
+        df_arrow.columns = [str(column) for column in df_arrow.columns]
+        df_arrow.to_feather(path, compression="uncompressed" if compression == "none" else compression)
+
+
+# Module orjson (optionnel), chargé au premier fichier JSON, False s'il n'est pas installé
+_ORJSON = None
+
+
+def json_dumps(data) -> bytes:
+    """
+    Sérialise en JSON valide (UTF-8) avec orjson s'il est installé, sinon avec le module json.
+    :param data: La réponse JSON décodée de l'API
+    :return: Le document JSON en octets
+    """
+    global _ORJSON
+    if _ORJSON is None:
+        try:
+            import orjson
+            _ORJSON = orjson
+        except ImportError:
+            _ORJSON = False
+
+    if _ORJSON:
+        try:
+            return _ORJSON.dumps(data)
+        except TypeError:
+            # Entier de plus de 64 bits ou type non géré par orjson, repli sur le module json
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_json(path: str, data):
+    """
+    Écrit la réponse de l'API dans un fichier JSON valide (et non la représentation Python du dict)
+    :param path: Chemin du fichier
+    :param data: La réponse JSON décodée de l'API
+    """
+    with open(file=path, mode="wb") as json_file:
+        json_file.write(json_dumps(data))
+
+
+def write_ndjson(path: str, records):
+    """
+    Écrit les enregistrements un par ligne (NDJSON) directement depuis la réponse, sans DataFrame :
+    le fichier peut être traité ligne par ligne, quelle que soit sa taille.
+    :param path: Chemin du fichier
+    :param records: Liste ou itérable des enregistrements (dict) de la réponse
+    """
+    with open(file=path, mode="wb") as ndjson_file:
+        for record in records:
+            ndjson_file.write(json_dumps(record))
+            ndjson_file.write(b"\n")
+
+
+def write_page(path: str, ext: str, df_page, header: bool):
+    """
+    Ajoute une page à la fin d'un fichier CSV ou NDJSON (un objet JSON par ligne)
+    :param path: Chemin du fichier
+    :param ext: Extension du fichier, csv ou ndjson
+    :param df_page: DataFrame de la page
+    :param header: Écrit l'en-tête du CSV, seulement pour la première page
+    """
+    mode = "w" if header else "a"
+    df_page = text_frame(df_page)
+    with open(file=path, mode=mode, encoding="utf-8", newline="") as page_file:
+        if ext == "csv":
+            df_page.to_csv(page_file, index=False, header=header)
+
+        elif ext == "ndjson" and len(df_page):
+            ndjson = df_page.to_json(orient="records", lines=True, date_format="iso")
+            page_file.write(ndjson if ndjson.endswith("\n") else ndjson + "\n")
+
+
+def _rank_key(rank) -> float:
+    """Clé de tri par market_cap_rank, les rangs absents sont placés à la fin (comme sort_values)"""
+    try:
+        rank = float(rank)
+    except (TypeError, ValueError):
+        return float("inf")
+    return float("inf") if rank != rank else rank
+
+
+def merge_runs(run_paths: list, path: str, ext: str):
+    """
+    Tri externe : fusion des pages, déjà triées par market_cap_rank, en un seul fichier trié.
+    Une seule ligne par page est gardée en mémoire pendant la fusion.
+    :param run_paths: Chemins des fichiers de chaque page
+    :param path: Chemin du fichier final
+    :param ext: Extension des fichiers, csv ou ndjson
+    """
+    run_files = [open(file=run_path, mode="r", encoding="utf-8", newline="") for run_path in run_paths]
+    try:
+        with open(file=path, mode="w", encoding="utf-8", newline="") as output_file:
+            if ext == "csv":
+                readers = [csv.reader(run_file) for run_file in run_files]
+                headers = [next(reader, None) for reader in readers]
+                header = next((header for header in headers if header), None)
+                if header is None:
+                    return
+
+                rank = header.index("market_cap_rank")
+                writer = csv.writer(output_file)
+                writer.writerow(header)
+                writer.writerows(heapq.merge(*readers, key=lambda row: _rank_key(row[rank])))
+
+            elif ext == "ndjson":
+                records = [((_rank_key(json.loads(line).get("market_cap_rank")), line) for line in run_file)
+                           for run_file in run_files]
+                output_file.writelines(line for _, line in heapq.merge(*records, key=lambda record: record[0]))
+
+    finally:
+        for run_file in run_files:
+            run_file.close()
+
+
+def generate_stream(
+        extension: list,
+        name: str = "markets",
+        time_wait: int = None,
+        workers: int = REQ_WORKERS,
+        pages: int = 1,
+        vs_currencies: str = "usd",
+        sort_rank: bool = False,
+        checkpoint: Checkpoint = None,
+        store: SnapshotStore = None
+):
+    """
+    Génération des fichiers page par page : chaque page est écrite dès son arrivée,
+    la mémoire utilisée ne dépend donc pas du nombre de pages.
+    :param extension: Extensions du fichier de donner, seulement CSV et NDJSON en streaming
+    :param name: Nom du fichier de donner, par défaut "markets"
+    :param time_wait: Plafond optionnel du temps d'attente en seconde entre chaque requête
+    :param workers: Nombre de pages demandées en parallèle, 1 pour une récupération séquentielle
+    :param pages: Nombre de pages de /coins/markets à récupérer
+    :param vs_currencies: Définir la monnaie cible des données de marché
+    :param sort_rank: Trie le fichier final par market_cap_rank avec une fusion externe des pages,
+    sinon les pages sont écrites dans leur ordre d'arrivée
+    :param checkpoint: Point de reprise des pages, supprimé une fois les fichiers créés
+    :param store: Historique local, chaque page y est ajoutée dès son arrivée
+    :return: Les résultats des différents fichiers CSV et NDJSON ou les erreurs.
+    """
+
+    stream_extension = [ext for ext in extension if ext in STREAM_EXTENSIONS]
+    ignored_extension = [ext for ext in extension if ext not in STREAM_EXTENSIONS]
+    if ignored_extension:
+        print(f"Streaming mode only writes {STREAM_EXTENSIONS} files, ignored: {ignored_extension}")
+    if not stream_extension:
+        return None
+
+    progress = progress_bar()
+    with progress, tempfile.TemporaryDirectory(prefix="pycoin-") as runs_dir:
+        task_pages = progress.add_task("markets", total=pages)
+        try:
+            written = 0
+            snapshot_ts = int(time.time())
+            for num_pages, df_market in fetch_pages(pages, vs_currencies, time_wait, workers, checkpoint):
+                if store is not None:
+                    store.store_markets(df_market, vs_currencies, snapshot_ts)
+                for ext in stream_extension:
+                    # Avec le tri, chaque page est un fichier temporaire fusionné à la fin
+                    with PROFILER.span("write", f"{name}.{ext}"):
+                        if sort_rank:
+                            write_page(os.path.join(runs_dir, f"{num_pages}.{ext}"), ext, df_market, header=True)
+                        else:
+                            write_page(f"{name}.{ext}", ext, df_market, header=written == 0)
+                written += 1
+                del df_market
+                progress.advance(task_pages)
+
+            if sort_rank:
+                for ext in stream_extension:
+                    run_paths = [os.path.join(runs_dir, f"{num_pages}.{ext}") for num_pages in range(1, pages + 1)]
+                    with PROFILER.span("merge", f"{name}.{ext}"):
+                        merge_runs(run_paths, f"{name}.{ext}", ext)
+
+            if checkpoint is not None:
+                checkpoint.remove()
+            return print(f"Successful creation of {name}.{stream_extension} files")
+
+        except requests.HTTPError as error_http:
+            print("Code: ", error_http.response.status_code, error_http.response.reason)
+            return checkpoint_hint(checkpoint, pages)
+
+        except requests.RequestException as error_request:
+            print(error_request)
+            return checkpoint_hint(checkpoint, pages)
+
+        except KeyboardInterrupt:
+            checkpoint_hint(checkpoint, pages)
+            raise
+
+
+def exchanges(
+        extension: str,
+        name: str = "exchanges",
+        per_page: int = 250,
+        page: int = 1,
+        compression: str = None,
+        verbose: bool = False,
+        store: SnapshotStore = None
+):
+    """
+    :param extension: Gestion des extensions du fichier de donner, les possibilités sont sont CSV, HTML, JSON et XLSX.
+    :param name: Nom du fichier de donner, par défaut "exchanges"
+    :param per_page: Valeurs valables : 1[...]250 Total des résultats par page
+    :param page: Parcourir les nombres de page demandé, ici seulement une
+    :param compression: Compression des fichiers Parquet, Feather et Arrow (zstd, lz4, none), par défaut celle du format
+    :param verbose: Affiche le temps d'écriture de chaque format
+    :param store: Historique local, les lignes de l'exécution y sont ajoutées
+    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    """
+    started = time.perf_counter()
+    cg_exchanges = endpoint_url("exchanges", per_page=per_page, page=page)
+
+    try:
+        requests_exchanges, exchanges_json = http_client().fetch(cg_exchanges)
+
+    except requests.HTTPError as error_http:
+        return print("Code: ", error_http.response.status_code, error_http.response.reason)
+
+    except requests.RequestException as error_request:
+        return print(error_request)
+
+    # Contenu inchangé (cache ou 304) depuis la création des fichiers : rien à reconstruire,
+    # sauf le relevé de l'historique local qui est ajouté à chaque exécution
+    up_to_date = outputs_up_to_date(name, extension, requests_exchanges)
+    if up_to_date and store is None:
+        return print(f"{name}.{extension} already up to date in {elapsed(started)}")
+
+    dt_exchanges = normalize("exchanges", exchanges_json)
+
+    if store is not None:
+        store.store_exchanges(dt_exchanges, int(time.time()))
+
+    if up_to_date:
+        return print(f"{name}.{extension} already up to date in {elapsed(started)}")
+
+    # Les formats texte écrivent les valeurs comme l'API les envoie, voir text_frame()
+    dt_exchanges_text = shared_text_frame(dt_exchanges, extension)
+
+    def write_format(ext):
+        if ext == "csv":
+            dt_exchanges_text.to_csv(f"{name}.{ext}", index=False)
+
+        elif ext == "html":
+            dt_exchanges_text.to_html(f"{name}.{ext}", index=False)
+
+        elif ext == "json":
+            dt_exchanges_text.to_json(f"{name}.{ext}", orient="columns")
+
+        elif ext == "ndjson":
+            write_ndjson(f"{name}.{ext}", exchanges_json)
 
         elif ext == "xlsx":
-            df_concat.to_excel(f"{name}.{ext}", sheet_name="TRENDING_TOP7", header=False)
+            write_xlsx(dt_exchanges_text, f"{name}.{ext}", sheet_name="EXCHANGES", index=False)
+
+        elif ext in ARROW_EXTENSIONS:
+            write_columnar(dt_exchanges, f"{name}.{ext}", ext, compression=compression, dtypes=EXCHANGES_DTYPES)
+
+    export_formats(name, extension, write_format, verbose=verbose)
+    return print(f"Create {name}.{extension} in {elapsed(started)}")
+
+
+def write_table(ext: str, endpoint: str, df, name: str, data, compression: str = None, df_text=None):
+    """
+    Écriture du tableau d'un endpoint du registre ENDPOINTS dans un format,
+    JSON et NDJSON sont écrits depuis la réponse plutôt que depuis le tableau, NDJSON ligne à ligne avec endpoint_rows()
+    :param ext: Extension du fichier (csv, html, json, ndjson, xlsx, parquet, feather, arrow)
+    :param endpoint: Nom de l'endpoint, pour la feuille XLSX, les lignes NDJSON et le schéma
+    :param df: Tableau construit par normalize()
+    :param name: Nom du fichier sans extension
+    :param data: Réponse JSON décodée
+    :param compression: Compression des fichiers Parquet, Feather et Arrow, par défaut celle du format
+    :param df_text: Tableau des formats texte partagé par les threads de export_formats(), voir shared_text_frame()
+    """
+    spec = ENDPOINTS[endpoint]
+    if ext not in ARROW_EXTENSIONS and df is not None:
+        df = df_text if df_text is not None else text_frame(df)
+
+    if ext == "csv":
+        df.to_csv(f"{name}.{ext}", index=False)
+
+    elif ext == "html":
+        df.to_html(f"{name}.{ext}", index=False)
+
+    elif ext == "json":
+        write_json(f"{name}.{ext}", data)
+
+    elif ext == "ndjson":
+        # Mêmes lignes et colonnes que le tableau (item, flatten, pivot, select), avec les valeurs de la réponse
+        rows = endpoint_rows(endpoint, data)
+        if spec.get("select"):
+            rows = ({column: row.get(column) for column in spec["dtypes"]} for row in rows)
+        write_ndjson(f"{name}.{ext}", rows)
+
+    elif ext == "xlsx":
+        write_xlsx(df, f"{name}.{ext}", sheet_name=spec["sheet"], index=False)
+
+    elif ext in ARROW_EXTENSIONS:
+        write_columnar(df, f"{name}.{ext}", ext, compression=compression, dtypes=spec.get("dtypes"))
+
+
+def export_endpoint(
+        endpoint: str,
+        extension: list,
+        name: str,
+        compression: str = None,
+        verbose: bool = False,
+        store: SnapshotStore = None,
+        raise_errors: bool = False,
+        **params
+):
+    """
+    Export générique d'un endpoint du registre ENDPOINTS : une requête, un tableau construit par normalize()
+    :param endpoint: Nom de l'endpoint, ex: "trending"
+    :param extension: Gestion des extensions du fichier de donner, les possibilités sont sont CSV, HTML, JSON et XLSX.
+    :param name: Nom du fichier de donner
+    :param compression: Compression des fichiers Parquet, Feather et Arrow (zstd, lz4, none), par défaut celle du format
+    :param verbose: Affiche le temps d'écriture de chaque format
+    :param store: Historique local, la réponse de /global y est ajoutée
+    :param raise_errors: Lève les erreurs requests au lieu de les afficher (mode --watch, voir WatchScheduler)
+    :param params: Champs du chemin et paramètres de la requête, voir endpoint_url()
+    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    """
+    started = time.perf_counter()
+    try:
+        data = http_client().get_json(endpoint_url(endpoint, **params))
 
-    return print(f"Create {name}.{extension} in {tmp_action()['tmp_second']}")
+    except requests.HTTPError as error_http:
+        if raise_errors:
+            raise
+        return print("Code: ", error_http.response.status_code, error_http.response.reason)
+
+    except requests.RequestException as error_request:
+        if raise_errors:
+            raise
+        return print(error_request)
+
+    if store is not None and endpoint == "global":
+        store.store_global(data["data"], int(time.time()))
+
+    df = normalize(endpoint, data)
+    write_format = functools.partial(
+        write_table, endpoint=endpoint, df=df, name=name, data=data, compression=compression,
+        df_text=shared_text_frame(df, extension)
+    )
+    export_formats(name, extension, write_format, verbose=verbose)
+    return print(f"Create {name}.{extension} in {elapsed(started)}")
+
+
+def global_data_market(
+        extension: list,
+        name: str = "global",
+        compression: str = None,
+        verbose: bool = False,
+        store: SnapshotStore = None
+):
+    """
+    Création de la fonction pour la génération du fichier "global", une ligne par devise
+    :param extension: Gestion des extensions du fichier de donner, les deux principales sont CSV, HTML, JSON et XLSX.
+    :param name: Nom du fichier de donner, par défaut "global"
+    :param compression: Compression des fichiers Parquet, Feather et Arrow (zstd, lz4, none), par défaut celle du format
+    :param verbose: Affiche le temps d'écriture de chaque format
+    :param store: Historique local, les lignes de l'exécution y sont ajoutées
+    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    """
+    return export_endpoint("global", extension, name, compression=compression, verbose=verbose, store=store)
+
+
+def global_defi_market(
+        extension: list,
+        name: str = "global_defi",
+        compression: str = None,
+        verbose: bool = False
+):
+    """
+    Création de la fonction pour la génération du fichier "global_defi"
+    :param extension: Gestion des extensions du fichier de donner, les deux principales sont CSV, HTML, JSON et XLSX.
+    :param name: Nom du fichier de donner, par défaut "global_defi"
+    :param compression: Compression des fichiers Parquet, Feather et Arrow (zstd, lz4, none), par défaut celle du format
+    :param verbose: Affiche le temps d'écriture de chaque format
+    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    """
+    return export_endpoint("global_defi", extension, name, compression=compression, verbose=verbose)
+
+
+def trending_top7(
+        extension: list,
+        name: str = "trending_top7",
+        compression: str = None,
+        verbose: bool = False
+):
+    """
+    Création de la fonction pour la génération du fichier "trending_top7", une ligne par crypto
+    :param extension: Gestion des extensions du fichier de donner, les deux principales sont CSV, HTML, JSON et XLSX.
+    :param name: Nom du fichier de donner, par défaut "trending_top7"
+    :param compression: Compression des fichiers Parquet, Feather et Arrow (zstd, lz4, none), par défaut celle du format
+    :param verbose: Affiche le temps d'écriture de chaque format
+    :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
+    """
+    return export_endpoint("trending", extension, name, compression=compression, verbose=verbose)
 
 
 def companies(
         extension: list,
         name: str = "companies",
-        coin_id: list = ["bitcoin", "ethereum"]
+        coin_id: list = ["bitcoin", "ethereum"],
+        compression: str = None,
+        verbose: bool = False
 ):
     """
     Obtenir les avoirs en bitcoins ou en ethereum des entreprises publiques (classés par ordre décroissant du nombre total d'avoirs)
+    Une ligne par entreprise, les totaux de la réponse sont recopiés dans les colonnes treasury_*
     :param extension: Gestion des extensions du fichier de donner, les possibilités sont sont CSV, HTML, JSON et XLSX.
     :param name: Nom du fichier de donner, par défaut "companies"
     :param coin_id: Obtenir les entreprises qui détiennent le plus de Bitcoin et d'Ethereum.
+    :param compression: Compression des fichiers Parquet, Feather et Arrow (zstd, lz4, none), par défaut celle du format
+    :param verbose: Affiche le temps d'écriture de chaque format
     :return: Les résultats des différents fichiers CSV ou HTML et JSON ou les erreurs.
     """
+    return export_endpoint("companies", extension, name, compression=compression, verbose=verbose, coin_id=coin_id)
+
+
+def atomic_export(export, name: str, extension: list, **kwargs):
+    """
+    Réécriture atomique des fichiers d'un export : ils sont créés dans un dossier temporaire à côté
+    des fichiers finaux puis renommés (os.replace), un lecteur voit toujours l'ancienne ou la nouvelle
+    version complète d'un fichier, jamais un fichier à moitié écrit.
+    :param export: Fonction d'export, par exemple generate ou trending_top7
+    :param name: Nom des fichiers de donner
+    :param extension: Extensions des fichiers
+    :param kwargs: Autres arguments de la fonction d'export
+    :return: Les messages de la fonction d'export, avec le nom des fichiers finaux
+    """
+    directory = os.path.dirname(os.path.abspath(name))
+    tmp_dir = tempfile.mkdtemp(prefix=".pycoin-", dir=directory)
+    try:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            export(extension=extension, name=os.path.join(tmp_dir, os.path.basename(name)), **kwargs)
+
+        for filename in os.listdir(tmp_dir):
+            os.replace(os.path.join(tmp_dir, filename), os.path.join(directory, filename))
+        return output.getvalue().replace(tmp_dir + os.sep, "").strip()
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class WatchScheduler:
+    """
+    Planificateur du mode --watch : un seul processus met à jour chaque endpoint à son propre intervalle,
+    le pool de connexions, le limiteur de débit et le cache du client HTTP sont partagés par toutes les tâches.
+    Parmi les tâches dues, la plus prioritaire est exécutée en premier. Une tâche secondaire est aussi
+    reportée tant que le limiteur n'a pas les jetons réservés à la tâche la plus prioritaire (reserve) :
+    les pages de /coins/markets ne sont jamais privées de débit par les appels secondaires.
+    """
 
-    dfs = []
-    cg_companies = (
-        f"{API_URL_BASE}companies/public_treasury/{coin_id}"
+    def __init__(self, jobs: dict, intervals: dict = None, priorities: dict = None, reserve: int = 1,
+                 metrics_file: str = None):
+        """
+        :param jobs: Fonction de mise à jour de chaque endpoint
+        :param intervals: Intervalle en seconde par endpoint, par défaut WATCH_INTERVALS
+        :param priorities: Priorité par endpoint, 0 la plus haute, par défaut WATCH_PRIORITY
+        :param reserve: Nombre de jetons du limiteur réservés à la tâche la plus prioritaire
+        :param metrics_file: Fichier des métriques Prometheus, réécrit après chaque mise à jour
+        """
+        self.jobs = jobs
+        self.metrics_file = metrics_file
+        self.intervals = {**WATCH_INTERVALS, **(intervals or {})}
+        self.priorities = {**WATCH_PRIORITY, **(priorities or {})}
+        self.reserve = reserve
+        self.top_priority = min(self.priorities[endpoint] for endpoint in jobs)
+        now = time.monotonic()
+        # (date prévue, priorité, endpoint) de chaque tâche, toutes dues au démarrage
+        self.queue = [(now, self.priorities[endpoint], endpoint) for endpoint in jobs]
+        self.runs = dict.fromkeys(jobs, 0)
+
+    def _deferral(self, priority: int) -> float:
+        """
+        :param priority: Priorité de la tâche due
+        :return: Le report en seconde d'une tâche secondaire, 0 si elle peut être exécutée
+        """
+        if priority == self.top_priority:
+            return 0.0
+        # La tâche secondaire consomme elle-même un jeton, la réserve doit rester entière après elle
+        limiter = http_client().limiter
+        missing = self.reserve + 1 - limiter.available()
+        return missing / limiter.rate if missing > 0 else 0.0
+
+    def run(self, max_runs: int = None):
+        """
+        Boucle du planificateur, jusqu'à l'interruption (Ctrl+C)
+        :param max_runs: Nombre maximum de mises à jour, par défaut sans limite
+        """
+        while max_runs is None or sum(self.runs.values()) < max_runs:
+            now = time.monotonic()
+            due = [task for task in self.queue if task[0] <= now]
+            if not due:
+                time.sleep(min(task[0] for task in self.queue) - now)
+                continue
+
+            task = min(due, key=lambda due_task: (due_task[1], due_task[0]))
+            due_at, priority, endpoint = task
+            self.queue.remove(task)
+
+            deferral = self._deferral(priority)
+            if deferral > 0:
+                self.queue.append((now + deferral, priority, endpoint))
+                continue
+
+            http_client().new_cycle()
+            start = time.perf_counter()
+            status = "updated"
+            try:
+                output = self.jobs[endpoint]()
+                METRICS.inc("pycoin_watch_updates_total", {"job": endpoint, "result": "success"})
+                METRICS.set("pycoin_watch_last_update_timestamp_seconds", {"job": endpoint}, time.time())
+            except requests.HTTPError as error_http:
+                status = "failed"
+                output = f"Code: {error_http.response.status_code} {error_http.response.reason}"
+                METRICS.inc("pycoin_watch_updates_total", {"job": endpoint, "result": "failure"})
+            except requests.RequestException as error_request:
+                status = "failed"
+                output = str(error_request)
+                METRICS.inc("pycoin_watch_updates_total", {"job": endpoint, "result": "failure"})
+            except Exception as error:
+                # Écriture impossible (disque plein, droits) ou réponse inattendue : la tâche est
+                # comptée en échec et replanifiée, le mode --watch continue pour les autres tâches
+                status = "failed"
+                output = f"{type(error).__name__}: {error}"
+                METRICS.inc("pycoin_watch_updates_total", {"job": endpoint, "result": "failure"})
+
+            if self.metrics_file:
+                try:
+                    METRICS.write(self.metrics_file)
+                except OSError as error_os:
+                    print(f"Cannot write {self.metrics_file}: {error_os}")
+            self.runs[endpoint] += 1
+            interval = self.intervals[endpoint]
+            # Une mise à jour plus longue que son intervalle est relancée dès la fin, sans rattrapage
+            self.queue.append((max(due_at + interval, time.monotonic()), priority, endpoint))
+            print(f"[{time.strftime('%H:%M:%S')}] {endpoint} {status} in {time.perf_counter() - start:.2f}s, "
+                  f"next in {interval}s")
+            if output:
+                print(output)
+
+
+def watch(
+        endpoints: list,
+        extension: list,
+        name: str = None,
+        pages: int = 1,
+        vs_currencies: str = "usd",
+        workers: int = REQ_WORKERS,
+        intervals: dict = None,
+        compression: str = None,
+        store: SnapshotStore = None,
+        convert_currencies: list = None,
+        metrics_file: str = None,
+        metrics_port: int = None
+):
+    """
+    Mode --watch : met à jour les fichiers des endpoints à leur intervalle jusqu'à l'interruption (Ctrl+C)
+    :param endpoints: Endpoints à surveiller parmi WATCH_INTERVALS, tous si la liste est vide
+    :param extension: Extensions des fichiers
+    :param name: Nom des fichiers de /coins/markets, par défaut "markets"
+    :param pages: Nombre de pages de /coins/markets à récupérer
+    :param vs_currencies: Monnaie cible des données de marché
+    :param workers: Nombre de pages demandées en parallèle
+    :param intervals: Intervalle en seconde par endpoint, par défaut WATCH_INTERVALS
+    :param compression: Compression des fichiers Parquet, Feather et Arrow
+    :param store: Historique local, chaque mise à jour de /coins/markets et /global y est ajoutée
+    :param convert_currencies: Autres devises de /coins/markets, converties depuis vs_currencies
+    :param metrics_file: Fichier des métriques Prometheus, réécrit après chaque mise à jour
+    :param metrics_port: Port local où les métriques sont exposées en HTTP (/metrics)
+    """
+    # Les erreurs requests sont levées vers le planificateur, qui compte la mise à jour en échec
+    def update_markets():
+        output = atomic_export(generate, name or "markets", extension, workers=workers, pages=pages,
+                               vs_currencies=vs_currencies, compression=compression, store=store,
+                               convert_currencies=convert_currencies, raise_errors=True)
+        if store is not None:
+            store.compact()
+        return output
+
+    def update_endpoint(endpoint: str, filename: str, **kwargs):
+        return atomic_export(functools.partial(export_endpoint, endpoint), filename, extension,
+                             compression=compression, raise_errors=True, **kwargs)
+
+    jobs = {
+        "markets": update_markets,
+        "global": lambda: update_endpoint("global", "global", store=store),
+        "global_defi": lambda: update_endpoint("global_defi", "global_defi"),
+        "trending": lambda: update_endpoint("trending", "trending_top7"),
+    }
+    jobs = {endpoint: job for endpoint, job in jobs.items() if not endpoints or endpoint in endpoints}
+
+    scheduler = WatchScheduler(jobs, intervals=intervals, reserve=pages if "markets" in jobs else 0,
+                               metrics_file=metrics_file)
+    if metrics_port is not None:
+        METRICS.serve(metrics_port)
+        print(f"Metrics on http://{METRICS_HOST}:{metrics_port}/metrics")
+    print(f"Watching {', '.join(f'{endpoint} every {scheduler.intervals[endpoint]}s' for endpoint in jobs)}, "
+          f"Ctrl+C to stop")
+    scheduler.run()
+
+
+def progress_bar():
+    """
+    Personnalisation de la progress bar, rich n'est importé qu'à sa création
+    :return: La progress bar rich
+    """
+    from rich.progress import Progress, BarColumn, TextColumn, DownloadColumn
+
+    return Progress(
+        TextColumn(text_format="Downloading..."),
+        BarColumn(bar_width=50),
+        "[progress.percentage]{task.percentage:>3.1f}%",
+        "•",
+        DownloadColumn()
     )
 
-    requests_companies = requests.get(cg_companies, timeout=(REQ_CONNECT_TIMEOUT, REQ_READ_TIMEOUT))
-    companies_json = requests_companies.json()
-    companies_json_only_companies = companies_json["companies"]
 
-    pd_companies_df = pd.DataFrame(data=companies_json, columns=["total_holdings", "total_value_usd", "market_cap_dominance"], index=[""])
-    pd_companies_df_only_companies = pd.DataFrame(data=companies_json_only_companies)
-    dfs.append(pd_companies_df)
-    dfs.append(pd_companies_df_only_companies)
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Création des arguments de la ligne de commande
+    :return: Le parser argparse
+    """
+    parser = argparse.ArgumentParser(
+        # Maintient un espace blanc pour toutes sortes de textes d'aide
+        # https://docs.python.org/3/library/argparse.html#argparse.RawTextHelpFormatter
+        # formatter_class=argparse.RawTextHelpFormatter,
+
+        # Indique que la description et l'épilogue sont déjà correctement formatés et ne doivent pas être entourés de lignes
+        # https://docs.python.org/3/library/argparse.html#argparse.RawDescriptionHelpFormatter
+        # formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""Use of the CoinGecko API by generating a CSV, HTML, JSON and XLSX file,
+        with the non-exhaustive list of Cryptocurrency.""",
+        epilog="""Pycoin home page: <https://github.com/PhineasPhreak/pycoin>"""
+    )
 
-    df_concat = pd.concat(dfs)
+    # Définition de la commande --name qui est une commande commune pour choisir le nom de fichier de sortie que vous souhaitez, mais attention pas son extension. La valeur par défaut comme nom de fichier est "markets".
+    cmd_default = parser.add_argument_group()
+    cmd_default.add_argument(
+        "-n",
+        "--name",
+        type=str,
+        metavar="str",
+        help="""Define output file name. default 'markets'"""
+    )
 
-    for ext in extension:
-        if ext == "csv":
-            df_concat.to_csv(f"{name}.{ext}", index=False)
+    # Définition de la commande --extension qui est une commande commune pour choisir l'extension du fichier de sortie, les formats possibles sont CSV, HTML, JSON
+    # nargs="+": Tous les arguments présents sur la ligne de commande sont capturés dans une liste. De plus, un message d'erreur est produit s'il n'y a pas au moins un argument présent sur la ligne de commande.
+    cmd_default.add_argument(
+        "-e",
+        "--extension",
+        default=["csv"],
+        choices=["csv", "html", "json", "ndjson", "xlsx", *ARROW_EXTENSIONS],
+        nargs="+",
+        metavar="str",
+        help="""Selects CSV, HTML, JSON, NDJSON, XLSX and the columnar PARQUET, FEATHER and ARROW
+        output file extensions (columnar formats require pyarrow)"""
+    )
 
-        elif ext == "html":
-            df_concat.to_html(f"{name}.{ext}", index=False)
+    # Compression des formats colonnes
+    cmd_default.add_argument(
+        "--compression",
+        choices=["zstd", "lz4", "none"],
+        metavar="str",
+        help=f"""Compression of the PARQUET, FEATHER and ARROW files: zstd, lz4 or none.
+        Defaults: {", ".join(f"{ext}={codec}" for ext, codec in ARROW_COMPRESSION.items())}"""
+    )
 
-        elif ext == "json":
-            with open(file=f"{name}.{ext}", mode="w", encoding="utf-8") as json_file:
-                json_file.write(str(companies_json))
+    # Définition de la commande --currency qui est une commande commune pour choisir le type de devise que nous voulons, USD étant la devise par défaut.
+    cmd_default.add_argument(
+        "-c",
+        "--currency",
+        default=["usd"],
+        type=str.lower,
+        nargs="+",
+        metavar="str",
+        help="""Choose the type of currency we want,
+        USD being the default currency. Choice: usd, eur, cad, gbp, etc.
+        With several currencies, the markets pages are fetched once in the first one
+        and converted to the others with the exchange rates (name.currency.ext)"""
+    )
 
-        elif ext == "xlsx":
-            df_concat.to_excel(f"{name}.{ext}", sheet_name="COMPANIES", index=False)
-
-    return print(f"Create {name}.{extension} in {tmp_action()['tmp_second']}")
-
-
-# Personnalisation de la progress bar.
-progress = Progress(
-    TextColumn(text_format="Downloading..."),
-    BarColumn(bar_width=50),
-    "[progress.percentage]{task.percentage:>3.1f}%",
-    "•",
-    DownloadColumn()
-)
-
-parser = argparse.ArgumentParser(
-    # Maintient un espace blanc pour toutes sortes de textes d'aide
-    # https://docs.python.org/3/library/argparse.html#argparse.RawTextHelpFormatter
-    # formatter_class=argparse.RawTextHelpFormatter,
-
-    # Indique que la description et l'épilogue sont déjà correctement formatés et ne doivent pas être entourés de lignes
-    # https://docs.python.org/3/library/argparse.html#argparse.RawDescriptionHelpFormatter
-    # formatter_class=argparse.RawDescriptionHelpFormatter,
-    description="""Use of the CoinGecko API by generating a CSV, HTML, JSON and XLSX file,
-    with the non-exhaustive list of Cryptocurrency.""",
-    epilog="""Pycoin home page: <https://github.com/PhineasPhreak/pycoin>"""
-)
-
-# Définition de la commande --name qui est une commande commune pour choisir le nom de fichier de sortie que vous souhaitez, mais attention pas son extension. La valeur par défaut comme nom de fichier est "markets".
-cmd_default = parser.add_argument_group()
-cmd_default.add_argument(
-    "-n",
-    "--name",
-    type=str,
-    metavar="str",
-    help="""Define output file name. default 'markets'"""
-)
-
-# Définition de la commande --extension qui est une commande commune pour choisir l'extension du fichier de sortie, les formats possibles sont CSV, HTML, JSON
-# nargs="+": Tous les arguments présents sur la ligne de commande sont capturés dans une liste. De plus, un message d'erreur est produit s'il n'y a pas au moins un argument présent sur la ligne de commande.
-cmd_default.add_argument(
-    "-e",
-    "--extension",
-    default=["csv"],
-    choices=["csv", "html", "json", "xlsx"],
-    nargs="+",
-    metavar="str",
-    help="""Selects CSV, HTML, JSON and XLSX output file extensions"""
-)
-
-# Définition de la commande --currency qui est une commande commune pour choisir le type de devise que nous voulons, USD étant la devise par défaut.
-cmd_default.add_argument(
-    "-c",
-    "--currency",
-    default="usd",
-    type=str,
-    metavar="str",
-    help="""Choose the type of currency we want,
-    USD being the default currency. Choice: usd, eur, cad, gbp, etc"""
-)
-
-# Affiche les messages du serveur de CoinGecko
-ping = parser.add_argument_group("Status Server")
-ping.add_argument(
-    "-P",
-    "--ping",
-    action="store_true",
-    help="check API server status"
-)
-
-# Définition de la commande --coins_list pour afficher la liste des cryptos
-coins_list_arg = parser.add_argument_group("Coins List")
-coins_list_arg.add_argument(
-    "-C",
-    "--coins_list",
-    action="store_true",
-    help="""List all coins with id, name, and symbol.
-    All the coins that show up on this /coins/list endpoint are Active coins that listed by CoinGecko.com.
-    If a coin is inactive or deactivated, it will be removed from /coins/list"""
-)
-
-# Définition de la commande --page pour personnaliser le nombre de pages dans le fichier final. Nombre de pages par défaut 10.
-market_data = parser.add_argument_group("Options Markets")
-market_data.add_argument(
-    "-p",
-    "--page",
-    # Si cette option <default=5> et de commenter le fichier python lancera automatiquement la génération d'un fichier CSV avec 5 page, même sans argument donner au fichier python.
-    # default=5,
-    type=int,
-    metavar="int",
-    help="""Customization of the number of pages to generate in the *.csv,
-    do not exceed 15 for the page generation value"""
-)
-
-# La commande 'time' permet de préciser le temps d'attente en seconde entre les requêtes
-market_data.add_argument(
-    "-t",
-    "--time",
-    default="25",
-    type=int,
-    metavar="int",
-    help="""Define waiting time in seconds between each request,
-    Avoid values below 5 seconds (default is 25 seconds)"""
-)
-
-# Définition de la commande --exchanges pour lister tous les exchanges actif
-exchanges_data = parser.add_argument_group("Options Exchanges")
-exchanges_data.add_argument(
-    "-E",
-    "--exchanges",
-    action="store_true",
-    help="""List all exchanges (Active with trading volumes)"""
-)
-
-# CODE BLOCK - SI UTILISATION D'UN SUBPARSER...
-# sub_parsers_global = parser.add_subparsers(title="Get cryptocurrency global data", dest="global_cmd")
-# global_data = sub_parsers_global.add_parser("global", help="Get global data and for defi")
-# global_data.add_argument(
-#     "-g",
-#     "--global",
-#     type=str,
-#     metavar="default, defi",
-#     dest="global_data",
-#     help="""Get global data: total_volume, total_market_cap, ongoing icos etc"""
-# )
-#
-# global_data.add_argument(
-#     "-n",
-#     "--name",
-#     default="global",
-#     type=str,
-#     metavar="str",
-#     help="""okay"""
-# )
-
-# Création du groupe global_data pour "global"
-global_data = parser.add_argument_group("Get cryptocurrency global data")
-global_data.add_argument(
-    "-g",
-    "--global",
-    action="store_true",
-    dest="global_data",
-    help="""Get global data - total_volume, total_market_cap, ongoing icos etc"""
-)
-
-# Ajout au groupe global_data pour "decentralized_finance_defi"
-global_data.add_argument(
-    "-G",
-    "--global_defi",
-    action="store_true",
-    help="""Get Top 100 Cryptocurrency Global Eecentralized Finance(defi) data"""
-)
-
-# Génération des tendances de coingecko sur les dernières 24h
-trending_data = parser.add_argument_group("Get Top-7 trending coins")
-trending_data.add_argument(
-    "-T",
-    "--trending",
-    action="store_true",
-    help="""Top-7 trending coins on CoinGecko as searched by users in the last 24 hours (Ordered by most popular first)"""
-)
-
-# Obtenir les avoirs en bitcoins ou en ethereum des entreprises publiques
-companies_arg = parser.add_argument_group("Get public companies data (beta)")
-companies_arg.add_argument(
-    "-H",
-    "--companies",
-    choices=["bitcoin", "ethereum"],
-    metavar="bitcoin, ethereum",
-    help="""Get public companies bitcoin or ethereum holdings (Ordered by total holdings descending)"""
-)
-
-# Affiche la version du programme
-parser.add_argument(
-    "-V",
-    "--version",
-    action="version",
-    version=f"%(prog)s version {PYCOIN_VERSION}"
-)
-
-# Groupe pour verbose ou quiet, groupe mutuellement exclusif soit verbose ou quiet, mais pas les deux.
-output = parser.add_mutually_exclusive_group()
-
-# output.add_argument('-q', '--quiet', action='store_true', help='print quiet')
-output.add_argument(
-    "-v",
-    "--verbose",
-    action="store_true",
-    help="increase output visibility"
-)
-
-args = parser.parse_args()
+    # Affiche les messages du serveur de CoinGecko
+    ping = parser.add_argument_group("Status Server")
+    ping.add_argument(
+        "-P",
+        "--ping",
+        action="store_true",
+        help="check API server status"
+    )
 
+    # Définition de la commande --coins_list pour afficher la liste des cryptos
+    coins_list_arg = parser.add_argument_group("Coins List")
+    coins_list_arg.add_argument(
+        "-C",
+        "--coins_list",
+        action="store_true",
+        help="""List all coins with id, name, and symbol.
+        All the coins that show up on this /coins/list endpoint are Active coins that listed by CoinGecko.com.
+        If a coin is inactive or deactivated, it will be removed from /coins/list"""
+    )
 
-if __name__ == '__main__':
+    coins_list_arg.add_argument(
+        "--resolve",
+        nargs="+",
+        metavar="query",
+        help=f"""Find the CoinGecko ids of symbols, names or name prefixes (autocomplete)
+        with the local coins index built from /coins/list ({COINS_INDEX})"""
+    )
+
+    # Définition de la commande --page pour personnaliser le nombre de pages dans le fichier final. Nombre de pages par défaut 10.
+    market_data = parser.add_argument_group("Options Markets")
+    market_data.add_argument(
+        "-p",
+        "--page",
+        # Si cette option <default=5> et de commenter le fichier python lancera automatiquement la génération d'un fichier CSV avec 5 page, même sans argument donner au fichier python.
+        # default=5,
+        type=int,
+        metavar="int",
+        help="""Customization of the number of pages to generate in the *.csv,
+        do not exceed 15 for the page generation value"""
+    )
+
+    # La commande 'time' permet de préciser le temps d'attente en seconde entre les requêtes
+    market_data.add_argument(
+        "-t",
+        "--time",
+        type=int,
+        metavar="int",
+        help="""Define the maximum waiting time in seconds between each request,
+        the rate limiter (--rate) decides the actual delay"""
+    )
+
+    # Nombre de pages demandées en parallèle
+    market_data.add_argument(
+        "-w",
+        "--workers",
+        default=REQ_WORKERS,
+        type=int,
+        metavar="int",
+        help=f"""Number of pages requested in parallel under the shared rate limit,
+        1 to fetch the pages one by one (default is {REQ_WORKERS})"""
+    )
+
+    # Écriture des pages au fur et à mesure de leur arrivée
+    market_data.add_argument(
+        "--stream",
+        action="store_true",
+        help=f"""Write each page to the CSV/NDJSON files as soon as it arrives,
+        memory stays bounded whatever the number of pages. Only {", ".join(STREAM_EXTENSIONS)} are written"""
+    )
+
+    market_data.add_argument(
+        "--sort",
+        action="store_true",
+        help="""With --stream, sort the files by market cap rank with an external merge of the pages"""
+    )
+
+    # Reprise d'une récupération interrompue à partir de son point de reprise
+    market_data.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        metavar="run_id",
+        help=f"""Resume an interrupted run, only the missing pages are requested.
+        Without run_id, the latest run for the currency and --sparkline is resumed (checkpoints in {CHECKPOINT_DIR},
+        removed {CHECKPOINT_MAX_AGE // 86400} days after their last page)"""
+    )
+
+    # Export différentiel depuis l'exécution précédente
+    market_data.add_argument(
+        "--delta",
+        action="store_true",
+        help="""Only write the rows added, removed or changed since the previous run for the currency
+        to name.delta.ext, with a compact patch file name.patch.json (not with --stream)"""
+    )
+
+    market_data.add_argument(
+        "--tolerance",
+        type=parse_tolerance,
+        nargs="+",
+        default=[],
+        metavar="[column=]float",
+        help=f"""With --delta, relative change under which a decimal value is unchanged,
+        for all columns or per column (default is {DELTA_TOLERANCE})"""
+    )
+
+    # Prix horaires des 7 derniers jours, enregistrés dans un tableau numpy à part
+    market_data.add_argument(
+        "--sparkline",
+        action="store_true",
+        help="""Add the 7 days min, max and volatility columns, the hourly prices are saved
+        to name.sparkline.npy as a float32 array, one row per coin in the table order, name.delta.sparkline.npy
+        with --delta (not with --stream)"""
+    )
+
+    # Comparaison de la mémoire des DataFrame typés par schéma et par inférence
+    market_data.add_argument(
+        "--memory-report",
+        action="store_true",
+        help="""Compare the memory of the markets (first page) and exchanges DataFrames
+        built with pandas type inference and with the declared schemas"""
+    )
+
+    # Définition de la commande --exchanges pour lister tous les exchanges actif
+    exchanges_data = parser.add_argument_group("Options Exchanges")
+    exchanges_data.add_argument(
+        "-E",
+        "--exchanges",
+        action="store_true",
+        help="""List all exchanges (Active with trading volumes)"""
+    )
+
+    # CODE BLOCK - SI UTILISATION D'UN SUBPARSER...
+    # sub_parsers_global = parser.add_subparsers(title="Get cryptocurrency global data", dest="global_cmd")
+    # global_data = sub_parsers_global.add_parser("global", help="Get global data and for defi")
+    # global_data.add_argument(
+    #     "-g",
+    #     "--global",
+    #     type=str,
+    #     metavar="default, defi",
+    #     dest="global_data",
+    #     help="""Get global data: total_volume, total_market_cap, ongoing icos etc"""
+    # )
+    #
+    # global_data.add_argument(
+    #     "-n",
+    #     "--name",
+    #     default="global",
+    #     type=str,
+    #     metavar="str",
+    #     help="""okay"""
+    # )
+
+    # Création du groupe global_data pour "global"
+    global_data = parser.add_argument_group("Get cryptocurrency global data")
+    global_data.add_argument(
+        "-g",
+        "--global",
+        action="store_true",
+        dest="global_data",
+        help="""Get global data - total_volume, total_market_cap, ongoing icos etc"""
+    )
+
+    # Ajout au groupe global_data pour "decentralized_finance_defi"
+    global_data.add_argument(
+        "-G",
+        "--global_defi",
+        action="store_true",
+        help="""Get Top 100 Cryptocurrency Global Eecentralized Finance(defi) data"""
+    )
+
+    # Génération des tendances de coingecko sur les dernières 24h
+    trending_data = parser.add_argument_group("Get Top-7 trending coins")
+    trending_data.add_argument(
+        "-T",
+        "--trending",
+        action="store_true",
+        help="""Top-7 trending coins on CoinGecko as searched by users in the last 24 hours (Ordered by most popular first)"""
+    )
+
+    # Obtenir les avoirs en bitcoins ou en ethereum des entreprises publiques
+    companies_arg = parser.add_argument_group("Get public companies data (beta)")
+    companies_arg.add_argument(
+        "-H",
+        "--companies",
+        metavar="bitcoin, ethereum",
+        help="""Get public companies bitcoin or ethereum holdings (Ordered by total holdings descending),
+        symbols and names such as btc or Ethereum are resolved with the local coins index"""
+    )
+
+    # Taille du pool de connexions du client HTTP partagé
+    network_arg = parser.add_argument_group("Network options")
+    network_arg.add_argument(
+        "--pool-size",
+        default=REQ_POOL_SIZE,
+        type=int,
+        metavar="int",
+        help=f"""Number of keep-alive connections kept open per host (default is {REQ_POOL_SIZE})"""
+    )
+
+    # Limite de requêtes par minute du plan de l'API CoinGecko
+    network_arg.add_argument(
+        "--rate",
+        default=REQ_RATE_LIMIT,
+        type=int,
+        metavar="int",
+        help=f"""Maximum number of requests per minute allowed by your API plan,
+        bursts are allowed up to this limit (default is {REQ_RATE_LIMIT})"""
+    )
+
+    # Budget de nouvelles tentatives (429, 5xx, timeout) pour toute l'exécution
+    network_arg.add_argument(
+        "--retries",
+        default=REQ_RETRY_BUDGET,
+        type=int,
+        metavar="int",
+        help=f"""Total number of retries allowed for the whole run on 429, 5xx
+        and timeout errors (default is {REQ_RETRY_BUDGET})"""
+    )
+
+    # Temps d'attente de la réponse, à réduire pour mesurer les nouvelles tentatives sur timeout
+    network_arg.add_argument(
+        "--timeout",
+        default=REQ_READ_TIMEOUT,
+        type=float,
+        metavar="secs",
+        help=f"""Seconds to wait for the server response before retrying (default is {REQ_READ_TIMEOUT})"""
+    )
+
+    # URL de base de l'API, par exemple le serveur local benchmarks/standin.py
+    network_arg.add_argument(
+        "--api-url",
+        default=API_URL_BASE,
+        metavar="url",
+        help=f"""Base URL of the API, also read from $PYCOIN_API_URL (default is {API_URL_DEFAULT}),
+        e.g. the local stand-in server of benchmarks/standin.py"""
+    )
+
+    # Options du cache local des réponses de l'API
+    cache_arg = parser.add_argument_group("Cache options")
+    cache_arg.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="""Do not read or write the local response cache"""
+    )
+
+    cache_arg.add_argument(
+        "--refresh",
+        action="store_true",
+        help="""Ignore cached responses and download them again, the cache is updated"""
+    )
+
+    cache_arg.add_argument(
+        "--cache-ttl",
+        type=parse_cache_ttl,
+        nargs="+",
+        default=[],
+        metavar="endpoint=secs",
+        help=f"""Cache lifetime in seconds per endpoint, 0 disables the cache for this endpoint.
+        Defaults: {", ".join(f"{endpoint}={ttl}" for endpoint, ttl in CACHE_TTL.items())}"""
+    )
+
+    cache_arg.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help=f"""Show the hit ratio, bytes saved and revalidations of the local cache ({CACHE_DIR}),
+        alone or after a command to report this run"""
+    )
+
+    # Mode --watch, un seul processus met à jour les endpoints à leur intervalle
+    watch_arg = parser.add_argument_group("Watch mode")
+    watch_arg.add_argument(
+        "--watch",
+        nargs="*",
+        choices=list(WATCH_INTERVALS),
+        metavar="endpoint",
+        help=f"""Keep running and rewrite the files of each endpoint atomically at its own interval,
+        sharing one connection pool, rate limit and cache: {", ".join(WATCH_INTERVALS)} (default is all).
+        markets has priority over the other endpoints"""
+    )
+
+    watch_arg.add_argument(
+        "--interval",
+        type=parse_cache_ttl,
+        nargs="+",
+        default=[],
+        metavar="endpoint=secs",
+        help=f"""With --watch, update interval in seconds per endpoint.
+        Defaults: {", ".join(f"{endpoint}={interval}" for endpoint, interval in WATCH_INTERVALS.items())}"""
+    )
+
+    # Historique local des exécutions (SnapshotStore)
+    store_arg = parser.add_argument_group("History store")
+    store_arg.add_argument(
+        "--store",
+        nargs="?",
+        const=STORE_DIR,
+        metavar="path",
+        help=f"""Also add the markets (-p), exchanges (-E) and global (-g) rows of this run
+        to the local SQLite history in path (default is {STORE_DIR})"""
+    )
+
+    store_arg.add_argument(
+        "--history",
+        nargs="+",
+        metavar="coin_id",
+        help="""Show the price history of the coins in the currency (-c) from the local history,
+        without any request to the API"""
+    )
+
+    store_arg.add_argument(
+        "--days",
+        type=int,
+        metavar="int",
+        help="""With --history, number of days of history to show (default is all)"""
+    )
+
+    store_arg.add_argument(
+        "--retention",
+        default=STORE_RETENTION,
+        type=int,
+        metavar="int",
+        help=f"""Days of history kept in the store, 0 to keep everything. Snapshots older than
+        {STORE_COMPACT_AFTER // 86400} days are compacted to the last one of each day (default is {STORE_RETENTION})"""
+    )
+
+    # Métriques Prometheus : fichier texte en fin d'exécution ou endpoint HTTP du mode --watch
+    metrics_arg = parser.add_argument_group("Metrics")
+    metrics_arg.add_argument(
+        "--metrics-file",
+        metavar="path",
+        help="""Write Prometheus metrics (requests, latency histograms, 429s, bytes, export times) to this text file
+        at the end of the run, rewritten after each update with --watch (node_exporter textfile collector)"""
+    )
+
+    metrics_arg.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="int",
+        help=f"""With --watch, serve the Prometheus metrics on http://{METRICS_HOST}:port/metrics"""
+    )
+
+    # Temps passé par étape de l'exécution (voir Profiler)
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        metavar="file.json",
+        help="""Print the time spent per stage at the end of the run (rate limit wait, connect, time to first byte,
+        download, JSON decode, DataFrame build, sort/concat and each file write), or dump it as JSON to file.json"""
+    )
+
+    # Affiche la version du programme
+    parser.add_argument(
+        "-V",
+        "--version",
+        action="version",
+        version=f"%(prog)s version {PYCOIN_VERSION}"
+    )
+
+    # Groupe pour verbose ou quiet, groupe mutuellement exclusif soit verbose ou quiet, mais pas les deux.
+    output = parser.add_mutually_exclusive_group()
+
+    # output.add_argument('-q', '--quiet', action='store_true', help='print quiet')
+    output.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="increase output visibility"
+    )
+
+    return parser
+
+
+def main(argv: list = None):
+    """
+    Point d'entrée de la ligne de commande, les arguments ne sont lus qu'ici
+    et non à l'import du module, qui peut ainsi être utilisé comme librairie.
+    :param argv: Arguments de la ligne de commande, par défaut sys.argv
+    """
     # TODO: Développer davantage le "argparse"...
     # TODO: Ajouter davantage d'option disponible de l'API coingecko...
     # TODO: Ajouter les fonctionnalités API suivantes: tickers, exchange/tickers.
 
-    try:
-        if args.verbose:
-            # API: /ping (verbose)
-            if args.ping:
-                check_api(visibility="verbose")
+    parser = build_parser()
+    args = parser.parse_args(argv)
 
-        else:
-            # API: /ping
-            if args.ping:
-                check_api()
-
-            # API: /coins/list
-            elif args.coins_list:
-                if args.name is None:
-                    coins_list(extension=args.extension)
+    try:
+        # Création du cache local et du client HTTP partagé avant le premier appel à l'API.
+        # Le /ping n'est jamais mis en cache, inutile d'ouvrir le cache pour lui.
+        response_cache = None
+        if not args.no_cache and (not args.ping or args.cache_stats):
+            response_cache = ResponseCache(ttl={**CACHE_TTL, **dict(args.cache_ttl)}, refresh=args.refresh)
+
+        set_api_url(args.api_url)
+        http_client(
+            pool_size=args.pool_size,
+            rate_limit=args.rate,
+            retry_budget=args.retries,
+            cache=response_cache,
+            read_timeout=args.timeout
+        )
+
+        # La première devise est celle du parcours des pages, les autres en sont converties
+        vs_currencies, *convert_currencies = dict.fromkeys(args.currency)
+
+        # Historique local des exécutions, ouvert par --store ou --history
+        snapshot_store = None
+        if args.store or args.history:
+            snapshot_store = SnapshotStore(path=args.store or STORE_DIR, retention=args.retention)
+
+        # API: /ping
+        if args.ping:
+            check_api(visibility="verbose" if args.verbose else "standard")
+
+        # Mode --watch, jusqu'à l'interruption
+        elif args.watch is not None:
+            watch(endpoints=args.watch, extension=args.extension, name=args.name, pages=args.page or 1,
+                  vs_currencies=vs_currencies, workers=args.workers, intervals=dict(args.interval),
+                  compression=args.compression, store=snapshot_store, convert_currencies=convert_currencies,
+                  metrics_file=args.metrics_file, metrics_port=args.metrics_port)
+
+        # Historique des prix, lu dans la base locale
+        elif args.history:
+            # Sans requête vers l'API : les ids de l'historique sont gardés tels quels, les autres saisies
+            # sont résolues avec l'index local tel qu'il est, jamais téléchargé ni reconstruit ici
+            queries = [query for query in args.history if not snapshot_store.has_coin(query)]
+            index = CoinIndex.load() if queries else None
+            if queries and index is None:
+                print(f"No local coins index to resolve {', '.join(queries)}, use CoinGecko ids "
+                      f"or build the index with --coins_list")
+            else:
+                resolved = dict(zip(queries, (resolve_coins([query], index=index, keep_unknown=True) for query in queries)))
+                # Plusieurs recherches peuvent désigner la même crypto (bitcoin btc), chaque id n'est affiché qu'une fois
+                coin_ids = list(dict.fromkeys(
+                    coin_id for query in args.history for coin_id in resolved.get(query, [query])
+                ))
+                for currency in (vs_currencies, *convert_currencies):
+                    price_history(coin_ids=coin_ids, vs_currencies=currency, days=args.days, store=snapshot_store)
+
+        # Recherche des identifiants dans l'index local des cryptos
+        elif args.resolve:
+            index = coin_index()
+            for query in args.resolve:
+                matches = index.resolve(query) if index is not None else []
+                print(f"{query} : " + (", ".join(f"{coin_id} ({symbol}, {name})" for coin_id, symbol, name in matches)
+                                       or "no match"))
+
+        # API: /coins/list
+        elif args.coins_list:
+            if args.name is None:
+                coins_list(extension=args.extension, compression=args.compression, verbose=args.verbose)
+            else:
+                coins_list(extension=args.extension, name=args.name, compression=args.compression, verbose=args.verbose)
+
+        # Mémoire des DataFrame de /coins/markets et /exchanges, schéma contre inférence
+        elif args.memory_report:
+            memory_report(vs_currencies=vs_currencies)
+
+        # API: /coins/markets
+        elif args.page:
+            # Chaque page est enregistrée dans un point de reprise, nouveau ou repris (--resume),
+            # ceux des exécutions abandonnées depuis plus de CHECKPOINT_MAX_AGE sont supprimés
+            Checkpoint.prune()
+            sparkline = args.sparkline and not args.stream
+            checkpoint = None
+            if args.resume:
+                checkpoint = Checkpoint.resume(vs_currencies=vs_currencies, run_id=args.resume, sparkline=sparkline)
+                if checkpoint is None:
+                    print(f"No checkpoint to resume for '{vs_currencies}', starting a new run")
                 else:
-                    coins_list(extension=args.extension, name=args.name)
+                    print(f"Resume run {checkpoint.run_id}, {len(checkpoint.pages())} pages already saved")
+            if checkpoint is None:
+                checkpoint = Checkpoint(vs_currencies=vs_currencies, sparkline=sparkline)
+
+            if args.stream:
+                if args.delta:
+                    print("--delta is ignored with --stream, the pages are not kept in memory")
+                if args.sparkline:
+                    print("--sparkline is ignored with --stream, the pages are not kept in memory")
+                if convert_currencies:
+                    print(f"--stream only writes the first currency '{vs_currencies}', ignored: {convert_currencies}")
+                generate_stream(extension=args.extension, name=args.name or "markets", time_wait=args.time,
+                                workers=args.workers, pages=args.page, vs_currencies=vs_currencies,
+                                sort_rank=args.sort, checkpoint=checkpoint, store=snapshot_store)
+
+            elif args.name is None:
+                generate(extension=args.extension, time_wait=args.time, workers=args.workers,
+                         pages=args.page, vs_currencies=vs_currencies, checkpoint=checkpoint,
+                         compression=args.compression, verbose=args.verbose, store=snapshot_store,
+                         delta=args.delta, tolerance=dict(args.tolerance), convert_currencies=convert_currencies,
+                         sparkline=args.sparkline)
+            else:
+                generate(extension=args.extension, name=args.name, time_wait=args.time, workers=args.workers,
+                         pages=args.page, vs_currencies=vs_currencies, checkpoint=checkpoint,
+                         compression=args.compression, verbose=args.verbose, store=snapshot_store,
+                         delta=args.delta, tolerance=dict(args.tolerance), convert_currencies=convert_currencies,
+                         sparkline=args.sparkline)
+
+        # API: /exchanges
+        elif args.exchanges:
+            if args.name is None:
+                exchanges(extension=args.extension, compression=args.compression, verbose=args.verbose, store=snapshot_store)
+            else:
+                exchanges(extension=args.extension, name=args.name, compression=args.compression, verbose=args.verbose, store=snapshot_store)
 
-            # API: /coins/markets
-            elif args.page and args.currency:
-                if args.name is None:
-                    generate(extension=args.extension, time_wait=args.time)
-                else:
-                    generate(extension=args.extension, name=args.name, time_wait=args.time)
+        # API: /global
+        elif args.global_data:
+            if args.name is None:
+                global_data_market(extension=args.extension, compression=args.compression, verbose=args.verbose, store=snapshot_store)
+            else:
+                global_data_market(extension=args.extension, name=args.name, compression=args.compression, verbose=args.verbose, store=snapshot_store)
 
-            # API: /exchanges
-            elif args.exchanges:
-                if args.name is None:
-                    exchanges(extension=args.extension)
-                else:
-                    exchanges(extension=args.extension, name=args.name)
+        # API: /global/decentralized_finance_defi
+        elif args.global_defi:
+            if args.name is None:
+                global_defi_market(extension=args.extension, compression=args.compression, verbose=args.verbose)
+            else:
+                global_defi_market(extension=args.extension, name=args.name, compression=args.compression, verbose=args.verbose)
 
-            # API: /global
-            elif args.global_data:
-                if args.name is None:
-                    global_data_market(extension=args.extension)
-                else:
-                    global_data_market(extension=args.extension, name=args.name)
+        # API: /search/trending
+        elif args.trending:
+            if args.name is None:
+                trending_top7(extension=args.extension, compression=args.compression, verbose=args.verbose)
+            else:
+                trending_top7(extension=args.extension, name=args.name, compression=args.compression, verbose=args.verbose)
+
+        # API: /companies/public_treasury/{coin_id}, seulement bitcoin et ethereum
+        elif args.companies:
+            coin_ids = [args.companies]
+            if args.companies not in ("bitcoin", "ethereum"):
+                coin_ids = resolve_coins(coin_ids, keep_unknown=True, among={"bitcoin", "ethereum"})
+
+            if coin_ids not in (["bitcoin"], ["ethereum"]):
+                print(f"Public companies data is only available for bitcoin and ethereum, not '{args.companies}'")
+            elif args.name is None:
+                companies(extension=args.extension, coin_id=coin_ids[0], compression=args.compression, verbose=args.verbose)
+            else:
+                companies(extension=args.extension, name=args.name, coin_id=coin_ids[0], compression=args.compression, verbose=args.verbose)
 
-            # API: /global/decentralized_finance_defi
-            elif args.global_defi:
-                if args.name is None:
-                    global_defi_market(extension=args.extension)
-                else:
-                    global_defi_market(extension=args.extension, name=args.name)
+        # CODE BLOCK - SI UTILISATION D'UN SUBPARSER...
+        # elif args.global_cmd == "global":
+        #     global_data_market(extension=["csv"], name=args.name, type_data=args.global_data, compression=args.compression)
 
-            # API: /search/trending
-            elif args.trending:
-                if args.name is None:
-                    trending_top7(extension=args.extension)
-                else:
-                    trending_top7(extension=args.extension, name=args.name)
+        elif not args.cache_stats:
+            # Si aucun argument saisi, afficher l'aide par défaut.
+            print("No arguments entered, display default help.")
+            parser.parse_args(["--help"])
 
-            # API: /companies/public_treasury/{coin_id}
-            elif args.companies:
-                if args.name is None:
-                    companies(extension=args.extension, coin_id=args.companies)
-                else:
-                    companies(extension=args.extension, name=args.name, coin_id=args.companies)
+        # Politique de conservation de l'historique, appliquée après chaque ajout
+        if snapshot_store is not None:
+            if args.store:
+                snapshot_store.compact()
+            snapshot_store.close()
 
-            # CODE BLOCK - SI UTILISATION D'UN SUBPARSER...
-            # elif args.global_cmd == "global":
-            #     global_data_market(extension=["csv"], name=args.name, type_data=args.global_data)
+        # Rapport du cache local, seul ou après la commande
+        if args.cache_stats and response_cache is not None:
+            cache_report(response_cache)
 
-            else:
-                # Si aucun argument saisi, afficher l'aide par défaut.
-                print("No arguments entered, display default help.")
-                args = parser.parse_args(["--help"])
+        if args.profile is not None:
+            profile_report(args.profile)
+
+        if args.metrics_port is not None and args.watch is None:
+            print("--metrics-port is only used with --watch, use --metrics-file for a single run")
+        if args.metrics_file:
+            METRICS.write(args.metrics_file)
 
     except KeyboardInterrupt as KeyboardError:
         print("Keyboard Interrupt")
+
+
+if __name__ == '__main__':
+    main()
@@ -40,6 +40,11 @@ setup(
     # Add the python3 module
     # scripts=['pycoin.py'],
 
+    # Create the `pycoin` command, the arguments are only parsed by main().
+    entry_points={
+        'console_scripts': ['pycoin=pycoin.pycoin:main'],
+    },
+
     # Here are the packages I want "build."
     packages=['pycoin'],
 
@@ -53,6 +58,13 @@ setup(
         'pyinstaller-versionfile',
     ],
 
+    # Optional dependencies, `pip install .[arrow]` for the PARQUET, FEATHER and ARROW outputs,
+    # `pip install .[json]` for a faster JSON and NDJSON serializer.
+    extras_require={
+        'arrow': ['pyarrow'],
+        'json': ['orjson'],
+    },
+
     # Here are the keywords of my library.
     keywords='python3, coingecko, governments, finance, APIs, crypto',
 
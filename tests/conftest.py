@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fixtures partagées des tests : serveur local standin.py et lancement de la ligne de commande pycoin
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+import standin  # noqa: E402
+
+PYCOIN = os.path.join(ROOT_DIR, "pycoin", "pycoin.py")
+FIXTURES_DIR = standin.FIXTURES_DIR
+
+
+@pytest.fixture(scope="module")
+def server():
+    """Serveur local sans panne injectée, les compteurs sont remis à zéro par chaque test qui les lit"""
+    stand_in = standin.serve()
+    yield stand_in
+    stand_in.shutdown()
+
+
+@pytest.fixture
+def cli(tmp_path):
+    """
+    Lance pycoin dans un nouveau processus, dans tmp_path et avec son propre cache
+    :return: Fonction cli(url, *arguments) qui retourne le subprocess.CompletedProcess
+    """
+    def run(url: str, *arguments):
+        return subprocess.run(
+            [sys.executable, PYCOIN, *arguments, "--api-url", url],
+            cwd=tmp_path, env={**os.environ, "XDG_CACHE_HOME": str(tmp_path / "cache"),
+                               "XDG_DATA_HOME": str(tmp_path / "data")},
+            capture_output=True, text=True, timeout=60
+        )
+    return run
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+Points de reprise des pages de /coins/markets : identifiant d'exécution, reprise (--resume) et suppression
+"""
+
+import csv
+import os
+import time
+
+import requests
+
+from pycoin import pycoin
+
+
+def test_runs_in_same_second_do_not_share_directory(tmp_path):
+    first = pycoin.Checkpoint(path=str(tmp_path))
+    second = pycoin.Checkpoint(path=str(tmp_path))
+
+    assert first.run_id != second.run_id
+    assert first.directory != second.directory
+    assert first.run_id.startswith(time.strftime("%Y%m%d"))
+
+
+def test_resume_latest_of_same_parameters(tmp_path):
+    path = str(tmp_path)
+    old = pycoin.Checkpoint(run_id="20240501T120000-1-aaaa", path=path)
+    latest = pycoin.Checkpoint(run_id="20240501T130000-1-aaaa", path=path)
+    pycoin.Checkpoint(run_id="20240501T140000-1-aaaa", path=path, sparkline=True)
+    pycoin.Checkpoint(run_id="20240501T150000-1-aaaa", path=path, vs_currencies="eur")
+    latest.save(1, [{"id": "bitcoin"}])
+
+    resumed = pycoin.Checkpoint.resume(path=path)
+    assert resumed.directory == latest.directory
+    assert resumed.pages() == [1] and resumed.load(1) == [{"id": "bitcoin"}]
+    assert pycoin.Checkpoint.resume(run_id=old.run_id, path=path).directory == old.directory
+    assert pycoin.Checkpoint.resume(run_id="missing", path=path) is None
+    assert pycoin.Checkpoint.resume(path=str(tmp_path / "none")) is None
+
+
+def test_prune_abandoned_checkpoints(tmp_path):
+    path = str(tmp_path)
+    abandoned = pycoin.Checkpoint(run_id="20240501T120000-1-aaaa", path=path)
+    recent = pycoin.Checkpoint(run_id="20240508T120000-1-aaaa", path=path)
+    now = time.time()
+    os.utime(abandoned.directory, (now - pycoin.CHECKPOINT_MAX_AGE - 60,) * 2)
+
+    assert pycoin.Checkpoint.prune(path=path, now=now) == 1
+    assert not os.path.exists(abandoned.directory)
+    assert os.path.isdir(recent.directory)
+
+
+def test_cli_resumes_missing_pages(server, cli, tmp_path):
+    path = str(tmp_path / "cache" / "pycoin" / "checkpoints")
+    interrupted = pycoin.Checkpoint(run_id="20240501T120000-1-aaaa", path=path)
+    interrupted.save(1, requests.get(server.url + "coins/markets", params={
+        "vs_currency": "usd", "order": "market_cap_desc", "per_page": 250, "page": 1}).json())
+    abandoned = pycoin.Checkpoint(run_id="20240401T120000-1-aaaa", path=path, vs_currencies="eur")
+    os.utime(abandoned.directory, (time.time() - pycoin.CHECKPOINT_MAX_AGE - 60,) * 2)
+    before = server.faults.stats()["endpoints"].get("coins_markets", 0)
+
+    output = cli(server.url, "-p", "2", "-e", "csv", "--no-cache", "--resume")
+
+    assert output.returncode == 0
+    assert f"Resume run {interrupted.run_id}, 1 pages already saved" in output.stdout
+    assert server.faults.stats()["endpoints"]["coins_markets"] - before == 1
+    with open(tmp_path / "markets.csv", encoding="utf-8", newline="") as csv_file:
+        assert len(list(csv.DictReader(csv_file))) == 500
+    assert os.listdir(path) == []
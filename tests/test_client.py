@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+"""
+Client HTTP partagé : cache local (TTL, LRU, revalidation ETag), single-flight et limiteur de débit
+"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from pycoin import pycoin
+
+
+class Clock:
+    """Horloge du module pycoin avancée à la main, time.sleep avance l'horloge au lieu d'attendre"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.slept = []
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(pycoin, "time", fake)
+    return fake
+
+
+def response(body: bytes, etag: str = None) -> requests.Response:
+    fake = requests.Response()
+    fake.status_code = 200
+    fake._content = body
+    if etag:
+        fake.headers["ETag"] = etag
+    return fake
+
+
+def endpoint_requests(server, endpoint: str) -> int:
+    return server.faults.stats()["endpoints"].get(endpoint, 0)
+
+
+def test_cache_ttl_and_etag_revalidation(server, clock, tmp_path):
+    cache = pycoin.ResponseCache(path=str(tmp_path), ttl={"coins/list": 60})
+    client = pycoin.HttpClient(cache=cache, rate_limit=6000)
+    url = server.url + "coins/list"
+    before = endpoint_requests(server, "coins_list")
+
+    first = client.get(url)
+    assert not getattr(first, "from_cache", False)
+    assert client.get(url).from_cache
+    assert endpoint_requests(server, "coins_list") - before == 1
+
+    # Entrée expirée : requête conditionnelle, le serveur répond 304 et le contenu du cache est gardé
+    clock.now += 61
+    revalidated = client.get(url)
+    assert revalidated.from_cache
+    assert revalidated.content == first.content
+    assert endpoint_requests(server, "coins_list") - before == 2
+
+    stats = cache.stats()
+    assert (stats["run_fetches"], stats["run_hits"], stats["run_revalidations"]) == (1, 1, 1)
+
+    # La validité est prolongée par la revalidation
+    clock.now += 30
+    assert client.get(url).from_cache
+    assert endpoint_requests(server, "coins_list") - before == 2
+
+
+def test_cache_skips_endpoints_without_ttl(server, clock, tmp_path):
+    cache = pycoin.ResponseCache(path=str(tmp_path), ttl={"coins/list": 60})
+    client = pycoin.HttpClient(cache=cache, rate_limit=6000)
+
+    client.get(server.url + "ping")
+
+    assert cache.lookup(server.url + "ping") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_evicts_least_recently_used(clock, tmp_path):
+    cache = pycoin.ResponseCache(path=str(tmp_path), max_size=250, ttl={"exchanges": 3600})
+    urls = [f"https://api.example/api/v3/exchanges?page={page}" for page in range(3)]
+
+    cache.store(urls[0], response(b"0" * 100))
+    clock.now += 1
+    cache.store(urls[1], response(b"1" * 100))
+    clock.now += 1
+    assert cache.lookup(urls[0]) is not None
+    clock.now += 1
+    cache.store(urls[2], response(b"2" * 100))
+
+    assert cache.lookup(urls[1]) is None
+    assert cache.lookup(urls[0]).content == b"0" * 100
+    assert cache.lookup(urls[2]).content == b"2" * 100
+    assert cache.stats()["size"] == 200
+
+
+def test_cache_key_ignores_parameter_order():
+    assert pycoin.ResponseCache.key("https://a/x?b=2&a=1") == pycoin.ResponseCache.key("https://a/x", {"a": 1, "b": 2})
+    assert pycoin.ResponseCache.key("https://a/x?a=1") != pycoin.ResponseCache.key("https://a/x?a=2")
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = pycoin.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {"data": 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.shared < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert flight.shared == 7
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+def test_single_flight_memo_and_errors():
+    flight = pycoin.SingleFlight()
+    calls = []
+
+    assert flight.do("memo", lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do("memo", lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do("once", lambda: calls.append(1) or len(calls), memo=False) == 2
+    assert flight.do("once", lambda: calls.append(1) or len(calls), memo=False) == 3
+
+    # Une erreur n'est pas gardée, l'appel suivant refait la requête
+    with pytest.raises(KeyError):
+        flight.do("error", lambda: {}["missing"])
+    assert flight.do("error", lambda: "ok") == "ok"
+
+    flight.forget()
+    assert flight.do("memo", lambda: "new") == "new"
+
+
+def test_client_fetch_is_shared(server, tmp_path):
+    client = pycoin.HttpClient(cache=None, rate_limit=6000)
+    url = server.url + "global"
+    before = endpoint_requests(server, "global")
+
+    threads = [threading.Thread(target=client.get_json, args=(url,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert client.get_json(url) is client.get_json(url)
+    assert endpoint_requests(server, "global") - before == 1
+
+
+def test_rate_limiter_token_bucket(clock):
+    limiter = pycoin.RateLimiter(rate_limit=60, burst=2)
+
+    # La rafale passe sans attendre, puis une requête par seconde
+    assert [limiter.acquire() for _ in range(4)] == [0.0, 0.0, 1.0, 1.0]
+    assert clock.slept == [1.0, 1.0]
+
+    # Le seau se remplit sans dépasser sa capacité
+    clock.now += 60
+    assert limiter.available() == 2.0
+    assert limiter.acquire(max_wait=0.25) == 0.0
+
+    limiter.acquire()
+    assert limiter.acquire(max_wait=0.25) == 0.25
+    assert limiter.stats()["waited"] == 2.25
+
+
+def test_rate_limiter_penalize_and_reward(clock):
+    limiter = pycoin.RateLimiter(rate_limit=60, burst=2)
+
+    limiter.penalize()
+    assert limiter.available() == 0.0
+    assert limiter.stats()["rate_per_minute"] == 30
+    assert limiter.acquire() == 2.0
+
+    for _ in range(pycoin.REQ_RATE_RECOVERY):
+        limiter.reward()
+    assert limiter.stats()["rate_per_minute"] == pytest.approx(36)
+    assert limiter.stats()["throttled"] == 1
+
+    # Le débit ne descend pas sous une requête par minute
+    for _ in range(10):
+        limiter.penalize()
+    assert limiter.stats()["rate_per_minute"] == pytest.approx(1)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+Export différentiel --delta : patch, instantané de la devise et tableau des sparklines
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import FIXTURES_DIR
+from pycoin import pycoin
+
+
+@pytest.fixture(scope="module")
+def markets():
+    with open(os.path.join(FIXTURES_DIR, "coins_markets.json"), encoding="utf-8") as fixture:
+        return json.load(fixture)
+
+
+def compared(df):
+    """Colonnes comparées par market_delta, une ligne par identifiant"""
+    return df.drop(columns=pycoin.DELTA_IGNORE).set_index("id").sort_index()
+
+
+def test_apply_patch_round_trip(markets):
+    old = pycoin.normalize("markets", markets[:15])
+    rows = [dict(row) for row in markets[1:16]]
+    rows[0]["current_price"] *= 1.05
+    rows[1]["current_price"] *= 1.0001
+    rows[2]["market_cap_rank"] = None
+    rows[3]["name"] = "Renamed"
+    new = pycoin.normalize("markets", rows)
+
+    patch, df_delta = pycoin.market_delta(old, new)
+    # Le patch est lu depuis name.patch.json par les consommateurs de l'export
+    patch = json.loads(json.dumps(patch))
+    patched = pycoin.apply_patch(old, patch)
+
+    assert patch["removed"] == [markets[0]["id"]]
+    assert [row["id"] for row in patch["added"]] == [markets[15]["id"]]
+    assert set(patch["changed"]) == {rows[0]["id"], rows[2]["id"], rows[3]["id"]}
+    assert sorted(df_delta["change"]) == ["added", "changed", "changed", "changed", "removed"]
+    pd.testing.assert_frame_equal(compared(patched), compared(new), check_exact=False,
+                                  rtol=pycoin.DELTA_TOLERANCE, check_categorical=False)
+
+
+def test_snapshot_round_trip(monkeypatch, tmp_path, markets):
+    monkeypatch.setattr(pycoin, "DELTA_DIR", str(tmp_path))
+    df_markets = pycoin.normalize("markets", markets)
+    df_markets["volatility_7d"] = np.float32(1.5)
+
+    pycoin.save_snapshot(df_markets, "usd", "2024-05-01T12:00:00+00:00")
+    snapshot_at, df_loaded = pycoin.load_snapshot("usd")
+
+    assert snapshot_at == "2024-05-01T12:00:00+00:00"
+    assert os.listdir(tmp_path) == ["markets-usd.json"]
+    pd.testing.assert_frame_equal(df_loaded, df_markets, check_categorical=False)
+    patch, _ = pycoin.market_delta(df_loaded, df_markets, tolerance={"*": 0})
+    assert patch["added"] == patch["removed"] == [] and patch["changed"] == {}
+
+
+@pytest.mark.parametrize("content", [b"\x80\x04garbage", b'{"version": 0, "snapshot_at": "", "dtypes": {}}'])
+def test_unreadable_snapshot_is_ignored(monkeypatch, tmp_path, content):
+    monkeypatch.setattr(pycoin, "DELTA_DIR", str(tmp_path))
+    (tmp_path / "markets-usd.json").write_bytes(content)
+
+    assert pycoin.load_snapshot("usd") is None
+
+
+def test_delta_sparkline_rows(server, cli, tmp_path):
+    assert cli(server.url, "-p", "1", "-e", "csv", "--delta", "--sparkline").returncode == 0
+    # Premier instantané de la devise : toutes les lignes sont ajoutées
+    assert len(np.load(tmp_path / "markets.delta.sparkline.npy")) == len(pd.read_csv(tmp_path / "markets.delta.csv"))
+
+    # La deuxième page n'est que dans le nouvel instantané
+    assert cli(server.url, "-p", "2", "-e", "csv", "--sparkline").returncode == 0
+    full = pd.read_csv(tmp_path / "markets.csv")
+    full_prices = np.load(tmp_path / "markets.sparkline.npy")
+    assert cli(server.url, "-p", "2", "-e", "csv", "--delta", "--sparkline").returncode == 0
+    df_delta = pd.read_csv(tmp_path / "markets.delta.csv")
+    prices = np.load(tmp_path / "markets.delta.sparkline.npy")
+
+    assert 0 < len(prices) == len(df_delta) < len(full)
+    rows = pd.Index(full["id"]).get_indexer(df_delta["id"])
+    np.testing.assert_array_equal(prices, full_prices[rows])
+
+
+def test_delta_sparklines_removed_rows():
+    prices = np.arange(6, dtype=np.float32).reshape(3, 2)
+    df_snapshot = pd.DataFrame({"id": ["bitcoin", "ethereum", "tether"]})
+    df_delta = pd.DataFrame({"id": ["tether", "solana", "bitcoin"]})
+
+    rows = pycoin.delta_sparklines(prices, df_snapshot, df_delta)
+
+    np.testing.assert_array_equal(rows, [[4, 5], [np.nan, np.nan], [0, 1]])
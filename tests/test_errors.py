@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+"""
+Erreurs HTTP après épuisement des nouvelles tentatives : chaque commande affiche le code
+de la réponse au lieu de lever l'exception requests (serveur local standin.py, toujours 429)
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+import standin  # noqa: E402
+
+PYCOIN = os.path.join(ROOT_DIR, "pycoin", "pycoin.py")
+
+
+@pytest.fixture(scope="module")
+def always_429():
+    server = standin.serve(every_429=1, retry_after=0)
+    yield server
+    server.shutdown()
+
+
+@pytest.mark.parametrize("command", [["-C"], ["-E"], ["-g"], ["-G"], ["-T"], ["-H", "bitcoin"]])
+def test_too_many_requests(always_429, tmp_path, command):
+    output = subprocess.run(
+        [sys.executable, PYCOIN, *command, "--api-url", always_429.url, "--retries", "1", "--no-cache"],
+        cwd=tmp_path, env={**os.environ, "XDG_CACHE_HOME": str(tmp_path)},
+        capture_output=True, text=True, timeout=60
+    )
+
+    assert output.returncode == 0, output.stderr
+    assert "Traceback" not in output.stderr
+    assert "Code:  429" in output.stdout
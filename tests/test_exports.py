@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Les formats texte écrivent les valeurs de /coins/markets comme l'API les envoie (voir text_frame)
+"""
+
+import csv
+import functools
+import json
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from pycoin import pycoin
+
+
+@pytest.fixture(scope="module")
+def bitcoin():
+    with open(os.path.join(FIXTURES_DIR, "coins_markets.json"), encoding="utf-8") as fixture:
+        return json.load(fixture)[0]
+
+
+def test_csv_row_matches_fixture(server, cli, tmp_path, bitcoin):
+    assert cli(server.url, "-p", "1", "-e", "csv", "--no-cache").returncode == 0
+
+    with open(tmp_path / "markets.csv", encoding="utf-8", newline="") as csv_file:
+        row = next(csv.DictReader(csv_file))
+
+    assert list(row) == list(pycoin.MARKETS_DTYPES)
+    for column, value in row.items():
+        expected = bitcoin[column]
+        if isinstance(expected, str):
+            assert value == expected, column
+        else:
+            assert float(value) == expected, column
+    assert row["last_updated"] == "2024-05-01T12:00:00.000Z"
+    assert row["price_change_percentage_24h"] == "-2.11401"
+    assert row["market_cap"] == "1183821870000"
+
+
+def test_ndjson_row_matches_fixture(server, cli, tmp_path, bitcoin):
+    assert cli(server.url, "-p", "1", "-e", "ndjson", "--no-cache").returncode == 0
+
+    with open(tmp_path / "markets.ndjson", encoding="utf-8") as ndjson_file:
+        row = json.loads(ndjson_file.readline())
+
+    assert row == {column: bitcoin[column] for column in pycoin.MARKETS_DTYPES}
+
+
+def test_trending_ndjson_rows_are_flat(server, cli, tmp_path):
+    assert cli(server.url, "-T", "-e", "ndjson", "csv", "--no-cache").returncode == 0
+
+    with open(os.path.join(FIXTURES_DIR, "search_trending.json"), encoding="utf-8") as fixture:
+        items = [coin["item"] for coin in json.load(fixture)["coins"]]
+    with open(tmp_path / "trending_top7.ndjson", encoding="utf-8") as ndjson_file:
+        rows = [json.loads(line) for line in ndjson_file]
+    with open(tmp_path / "trending_top7.csv", encoding="utf-8", newline="") as csv_file:
+        header = next(csv.reader(csv_file))
+
+    assert len(rows) == len(items)
+    for row, item in zip(rows, items):
+        assert "item" not in row
+        assert list(row) == header
+        assert row["id"] == item["id"] and row["score"] == item["score"]
+
+
+def test_text_frame_built_once(monkeypatch, tmp_path, bitcoin):
+    calls = []
+    text_frame = pycoin.text_frame
+    monkeypatch.setattr(pycoin, "text_frame", lambda df: calls.append(df) or text_frame(df))
+    df_markets = pycoin.normalize("markets", [bitcoin])
+    extension = ["csv", "html", "json", "xlsx", "parquet"]
+
+    pycoin.export_formats(str(tmp_path / "markets"), extension, functools.partial(
+        pycoin.write_markets, df_markets=df_markets, name=str(tmp_path / "markets"),
+        df_text=pycoin.shared_text_frame(df_markets, extension)
+    ))
+
+    assert len(calls) == 1
+    assert all((tmp_path / f"markets.{ext}").exists() for ext in extension)
+    assert pycoin.shared_text_frame(df_markets, ["parquet", "arrow"]) is None
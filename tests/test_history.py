@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+--history lit l'historique local sans aucune requête vers l'API, index des cryptos compris
+"""
+
+
+def requests_during(server, run):
+    """
+    :return: La sortie de run() et le nombre de requêtes reçues par le serveur local pendant l'appel
+    """
+    before = server.faults.stats()["requests"]
+    output = run()
+    return output, server.faults.stats()["requests"] - before
+
+
+def test_history_store_ids_without_index(server, cli):
+    assert cli(server.url, "-p", "1", "-e", "csv", "--store").returncode == 0
+
+    output, requests = requests_during(server, lambda: cli(server.url, "--history", "bitcoin"))
+
+    assert requests == 0
+    assert "bitcoin (usd) : 1 snapshots" in output.stdout
+
+
+def test_history_symbol_without_index(server, cli):
+    assert cli(server.url, "-p", "1", "-e", "csv", "--store").returncode == 0
+
+    output, requests = requests_during(server, lambda: cli(server.url, "--history", "btc"))
+
+    assert requests == 0
+    assert "No local coins index to resolve btc" in output.stdout
+
+
+def test_history_symbol_with_index(server, cli):
+    assert cli(server.url, "-p", "1", "-e", "csv", "--store").returncode == 0
+    assert cli(server.url, "-C", "-e", "json").returncode == 0
+
+    output, requests = requests_during(server, lambda: cli(server.url, "--history", "bitcoin", "btc"))
+
+    assert requests == 0
+    assert output.stdout.count("bitcoin (usd) : 1 snapshots") == 1
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""
+Métriques Prometheus : les étapes du Profiler sont des compteurs qui ne diminuent jamais
+"""
+
+from pycoin import pycoin
+
+
+def stage_values(text: str) -> dict:
+    return {line.split(" ")[0].split("{")[0]: float(line.split(" ")[1])
+            for line in text.splitlines() if line.startswith("pycoin_stage_")}
+
+
+def test_stage_counters_are_monotonic(monkeypatch):
+    metrics = pycoin.Metrics()
+    profiler = pycoin.Profiler()
+    monkeypatch.setattr(pycoin, "PROFILER", profiler)
+
+    profiler.add("write", "markets.csv", 2.0)
+    first = metrics.render()
+    assert "# TYPE pycoin_stage_seconds_total counter" in first
+    assert stage_values(first) == {"pycoin_stage_seconds_total": 2.0, "pycoin_stage_calls_total": 1}
+
+    profiler.add("write", "markets.csv", 0.5)
+    assert stage_values(metrics.render()) == {"pycoin_stage_seconds_total": 2.5, "pycoin_stage_calls_total": 2}
+    assert stage_values(metrics.render()) == {"pycoin_stage_seconds_total": 2.5, "pycoin_stage_calls_total": 2}
+
+    # Un nouveau Profiler repart de zéro, les compteurs continuent d'augmenter
+    profiler = pycoin.Profiler()
+    monkeypatch.setattr(pycoin, "PROFILER", profiler)
+    profiler.add("write", "markets.csv", 1.0)
+    assert stage_values(metrics.render()) == {"pycoin_stage_seconds_total": 3.5, "pycoin_stage_calls_total": 3}
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""
+Contrôle de santé -P : une réponse qui n'est pas du JSON est signalée avec son status et son URL
+"""
+
+import functools
+import http.server
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def html_server(tmp_path):
+    """Serveur de fichiers sans l'API : /ping répond par une page HTML 404"""
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/v3/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_ping(server, cli):
+    output = cli(server.url, "-P")
+
+    assert "Status Server : 200" in output.stdout
+
+
+def test_ping_not_json(html_server, cli):
+    output = cli(html_server, "-P")
+
+    assert f"Invalid response from {html_server}ping : 404 File not found, the body is not JSON" in output.stdout
+    assert "Failed to establish a connection" not in output.stdout
+    assert "Traceback" not in output.stderr
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+"""
+Résolution des symboles saisis en identifiants CoinGecko avec l'index local des cryptos
+"""
+
+import json
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+
+
+@pytest.mark.parametrize("query, coin_id", [("eth", "ethereum"), ("btc", "bitcoin"), ("Ethereum", "ethereum")])
+def test_companies_symbol(server, cli, tmp_path, query, coin_id):
+    # eth est aussi le symbole de bridged-ether dans /coins/list, seuls bitcoin et ethereum comptent pour -H
+    output = cli(server.url, "-H", query, "-e", "json")
+
+    assert "only available" not in output.stdout, output.stdout
+    assert "Create companies" in output.stdout
+    with open(os.path.join(FIXTURES_DIR, f"companies_public_treasury_{coin_id}.json"), encoding="utf-8") as fixture:
+        with open(tmp_path / "companies.json", encoding="utf-8") as written:
+            assert json.load(written) == json.load(fixture)
+
+
+def test_companies_unsupported(server, cli):
+    output = cli(server.url, "-H", "solana", "-e", "json")
+
+    assert "only available for bitcoin and ethereum, not 'solana'" in output.stdout
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+"""
+Mode --watch : une tâche en échec est comptée et replanifiée, sans arrêter le planificateur
+"""
+
+import pytest
+
+from pycoin import pycoin
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    registry = pycoin.Metrics()
+    monkeypatch.setattr(pycoin, "METRICS", registry)
+    return registry
+
+
+def updates(registry: pycoin.Metrics, job: str, result: str) -> float:
+    return registry.values.get(pycoin.Metrics._key("pycoin_watch_updates_total", {"job": job, "result": result}), 0)
+
+
+def test_failed_jobs_are_rescheduled(metrics, tmp_path):
+    def disk_full():
+        raise OSError(28, "No space left on device")
+
+    def bad_payload():
+        raise KeyError("data")
+
+    jobs = {"markets": disk_full, "global": bad_payload, "trending": lambda: "trending updated"}
+    scheduler = pycoin.WatchScheduler(jobs, intervals=dict.fromkeys(jobs, 3600), reserve=0,
+                                      metrics_file=str(tmp_path / "pycoin.prom"))
+    scheduler.run(max_runs=3)
+
+    # markets, la plus prioritaire, échoue la première : les autres tâches sont quand même exécutées
+    assert scheduler.runs == {"markets": 1, "global": 1, "trending": 1}
+    assert sorted(endpoint for _, _, endpoint in scheduler.queue) == ["global", "markets", "trending"]
+    assert updates(metrics, "markets", "failure") == 1
+    assert updates(metrics, "global", "failure") == 1
+    assert updates(metrics, "trending", "success") == 1
+    last_update = pycoin.Metrics._key("pycoin_watch_last_update_timestamp_seconds", {"job": "markets"})
+    assert last_update not in metrics.values
+    assert 'pycoin_watch_updates_total{job="global",result="failure"} 1' in (tmp_path / "pycoin.prom").read_text()